@@ -0,0 +1,248 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import time
+import timeit
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from serial import Serial
+
+from carmen import Carmen
+from carmen_communication import CommunicationCarmen
+from carmen_filter import CICDecimator, MovingAverage, Pipeline, WindowReduction, as_columns
+from carmen_sample import SampleBuffer
+from carmen_simulator import CarmenSimulator, SimulatedSerial
+from carmen_utils import CarmenConverter, analyse_typeplate, build_typeplate, convert_digout
+from crc16 import calculate_crc16, check_crc16_batch
+
+REFERENCE_TABLE = [calculate_crc16([i], 0x0000) for i in range(256)]
+
+# registered benchmarks, every benchmark returns results by name as (value, unit)
+BENCHMARKS = []
+
+
+def reference_crc16(data: List[int]) -> int:
+    """
+    Table loop of the first CRC16 implementation, used as reference.
+
+    :param data: Data to calculate a CRC16.
+    :return: Calculated CRC16.
+    """
+    crc = 0xFFFF
+    for d in data:
+        crc = (REFERENCE_TABLE[((crc >> 8) ^ d) & 0xFF] ^ (crc << 8)) & 0xFFFF
+    return crc
+
+
+def benchmark(function: Callable[[], Dict[str, Tuple[float, str]]]) -> Callable[[], Dict[str, Tuple[float, str]]]:
+    """
+    Registers a benchmark.
+
+    :param function: Benchmark function.
+    :return: The benchmark function.
+    """
+    BENCHMARKS.append(function)
+    return function
+
+
+def measure(function: Callable[[], object], number: int) -> float:
+    """
+    Measures the best execution time of the given function.
+
+    :param function: Function to measure.
+    :param number: Number of calls per measurement.
+    :return: Time per call in seconds.
+    """
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def create_carmen(log_protocol: bool = False) -> Carmen:
+    """
+    Creates a Carmen sensor connected to an in-memory simulator.
+
+    :param log_protocol: Log every frame. Default is False.
+    :return: The Carmen sensor with read typeplate.
+    """
+    communication = CommunicationCarmen(SimulatedSerial(CarmenSimulator(baudrate=None)))
+    communication.log_protocol = log_protocol
+    carmen = Carmen(communication)
+    carmen.read_typeplate()
+    return carmen
+
+
+@benchmark
+def benchmark_crc16() -> Dict[str, Tuple[float, str]]:
+    """
+    Compares the CRC16 implementations for different data sizes.
+    """
+    results = {}
+    # 3 and 11 bytes are the CRC16 sizes of the short responses and of the measurement frame,
+    # calculate_crc16 must not be slower than the reference for these sizes (the small frames skip the wide table)
+    for size in [3, 11, 13, 53, 256, 4096]:
+        data = os.urandom(size)
+        data_list = list(data)
+        data_view = memoryview(bytearray(data))
+        number = max(100000 // size, 100)
+        results['crc16.list.{}'.format(size)] = (measure(lambda: calculate_crc16(data_list), number) / size * 1e9,
+                                                 'ns/byte')
+        results['crc16.bytes.{}'.format(size)] = (measure(lambda: calculate_crc16(data), number) / size * 1e9,
+                                                  'ns/byte')
+        results['crc16.view.{}'.format(size)] = (measure(lambda: calculate_crc16(data_view), number) / size * 1e9,
+                                                 'ns/byte')
+        results['crc16.reference.{}'.format(size)] = (measure(lambda: reference_crc16(data_list), number) / size * 1e9,
+                                                      'ns/byte')
+
+    frames = bytearray()
+    for _ in range(10000):
+        data = os.urandom(11)
+        crc = calculate_crc16(data)
+        frames += data + bytes([crc & 0xFF, crc >> 8])
+    results['crc16.batch.10000'] = (measure(lambda: check_crc16_batch(frames, 13), 10) * 1e3, 'ms')
+    results['crc16.reference.10000'] = (measure(lambda: [reference_crc16(frames[i:i + 11])
+                                                         for i in range(0, len(frames), 13)], 10) * 1e3, 'ms')
+    return results
+
+
+@benchmark
+def benchmark_communication() -> Dict[str, Tuple[float, str]]:
+    """
+    Measures the overhead of CommunicationCarmen against an in-memory serial stand-in.
+    """
+    results = {}
+    for log_protocol in [False, True]:
+        communication = create_carmen(log_protocol)._communication
+        suffix = '.logged' if log_protocol else ''
+        buffer = bytearray(13)
+        request = bytearray(3)
+
+        def send_receive() -> None:
+            communication.send(0x35)
+            communication.receive(13)
+
+        def send_receive_into() -> None:
+            communication.send_into(request, 0x35)
+            communication.receive_into(buffer)
+
+        results['communication.send_receive' + suffix] = (measure(send_receive, 2000) * 1e6, 'us')
+        results['communication.send_receive_into' + suffix] = (measure(send_receive_into, 2000) * 1e6, 'us')
+    return results
+
+
+@benchmark
+def benchmark_conversion() -> Dict[str, Tuple[float, str]]:
+    """
+    Measures the typeplate analysis and the digital output conversion.
+    """
+    _, typeplate = analyse_typeplate(build_typeplate(CarmenSimulator().typeplate))
+    buffer = build_typeplate(typeplate)
+    converter = CarmenConverter(typeplate)
+    frame = [0x35, 0x82, 0x87, 0xFA, 0xC0, 0xFE, 0x00, 0x00, 0x01, 0x02, 0x03, 0x00, 0x00]
+    frame_buffer = bytearray(frame)
+    return {'analyse_typeplate': (measure(lambda: analyse_typeplate(buffer), 2000) * 1e6, 'us'),
+            'convert_digout': (measure(lambda: convert_digout(0xFA8782, 24, -1, 2), 20000) * 1e9, 'ns'),
+            'converter.convert': (measure(lambda: converter.pressure.convert(0xFA8782), 20000) * 1e9, 'ns'),
+            'converter.decode': (measure(lambda: converter.decode(frame), 20000) * 1e9, 'ns'),
+            'converter.decode_buffer': (measure(lambda: converter.decode_buffer(frame_buffer), 20000) * 1e9, 'ns')}
+
+
+@benchmark
+def benchmark_read_measurement() -> Dict[str, Tuple[float, str]]:
+    """
+    Measures the end-to-end samples per second of Carmen against an in-memory simulator.
+    """
+    carmen = create_carmen()
+    return {'read_measurement': (1 / measure(carmen.read_measurement, 2000), 'samples/s'),
+            'read_measurements.8': (8 / measure(lambda: carmen.read_measurements(8, 8), 250), 'samples/s')}
+
+
+@benchmark
+def benchmark_filter() -> Dict[str, Tuple[float, str]]:
+    """
+    Measures the filter stages per sample for batches of 4096 samples.
+    """
+    samples = SampleBuffer()
+    for index in range(4096):
+        samples.append(index * 0.00125, index % 100 / 100, 25.0, 0x000000)
+    columns = as_columns(samples)
+    stages = {'moving_average.16': MovingAverage(16),
+              'window.mean.100': WindowReduction(100),
+              'window.max.100': WindowReduction(100, 'max'),
+              'cic.100.3': CICDecimator(100, 3),
+              'pipeline.cic.10.max.10': Pipeline([CICDecimator(10), WindowReduction(10, 'max')])}
+    return {'filter.' + name: (measure(lambda: stage.process(columns), 200) / len(samples) * 1e9, 'ns/sample')
+            for name, stage in stages.items()}
+
+
+def benchmark_pty(duration: float = 2.0) -> Dict[str, Tuple[float, str]]:
+    """
+    Measures the end-to-end samples per second of Carmen against a simulator on a pty, paced at 57600 baud.
+
+    :param duration: Duration of every measurement in seconds. Default is 2.0.
+    """
+    results = {}
+    with CarmenSimulator() as simulator:
+        communication = CommunicationCarmen(Serial(simulator.port))
+        communication.log_protocol = False
+        carmen = Carmen(communication)
+        carmen.read_typeplate()
+        for depth in [1, 4]:
+            count = 0
+            end = time.monotonic() + duration
+            while time.monotonic() < end:
+                count += sum(result[0] for result in carmen.read_measurements(depth, depth))
+            results['pty.read_measurements.{}'.format(depth)] = (count / duration, 'samples/s')
+        del carmen, communication
+    return results
+
+
+def compare(results: Dict[str, Tuple[float, str]], path: str) -> None:
+    """
+    Prints the results compared with the results of a previous run.
+
+    :param results: Current results.
+    :param path: Path of the previous results.
+    """
+    with open(path, 'r') as file:
+        baseline = json.load(file)['results']
+    print('{:40} {:>14} {:>14} {:>8}'.format('benchmark', 'current', 'baseline', 'change'))
+    for name, (value, unit) in results.items():
+        if name in baseline:
+            previous = baseline[name]['value']
+            change = (value - previous) / previous * 100 if previous else 0.0
+            print('{:40} {:14.2f} {:14.2f} {:+7.1f}% {}'.format(name, value, previous, change, unit))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmarks of the Carmen protocol implementation.')
+    parser.add_argument('-o', '--output', help='write the results as JSON')
+    parser.add_argument('-c', '--compare', help='compare with the JSON results of a previous run')
+    parser.add_argument('--pty', action='store_true', help='include the end-to-end benchmark on a pty')
+    arguments = parser.parse_args()
+
+    # records are created like in main.py, but not written
+    logging.basicConfig(level=logging.NOTSET, handlers=[logging.NullHandler()])
+    # warm up lazily built tables
+    calculate_crc16(bytes(256))
+
+    results = {}
+    for function in BENCHMARKS + ([benchmark_pty] if arguments.pty else []):
+        results.update(function())
+    for name, (value, unit) in results.items():
+        print('{:40} {:14.2f} {}'.format(name, value, unit))
+
+    if arguments.compare:
+        compare(results, arguments.compare)
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'date': datetime.now().isoformat(),
+                       'results': {name: {'value': value, 'unit': unit} for name, (value, unit) in results.items()}},
+                      file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,16 @@
 import logging
-from typing import List, Tuple
+import time
+from typing import Iterator, List, Tuple
 
+from carmen_acquisition import CarmenAcquisition
 from carmen_communication import CommunicationCarmen
-from carmen_utils import CarmenTypeplate, analyse_typeplate, convert_digout
+from carmen_recording import CarmenRecorder
+from carmen_sample import Sample
+from carmen_stats import CarmenStatistics
+from carmen_typeplate_cache import (TYPEPLATE_ADDRESS, TYPEPLATE_SIZE, VALIDATION_ADDRESS, VALIDATION_SIZE,
+                                    TypeplateCache)
+from carmen_units import unit_quantity
+from carmen_utils import CarmenConverter, CarmenTypeplate, Units, analyse_typeplate
 
 
 class Carmen(object):
@@ -10,14 +18,84 @@ class Carmen(object):
     Simple class to handle the Carmen sensor functions.
     """
 
-    def __init__(self, communication: CommunicationCarmen) -> None:
+    def __init__(self, communication: CommunicationCarmen, typeplate_cache: TypeplateCache = None) -> None:
         """
         Initializes a instance of Carmen.
 
         :param communication: Communication for the Carmen sensor.
+        :param typeplate_cache: Persistent typeplate cache. Default is None.
         """
         self._communication = communication
+        self._typeplate_cache = typeplate_cache
         self._typeplate = None
+        self._typeplate_buffer = None
+        self._converter = None
+        self._output_units = (None, None)
+        self._acquisition = None
+        # preallocated buffers for "Read Measurement Frame1"
+        self._request_buffer = bytearray(3)
+        self._frame1_buffer = bytearray(13)
+        # optional binary recording of every "Read Measurement Frame1" response
+        self.recorder = None
+        # optional counters and latency histograms by command
+        self.stats = None  # type: CarmenStatistics
+
+    @property
+    def typeplate(self) -> CarmenTypeplate:
+        """
+        :return: The last read typeplate information or None.
+        """
+        return self._typeplate
+
+    @property
+    def typeplate_buffer(self) -> bytes:
+        """
+        :return: The raw EEPROM content of the last read typeplate or None.
+        """
+        return self._typeplate_buffer
+
+    @property
+    def converter(self) -> CarmenConverter:
+        """
+        :return: The converter of the last read typeplate information or None.
+        """
+        return self._converter
+
+    def _count_command(self, command: int, start: float, received: bool, success: bool) -> None:
+        """
+        Updates the statistics of an executed command.
+
+        :param command: Executed command.
+        :param start: Start time of the command (time.perf_counter).
+        :param received: True if a response is received, else false.
+        :param success: True if the response is valid, else false.
+        """
+        statistics = self.stats.command(command)
+        statistics.duration.record(time.perf_counter() - start)
+        if received and not success:
+            statistics.invalid += 1
+
+    def set_output_units(self, pressure_unit: Units = None, temperature_unit: Units = None) -> bool:
+        """
+        Sets the units of the measurements, the unit conversion is fused into the decoding.
+
+        :param pressure_unit: Unit of the pressure values. Default is None (unit of the typeplate).
+        :param temperature_unit: Unit of the temperature values. Default is None (unit of the typeplate).
+        :return: True on success, false if the units cannot be converted.
+        """
+        for unit, quantity in ((pressure_unit, 'pressure'), (temperature_unit, 'temperature')):
+            if unit is not None and unit_quantity(unit) != quantity:
+                logging.error('invalid output units: {} is no {} unit'.format(unit, quantity))
+                return False
+        if self._typeplate is not None:
+            try:
+                converter = CarmenConverter(self._typeplate, pressure_unit, temperature_unit)
+            except ValueError as error:
+                logging.error('invalid output units: {}'.format(error))
+                return False
+            self._converter = converter
+        self._output_units = (pressure_unit, temperature_unit)
+        return True
 
     def _execute_simple_command(self, command: int, size: int) -> Tuple[bool, List[int]]:
         """
@@ -28,17 +106,37 @@ class Carmen(object):
         :return: True on success, else false.
         :return: The received data.
         """
-        response = []
-        success = self._communication.send(command)
+        start = time.perf_counter()
+        received, response = self._communication.request(command, None, size)
+        success = received
         if success:
-            success, response = self._communication.receive(size)
-            if success:
-                success = response[0] == command
-                if not success:
-                    response = []
-                    logging.error('invalid answer, wrong command')
+            success = response[0] == command
+            if not success:
+                response = []
+                logging.error('invalid answer, wrong command')
+        if self.stats is not None:
+            self._count_command(command, start, received, success)
         return success, response
 
+    def _execute_simple_command_into(self, command: int, buffer: bytearray) -> bool:
+        """
+        Executes a simple command, the response is received into a preallocated buffer.
+
+        :param command: Command to execute.
+        :param buffer: Buffer for the response, its size is the response size.
+        :return: True on success, else false.
+        """
+        start = time.perf_counter()
+        received = self._communication.request_into(self._request_buffer, command, buffer)
+        success = received
+        if success:
+            success = buffer[0] == command
+            if not success:
+                logging.error('invalid answer, wrong command')
+        if self.stats is not None:
+            self._count_command(command, start, received, success)
+        return success
+
     def stop_dsp(self) -> Tuple[bool, List[int]]:
         """
         Executes the command "Stop DSP".
@@ -90,32 +188,86 @@ class Carmen(object):
         """
         logging.info('execute command "Read EEPROM"')
         command = 0x03
-        response = []
-        success = self._communication.send(command, [address >> 8, address & 0xFF, size])
+        start = time.perf_counter()
+        received, response = self._communication.request(command, [address >> 8, address & 0xFF, size], size * 4 + 5)
+        success = received
         if success:
-            success, response = self._communication.receive(size * 4 + 5)
-            if success:
-                success = response[0] == command and response[2] == size
-                if not success:
-                    response = []
-                    logging.error('invalid answer, wrong command or invalid size')
+            success = response[0] == command and response[2] == size
+            if not success:
+                response = []
+                logging.error('invalid answer, wrong command or invalid size')
+        if self.stats is not None:
+            self._count_command(command, start, received, success)
         return success, response
 
+    def _set_typeplate(self, buffer: bytes) -> Tuple[bool, CarmenTypeplate]:
+        """
+        Analyses the raw typeplate and uses it for the following measurements.
+
+        :param buffer: Raw typeplate EEPROM content.
+        :return: True on success, else false.
+        :return: Typeplate information.
+        """
+        success, typeplate = analyse_typeplate(buffer)
+        if success:
+            try:
+                converter = CarmenConverter(typeplate, *self._output_units)
+            except ValueError as error:
+                # a units mistake does not invalidate the typeplate, the units of the typeplate are used
+                logging.error('invalid output units, output units are reset: {}'.format(error))
+                self._output_units = (None, None)
+                converter = CarmenConverter(typeplate)
+            self._typeplate = typeplate
+            self._typeplate_buffer = buffer
+            self._converter = converter
+        return success, typeplate
+
+    def _read_cached_typeplate(self) -> Tuple[bool, CarmenTypeplate]:
+        """
+        Reads the typeplate information from the typeplate cache.
+        The cached typeplate is validated by a single EEPROM read of the date modified, the DSP is not stopped.
+        An outdated entry is removed, an entry which cannot be validated is kept.
+
+        :return: True on success, else false.
+        :return: Typeplate information.
+        """
+        port = self._communication.name
+        buffer = self._typeplate_cache.get(port)
+        if buffer is None:
+            return False, CarmenTypeplate()
+        logging.info('validate cached typeplate of "{}"'.format(port))
+        success, response = self.read_eeprom(VALIDATION_ADDRESS, VALIDATION_SIZE)
+        if not success:
+            logging.error('cannot validate cached typeplate of "{}"'.format(port))
+            return False, CarmenTypeplate()
+        offset = (VALIDATION_ADDRESS - TYPEPLATE_ADDRESS) * 4
+        if bytes(response[3:-2]) != buffer[offset:offset + VALIDATION_SIZE * 4]:
+            logging.info('cached typeplate of "{}" is outdated'.format(port))
+            self._typeplate_cache.remove(port)
+            return False, CarmenTypeplate()
+        return self._set_typeplate(buffer)
+
     def read_typeplate(self) -> Tuple[bool, CarmenTypeplate]:
         """
         Reads the typeplate information.
+        If a typeplate cache is used, a valid cached typeplate is used instead of reading the whole typeplate.
 
         :return: True on success, else false.
         :return: Typeplate information.
         """
+        if self._typeplate_cache is not None:
+            success, typeplate = self._read_cached_typeplate()
+            if success:
+                return success, typeplate
         typeplate = CarmenTypeplate()
         success, _ = self.stop_dsp()
         if success:
-            success, response = self.read_eeprom(0x0190, 12)
+            success, response = self.read_eeprom(TYPEPLATE_ADDRESS, TYPEPLATE_SIZE)
             if success:
-                success, typeplate = analyse_typeplate(response[3:-2])
-                if success:
-                    self._typeplate = typeplate
+                success, typeplate = self._set_typeplate(bytes(response[3:-2]))
+                if success and self._typeplate_cache is not None:
+                    self._typeplate_cache.put(self._communication.name, self._typeplate_buffer,
+                                              typeplate.SerialNumber, typeplate.DateModified.isoformat())
         _, _ = self.continue_dsp()
         return success, typeplate
 
@@ -135,11 +287,116 @@ class Carmen(object):
         if self._typeplate is None:
             success, _ = self.read_typeplate()
         if success:
-            success, data = self.read_measurement_frame1()
+            logging.info('execute command "Read Measurement Frame1"')
+            success = self._execute_simple_command_into(0x35, self._frame1_buffer)
             if success:
-                pressure_value = data[1] | (data[2] << 8) | (data[3] << 16)
-                pressure = convert_digout(pressure_value, 24, self._typeplate.LRV_1, self._typeplate.URV_1)
-                temperature_value = data[4] | (data[5] << 8)
-                temperature = convert_digout(temperature_value, 16, self._typeplate.LRV_2, self._typeplate.URV_2, 25)
-                status = data[8] | (data[9] << 8) | (data[10] << 16)
+                pressure, temperature, status = self._converter.decode_buffer(self._frame1_buffer)
+                if self.recorder is not None:
+                    self.recorder.record(self._frame1_buffer)
         return success, pressure, temperature, status
+
+    def read_measurements(self, count: int, depth: int = 4) -> List[Tuple[bool, float, float, int]]:
+        """
+        Reads several measurements with pipelined "Read Measurement Frame1" commands.
+
+        :param count: Number of measurements to read.
+        :param depth: Maximum number of commands in flight. Default is 4.
+        :return: List of measurements (success, pressure, temperature, status).
+        """
+        success = True
+        if self._typeplate is None:
+            success, _ = self.read_typeplate()
+        if not success:
+            return [(False, 0.0, 0.0, 0xFFFFFF)] * count
+        logging.info('execute command "Read Measurement Frame1" {} times pipelined'.format(count))
+        results = []
+        for success, data in self._communication.transfer_pipelined([(0x35, None, 13)] * count, depth):
+            if success:
+                results.append((True,) + self._converter.decode(data))
+                if self.recorder is not None:
+                    self.recorder.record(bytes(data))
+            else:
+                results.append((False, 0.0, 0.0, 0xFFFFFF))
+        return results
+
+    def start_recording(self, path: str) -> bool:
+        """
+        Starts a binary recording of all measurements.
+        The typeplate is read before if necessary.
+
+        :param path: Path of the recording file.
+        :return: True on success, else false.
+        """
+        success = True
+        if self._typeplate is None:
+            success, _ = self.read_typeplate()
+        if success:
+            self.stop_recording()
+            self.recorder = CarmenRecorder(path, self._typeplate_buffer)
+        return success
+
+    def stop_recording(self) -> None:
+        """
+        Stops the binary recording.
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def start_statistics(self, stats: CarmenStatistics = None) -> CarmenStatistics:
+        """
+        Starts counting the commands of the sensor and of its communication.
+
+        :param stats: Statistics to update. Default is None (new statistics labeled with the port name).
+        :return: The statistics.
+        """
+        if stats is None:
+            stats = CarmenStatistics(self._communication.name)
+        self.stats = stats
+        self._communication.stats = stats
+        return stats
+
+    def stop_statistics(self) -> None:
+        """
+        Stops counting the commands.
+        """
+        self.stats = None
+        self._communication.stats = None
+
+    def start_acquisition(self, buffer_size: int = 4096, depth: int = 1) -> Tuple[bool, CarmenAcquisition]:
+        """
+        Starts a continuous acquisition in a background reader thread.
+
+        :param buffer_size: Maximum number of buffered samples. Default is 4096.
+        :param depth: Number of pipelined commands in flight. Default is 1 (no pipelining).
+        :return: True on success, else false.
+        :return: The running acquisition.
+        """
+        if self._acquisition is None or not self._acquisition.is_running:
+            self._acquisition = CarmenAcquisition(self, buffer_size, depth)
+        success = self._acquisition.start()
+        return success, self._acquisition
+
+    def stop_acquisition(self) -> None:
+        """
+        Stops a running continuous acquisition.
+        """
+        if self._acquisition is not None:
+            self._acquisition.stop()
+
+    def stream(self, buffer_size: int = 4096, depth: int = 1) -> Iterator[Sample]:
+        """
+        Streams measurements from a continuous acquisition.
+        The acquisition is stopped when the iterator is closed.
+
+        :param buffer_size: Maximum number of buffered samples. Default is 4096.
+        :param depth: Number of pipelined commands in flight. Default is 1 (no pipelining).
+        :return: Iterator of samples.
+        """
+        success, acquisition = self.start_acquisition(buffer_size, depth)
+        if not success:
+            return
+        try:
+            yield from acquisition
+        finally:
+            self.stop_acquisition()
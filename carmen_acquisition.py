@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Iterator, List
+
+from carmen_sample import Sample, SampleBuffer
+
+
+class CarmenAcquisition(object):
+    """
+    Continuous acquisition of measurements from a Carmen sensor.
+    A background reader thread polls the sensor back-to-back and stores the samples in a bounded ring buffer.
+    Subclasses change the polling by overriding _run.
+    """
+
+    def __init__(self, carmen, buffer_size: int = 4096, depth: int = 1) -> None:
+        """
+        Initializes a instance of CarmenAcquisition.
+
+        :param carmen: Carmen sensor to poll.
+        :param buffer_size: Maximum number of buffered samples. If the buffer is full the oldest samples are dropped.
+        :param depth: Number of pipelined commands in flight. Default is 1 (no pipelining).
+        """
+        self._carmen = carmen
+        self._depth = depth
+        self._buffer = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if the reader thread is running, else false.
+        """
+        return self._running
+
+    def start(self) -> bool:
+        """
+        Starts the reader thread.
+        The typeplate is read before if necessary.
+
+        :return: True on success, else false.
+        """
+        if self._running:
+            return True
+        success = True
+        if self._carmen.typeplate is None:
+            success, _ = self._carmen.read_typeplate()
+        if success:
+            self._running = True
+            self._thread = threading.Thread(target=self._thread_main, name=type(self).__name__, daemon=True)
+            self._thread.start()
+        else:
+            logging.error('cannot start acquisition, typeplate not available')
+        return success
+
+    def stop(self) -> None:
+        """
+        Stops the reader thread and waits until it is finished.
+        Already buffered samples can still be read.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def _store(self, samples: List[Sample], errors: int = 0) -> None:
+        """
+        Stores samples in the buffer and wakes up the waiting readers.
+
+        :param samples: Samples of successful measurements.
+        :param errors: Number of failed measurements. Default is 0.
+        """
+        with self._condition:
+            self.errors += errors
+            for sample in samples:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.dropped += 1
+                self._buffer.append(sample)
+            if samples:
+                self._condition.notify_all()
+
+    def _thread_main(self) -> None:
+        """
+        Entry of the reader thread, runs the polling of _run.
+        If the polling fails with an exception the acquisition is stopped, so waiting readers do not block forever.
+        """
+        try:
+            self._run()
+        except Exception:
+            logging.exception('acquisition stopped by an error')
+        finally:
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
+
+    def _run(self) -> None:
+        """
+        Reader thread, polls the sensor until the acquisition is stopped.
+        """
+        while self._running:
+            start = time.monotonic()
+            if self._depth > 1:
+                measurements = self._carmen.read_measurements(self._depth, self._depth)
+            else:
+                measurements = [self._carmen.read_measurement()]
+            # the responses of a pipelined batch arrive evenly spread over the batch duration
+            step = (time.monotonic() - start) / len(measurements)
+            self._store([Sample(start + (index + 1) * step, pressure, temperature, status)
+                         for index, (success, pressure, temperature, status) in enumerate(measurements) if success],
+                        sum(1 for measurement in measurements if not measurement[0]))
+
+    def read(self, max_count: int = None, timeout: float = None) -> List[Sample]:
+        """
+        Reads a batch of samples from the buffer.
+        Waits until at least one sample is available, the timeout is expired or the acquisition is stopped.
+
+        :param max_count: Maximum number of samples to read. Default is None (all buffered samples).
+        :param timeout: Maximum time to wait in seconds. Default is None (wait forever).
+        :return: List of samples.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._buffer or not self._running, timeout)
+            count = len(self._buffer)
+            if max_count is not None:
+                count = min(count, max_count)
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def read_into(self, buffer: SampleBuffer, max_count: int = None, timeout: float = None) -> int:
+        """
+        Reads a batch of samples from the buffer and appends them to a columnar sample buffer.
+        Waits until at least one sample is available, the timeout is expired or the acquisition is stopped.
+
+        :param buffer: Columnar sample buffer to append to.
+        :param max_count: Maximum number of samples to read. Default is None (all buffered samples).
+        :param timeout: Maximum time to wait in seconds. Default is None (wait forever).
+        :return: Number of read samples.
+        """
+        samples = self.read(max_count, timeout)
+        buffer.extend(samples)
+        return len(samples)
+
+    def __iter__(self) -> Iterator[Sample]:
+        """
+        Iterates over the acquired samples until the acquisition is stopped and the buffer is empty.
+
+        :return: Iterator of samples.
+        """
+        while True:
+            samples = self.read()
+            if not samples:
+                return
+            yield from samples
@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from serial import Serial
+
+from carmen_frame import FrameParser
+from carmen_trace import HexBytes
+from carmen_utils import CarmenConverter, CarmenTypeplate, analyse_typeplate
+from crc16 import calculate_crc16
+
+
+class AsyncCommunicationCarmen(object):
+    """
+    Simple class to handle the communication to the Carmen sensor with asyncio streams.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float = 1.0,
+                 resources: List = None) -> None:
+        """
+        Initializes the communication.
+
+        :param reader: Stream to read from the Carmen sensor.
+        :param writer: Stream to write to the Carmen sensor.
+        :param timeout: Read timeout in seconds. Default is 1.0.
+        :param resources: Objects which are closed with the communication. Default is None.
+        """
+        self._reader = reader
+        self._writer = writer
+        self._timeout = timeout
+        self._resources = list(resources or [])
+        # received data which is not consumed yet, it is discarded after a failed receive
+        self._parser = FrameParser()
+
+    def close(self) -> None:
+        """
+        Closes the communication.
+        """
+        self._writer.close()
+        for resource in self._resources:
+            resource.close()
+        self._resources = []
+
+    async def _send_raw(self, data: List[int]) -> bool:
+        """
+        Sends the given data to the Carmen sensor.
+
+        :param data: Date to send.
+        :return: True on success, else false.
+        """
+        logging.info('send -> %s', HexBytes(data))
+        try:
+            self._writer.write(bytes(data))
+            await self._writer.drain()
+        except (ConnectionError, OSError) as error:
+            logging.error('write failed: {}'.format(error))
+            return False
+        return True
+
+    async def send(self, command: int, data: List[int] = None) -> bool:
+        """
+        Sends a command with the given data to the Carmen sensor.
+        The CRC16 is calculated and appended.
+
+        :param command: Command to send.
+        :param data: Data to send if necessary. Default ist None.
+        :return: True on success, else false.
+        """
+        if data is None:
+            data = []
+        crc = calculate_crc16([command] + data)
+        return await self._send_raw([command] + data + [crc & 0xFF, crc >> 8])
+
+    async def _fill(self, size: int, command: int = None, deadline: float = None) -> Optional[bytes]:
+        """
+        Reads data into the frame parser until the next frame is complete.
+
+        :param size: Expected frame size.
+        :param command: Expected command, None to take the next size bytes without parsing. Default is None.
+        :param deadline: Read deadline (time of the event loop). Default is None (now plus the read timeout).
+        :return: The frame or None on timeout or end of stream.
+        """
+        loop = asyncio.get_running_loop()
+        if deadline is None:
+            deadline = loop.time() + self._timeout
+        parser = self._parser
+        while True:
+            if command is not None:
+                frame = parser.next_frame(command, size)
+                if frame is not None:
+                    return frame
+            elif len(parser.buffer) >= size:
+                return parser.take(size)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                logging.error('read timeout after {} s'.format(self._timeout))
+                return None
+            try:
+                # cancelling a pending read does not consume data
+                data = await asyncio.wait_for(self._reader.read(parser.missing(size)), remaining)
+            except asyncio.TimeoutError:
+                logging.error('read timeout after {} s'.format(self._timeout))
+                return None
+            if not data:
+                logging.error('read failed, end of stream')
+                return None
+            parser.feed(data)
+
+    async def _receive_raw(self, size: int) -> Tuple[bool, List[int]]:
+        """
+        Receives data from the Carmen sensor.
+        Incomplete data is discarded on timeout, so it does not shift the next response.
+
+        :param size: Number of bytes to receive.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        data = await self._fill(size)
+        if data is None:
+            self._parser.clear()
+            return False, []
+        logging.info('read <- %s', HexBytes(data))
+        return True, list(data)
+
+    async def receive(self, size: int) -> Tuple[bool, List[int]]:
+        """
+        Receives data from the Carmen sensor.
+        The CRC16 is checked.
+
+        :param size: Number of bytes to receive.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        success, data = await self._receive_raw(size)
+        if success:
+            # check crc
+            success = calculate_crc16(data[:-2]) == (data[-2] + (data[-1] << 8))
+            if not success:
+                logging.error('invalid crc')
+                self._parser.clear()
+        return success, data
+
+    async def receive_frame(self, command: int, size: int) -> Tuple[bool, List[int]]:
+        """
+        Receives the response of the given command from the Carmen sensor.
+        The stream is scanned for the next frame with the command byte and a valid CRC16, so the stream is
+        resynchronized after incomplete or corrupted responses.
+
+        :param command: Expected command.
+        :param size: Expected response size.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        skipped = self._parser.skipped
+        frame = await self._fill(size, command)
+        if self._parser.skipped != skipped:
+            logging.error('stream resynchronized, {} bytes skipped'.format(self._parser.skipped - skipped))
+        if frame is None:
+            return False, []
+        logging.info('read <- %s', HexBytes(frame))
+        return True, list(frame)
+
+
+async def open_serial_communication(port: str, baudrate: int = 57600, timeout: float = 1.0) -> AsyncCommunicationCarmen:
+    """
+    Opens a serial port (or pty) and connects it to the running event loop.
+    The port is configured with pyserial and read and written by non-blocking pipe transports (POSIX only).
+
+    :param port: Name of the serial port.
+    :param baudrate: Connection baudrate. Default is 57600.
+    :param timeout: Read timeout in seconds. Default is 1.0.
+    :return: The communication for the Carmen sensor.
+    """
+    loop = asyncio.get_running_loop()
+    serial = Serial(port, baudrate, timeout=0)
+    if not serial.is_open:
+        raise IOError('Cannot open serial "{}"'.format(port))
+
+    reader = asyncio.StreamReader()
+    read_pipe = os.fdopen(os.dup(serial.fileno()), 'rb', buffering=0)
+    read_transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), read_pipe)
+    write_pipe = os.fdopen(os.dup(serial.fileno()), 'wb', buffering=0)
+    # the protocol of the write pipe only provides the flow control for drain, it never receives data
+    write_transport, write_protocol = await loop.connect_write_pipe(
+        lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader()), write_pipe)
+    writer = asyncio.StreamWriter(write_transport, write_protocol, None, loop)
+
+    communication = AsyncCommunicationCarmen(reader, writer, timeout, [read_transport, serial])
+    logging.info('serial "{}" is open'.format(port))
+    return communication
+
+
+class AsyncCarmen(object):
+    """
+    Simple class to handle the Carmen sensor functions with coroutines.
+    """
+
+    def __init__(self, communication: AsyncCommunicationCarmen) -> None:
+        """
+        Initializes a instance of AsyncCarmen.
+
+        :param communication: Asynchronous communication for the Carmen sensor.
+        """
+        self._communication = communication
+        self._typeplate = None
+        self._converter = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def typeplate(self) -> CarmenTypeplate:
+        """
+        :return: The last read typeplate information or None.
+        """
+        return self._typeplate
+
+    @property
+    def converter(self) -> CarmenConverter:
+        """
+        :return: The converter of the last read typeplate information or None.
+        """
+        return self._converter
+
+    async def _transfer(self, command: int, data: List[int], size: int) -> Tuple[bool, List[int]]:
+        """
+        Sends a command and receives the response.
+        Concurrent transfers to the same sensor are serialized.
+
+        :param command: Command to send.
+        :param data: Data to send.
+        :param size: Response size for the given command.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        response = []
+        async with self._lock:
+            success = await self._communication.send(command, data)
+            if success:
+                success, response = await self._communication.receive_frame(command, size)
+        return success, response
+
+    async def _execute_simple_command(self, command: int, size: int) -> Tuple[bool, List[int]]:
+        """
+        Executes a simple command.
+
+        :param command: Command to execute.
+        :param size: Response size for the given command.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        success, response = await self._transfer(command, None, size)
+        if success:
+            success = response[0] == command
+            if not success:
+                response = []
+                logging.error('invalid answer, wrong command')
+        return success, response
+
+    async def stop_dsp(self) -> Tuple[bool, List[int]]:
+        """
+        Executes the command "Stop DSP".
+
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        logging.info('execute command "Stop DSP"')
+        return await self._execute_simple_command(0xA0, 4)
+
+    async def continue_dsp(self) -> Tuple[bool, List[int]]:
+        """
+        Executes the command "Continue DSP".
+
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        logging.info('execute command "Continue DSP"')
+        return await self._execute_simple_command(0xA1, 4)
+
+    async def soft_reset(self) -> Tuple[bool, List[int]]:
+        """
+        Executes the command "Soft Reset".
+
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        logging.info('execute command "Soft Reset"')
+        return await self._execute_simple_command(0x5A, 4)
+
+    async def read_measurement_frame1(self) -> Tuple[bool, List[int]]:
+        """
+        Executes the command "Read Measurement Frame1".
+
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        logging.info('execute command "Read Measurement Frame1"')
+        return await self._execute_simple_command(0x35, 13)
+
+    async def read_eeprom(self, address: int, size: int = 1) -> Tuple[bool, List[int]]:
+        """
+        Executes the command "Read EEPROM".
+
+        :param address: Start address to read from EEPROM.
+        :param size: Block size to read.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        logging.info('execute command "Read EEPROM"')
+        command = 0x03
+        success, response = await self._transfer(command, [address >> 8, address & 0xFF, size], size * 4 + 5)
+        if success:
+            success = response[0] == command and response[2] == size
+            if not success:
+                response = []
+                logging.error('invalid answer, wrong command or invalid size')
+        return success, response
+
+    async def read_typeplate(self) -> Tuple[bool, CarmenTypeplate]:
+        """
+        Reads the typeplate information.
+
+        :return: True on success, else false.
+        :return: Typeplate information.
+        """
+        typeplate = CarmenTypeplate()
+        success, _ = await self.stop_dsp()
+        if success:
+            success, response = await self.read_eeprom(0x0190, 12)
+            if success:
+                success, typeplate = analyse_typeplate(response[3:-2])
+                if success:
+                    self._typeplate = typeplate
+                    self._converter = CarmenConverter(typeplate)
+        _, _ = await self.continue_dsp()
+        return success, typeplate
+
+    async def read_measurement(self) -> Tuple[bool, float, float, int]:
+        """
+        Reads a measurement (pressure, temperature, status) from the Carmen sensor.
+
+        :return: True on success, else false.
+        :return: Pressure value.
+        :return: Temperature value.
+        :return: Actual status.
+        """
+        pressure = 0.0
+        temperature = 0.0
+        status = 0xFFFFFF
+        success = True
+        if self._typeplate is None:
+            success, _ = await self.read_typeplate()
+        if success:
+            success, data = await self.read_measurement_frame1()
+            if success:
+                pressure, temperature, status = self._converter.decode(data)
+        return success, pressure, temperature, status
@@ -0,0 +1,64 @@
+from typing import Tuple, Union
+
+import numpy as np
+
+from carmen_utils import CarmenConverter, CarmenTypeplate, DigOutConverter
+
+FRAME1_SIZE = 13
+
+
+def convert_digout_batch(values: np.ndarray, bits: int, lrv: float, urv: float, offset: float = 0.0) -> np.ndarray:
+    """
+    Converts digital output values (fixed point format) into float values corresponding to the given limits.
+    Vectorized version of convert_digout.
+
+    :param values: Digital output values (unsigned).
+    :param bits: Number of bits used in the fixed point format.
+    :param lrv: Lower range limit.
+    :param urv: Upper range limit.
+    :param offset: Zero offset. Default is 0.0.
+    :return: Float values.
+    """
+    return DigOutConverter(bits, lrv, urv, offset).convert_batch(values)
+
+
+def decode_measurement_batch(buffer: Union[bytes, bytearray, memoryview],
+                             typeplate: Union[CarmenTypeplate, CarmenConverter]
+                             ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodes many responses of the command "Read Measurement Frame1" at once.
+
+    :param buffer: Contiguous responses, each with a size of 13 bytes.
+    :param typeplate: Typeplate information or converter of the sensor.
+    :return: Pressure values.
+    :return: Temperature values.
+    :return: Status values.
+    """
+    frames = np.frombuffer(buffer, dtype=np.uint8)
+    if frames.size % FRAME1_SIZE:
+        raise ValueError('buffer size {} is not a multiple of {}'.format(frames.size, FRAME1_SIZE))
+    return decode_frames(frames.reshape(-1, FRAME1_SIZE), typeplate)
+
+
+def decode_frames(frames: np.ndarray,
+                  typeplate: Union[CarmenTypeplate, CarmenConverter]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodes many responses of the command "Read Measurement Frame1" at once.
+
+    :param frames: Array of responses with the shape (count, 13), can be a strided view.
+    :param typeplate: Typeplate information or converter of the sensor.
+    :return: Pressure values.
+    :return: Temperature values.
+    :return: Status values.
+    """
+    converter = typeplate if isinstance(typeplate, CarmenConverter) else CarmenConverter(typeplate)
+
+    def column(index: int) -> np.ndarray:
+        return frames[:, index].astype(np.uint32)
+
+    pressure_values = column(1) | (column(2) << 8) | (column(3) << 16)
+    pressure = converter.pressure.convert_batch(pressure_values)
+    temperature_values = column(4) | (column(5) << 8)
+    temperature = converter.temperature.convert_batch(temperature_values)
+    status = column(8) | (column(9) << 8) | (column(10) << 16)
+    return pressure, temperature, status
@@ -0,0 +1,171 @@
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from serial import Serial
+
+from carmen_communication import CommunicationCarmen
+from carmen_policy import RetryPolicy
+from carmen_store import PortStore
+
+# candidate baudrates of the link calibration, in ascending order
+CANDIDATE_BAUDRATES = (57600, 115200, 230400, 460800, 921600)
+
+
+class LinkResult(object):
+    """
+    Result of a burst of "Read Measurement Frame1" commands at a baudrate.
+    """
+
+    __slots__ = ('baudrate', 'requests', 'responses', 'crc_errors', 'skipped', 'duration')
+
+    def __init__(self, baudrate: int, requests: int = 0, responses: int = 0, crc_errors: int = 0, skipped: int = 0,
+                 duration: float = 0.0) -> None:
+        """
+        Initializes the result.
+
+        :param baudrate: Tested baudrate.
+        :param requests: Number of sent commands. Default is 0.
+        :param responses: Number of valid responses. Default is 0.
+        :param crc_errors: Number of received frames with an invalid CRC16. Default is 0.
+        :param skipped: Number of skipped bytes. Default is 0.
+        :param duration: Duration of the burst in seconds. Default is 0.0.
+        """
+        self.baudrate = baudrate
+        self.requests = requests
+        self.responses = responses
+        self.crc_errors = crc_errors
+        self.skipped = skipped
+        self.duration = duration
+
+    @property
+    def goodput(self) -> float:
+        """
+        :return: Bytes of valid responses per second.
+        """
+        return self.responses * 13 / self.duration if self.duration else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """
+        :return: Fraction of the commands without a valid response, 1.0 without commands.
+        """
+        return 1.0 - self.responses / self.requests if self.requests else 1.0
+
+    def __repr__(self) -> str:
+        return '{} baud: {}/{} responses, {} crc errors, {:.0f} B/s'.format(self.baudrate, self.responses,
+                                                                            self.requests, self.crc_errors,
+                                                                            self.goodput)
+
+
+def benchmark_link(communication: CommunicationCarmen, count: int = 200, depth: int = 1) -> LinkResult:
+    """
+    Runs a burst of "Read Measurement Frame1" commands on an open link.
+    A single probe is sent first, so a baudrate without any response fails fast.
+
+    :param communication: Communication to the Carmen sensor.
+    :param count: Number of commands of the burst. Default is 200.
+    :param depth: Maximum number of commands in flight. Default is 1 (no pipelining).
+    :return: The result of the burst.
+    """
+    result = LinkResult(communication.baudrate)
+    crc_errors = communication.crc_errors
+    skipped = communication.skipped
+    start = time.perf_counter()
+    success, _ = communication.transfer_pipelined([(0x35, None, 13)], 1)[0]
+    result.requests = 1
+    if success:
+        results = communication.transfer_pipelined([(0x35, None, 13)] * (count - 1), depth)
+        result.requests += len(results)
+        result.responses = 1 + sum(1 for success, _ in results if success)
+    result.duration = time.perf_counter() - start
+    result.crc_errors = communication.crc_errors - crc_errors
+    result.skipped = communication.skipped - skipped
+    return result
+
+
+def calibrate_link(serial: Serial, baudrates: List[int] = CANDIDATE_BAUDRATES, count: int = 200,
+                   max_error_rate: float = 0.0, timeout: float = 0.1) -> Tuple[bool, int, List[LinkResult]]:
+    """
+    Finds the fastest baudrate with a reliable link to a Carmen sensor.
+    The protocol has no command to change the baudrate of the sensor, so the port is reopened at every candidate
+    baudrate and the baudrates which the sensor (or the adapter) does not sustain fail the burst.
+
+    :param serial: Serial connection to the Carmen sensor, reopened for every baudrate.
+    :param baudrates: Candidate baudrates. Default is CANDIDATE_BAUDRATES.
+    :param count: Number of commands per baudrate. Default is 200.
+    :param max_error_rate: Maximum fraction of failed commands of a reliable link. Default is 0.0.
+    :param timeout: Read timeout of every command in seconds. Default is 0.1.
+    :return: True if a reliable baudrate is found, else false.
+    :return: The fastest reliable baudrate or None.
+    :return: The results of all baudrates.
+    """
+    results = []
+    for baudrate in baudrates:
+        communication = CommunicationCarmen(serial, baudrate, RetryPolicy(retries=0, maximum_timeout=timeout))
+        communication.log_protocol = False
+        result = benchmark_link(communication, count)
+        # the communication closes the port when it is deleted, so delete it before the port is reopened
+        del communication
+        logging.info('link calibration of "{}": {}'.format(serial.name, result))
+        results.append(result)
+    reliable = [result for result in results if result.responses and result.error_rate <= max_error_rate]
+    if not reliable:
+        logging.error('no reliable baudrate for "{}"'.format(serial.name))
+        return False, None, results
+    return True, max(reliable, key=lambda result: result.goodput).baudrate, results
+
+
+class LinkCalibration(PortStore):
+    """
+    Persistent calibrated baudrates by port.
+    """
+
+    version = 1
+    description = 'link calibration'
+
+    def get(self, port: str, default: int = None) -> Optional[int]:
+        """
+        Returns the calibrated baudrate of a port.
+
+        :param port: Name of the port.
+        :param default: Baudrate of a port which is not calibrated. Default is None.
+        :return: The baudrate.
+        """
+        entry = self._get(port)
+        return default if entry is None else entry['Baudrate']
+
+    def put(self, port: str, result: LinkResult) -> None:
+        """
+        Stores the calibrated baudrate of a port and writes the calibration file.
+
+        :param port: Name of the port.
+        :param result: Result of the selected baudrate.
+        """
+        self._put(port, {'Baudrate': result.baudrate,
+                         'Goodput': round(result.goodput, 1),
+                         'ErrorRate': result.error_rate,
+                         'Date': datetime.now().isoformat(timespec='seconds')})
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Finds the fastest reliable baudrate of Carmen sensors.')
+    parser.add_argument('ports', nargs='+', help='serial ports of the sensors')
+    parser.add_argument('-b', '--baudrates', type=int, nargs='+', default=CANDIDATE_BAUDRATES,
+                        help='candidate baudrates')
+    parser.add_argument('-n', '--count', type=int, default=200, help='number of commands per baudrate')
+    parser.add_argument('--max-error-rate', type=float, default=0.0, help='maximum fraction of failed commands')
+    parser.add_argument('-o', '--output', help='store the calibrated baudrates in this JSON file')
+    arguments = parser.parse_args()
+
+    calibration = LinkCalibration(arguments.output) if arguments.output else None
+    for port in arguments.ports:
+        found, best, port_results = calibrate_link(Serial(port), arguments.baudrates, arguments.count,
+                                                   arguments.max_error_rate)
+        for port_result in port_results:
+            print('{}: {}{}'.format(port, port_result, ' *' if port_result.baudrate == best else ''))
+        if found and calibration is not None:
+            calibration.put(port, next(result for result in port_results if result.baudrate == best))
@@ -0,0 +1,151 @@
+import threading
+import time
+from typing import List, Tuple
+
+from carmen import Carmen
+from carmen_utils import CarmenTypeplate, system_rate_period
+
+# result of a failed measurement
+_FAILED = (False, 0.0, 0.0, 0xFFFFFF)
+
+
+class CoalescingCarmen(object):
+    """
+    Thread-safe access to a Carmen sensor.
+    All commands are serialized by a bus lock. Concurrent measurement reads are coalesced into a single command
+    and a valid measurement is reused for the measurement period of the sensor (the system rate of the typeplate),
+    because the sensor does not provide a new value within this period.
+    """
+
+    def __init__(self, carmen: Carmen, ttl: float = None) -> None:
+        """
+        Initializes a instance of CoalescingCarmen.
+
+        :param carmen: Carmen sensor, it must not be used directly by other threads.
+        :param ttl: Time to reuse a measurement in seconds. Default is None (period of the system rate).
+        """
+        self._carmen = carmen
+        self._ttl = ttl
+        self._bus_lock = threading.RLock()
+        self._condition = threading.Condition()
+        self._in_flight = False
+        self._generation = 0
+        self._last = _FAILED
+        self._cached = None
+        self._cached_time = 0.0
+        # number of commands, of reads which joined a command in flight and of reads from the cache
+        self.reads = 0
+        self.coalesced = 0
+        self.hits = 0
+
+    @property
+    def carmen(self) -> Carmen:
+        """
+        :return: The Carmen sensor, use it only while holding the bus lock.
+        """
+        return self._carmen
+
+    @property
+    def bus_lock(self) -> threading.RLock:
+        """
+        :return: Lock of the serial bus, to execute a sequence of commands without interruption.
+        """
+        return self._bus_lock
+
+    @property
+    def ttl(self) -> float:
+        """
+        :return: Time to reuse a measurement in seconds, 0.0 while the typeplate is unknown.
+        """
+        if self._ttl is not None:
+            return self._ttl
+        typeplate = self._carmen.typeplate
+        if typeplate is None or typeplate.SystemRate is None:
+            return 0.0
+        return system_rate_period(typeplate.SystemRate)
+
+    @property
+    def typeplate(self) -> CarmenTypeplate:
+        """
+        :return: The last read typeplate information or None.
+        """
+        return self._carmen.typeplate
+
+    def invalidate(self) -> None:
+        """
+        Discards the cached measurement.
+        """
+        with self._condition:
+            self._cached = None
+
+    def read_measurement(self) -> Tuple[bool, float, float, int]:
+        """
+        Reads a measurement (pressure, temperature, status).
+        A valid measurement which is younger than the ttl is returned without a command. If a command is already
+        in flight, its result is returned.
+
+        :return: True on success, else false.
+        :return: Pressure value.
+        :return: Temperature value.
+        :return: Actual status.
+        """
+        with self._condition:
+            if self._cached is not None and time.monotonic() - self._cached_time < self.ttl:
+                self.hits += 1
+                return self._cached
+            if self._in_flight:
+                generation = self._generation
+                self._condition.wait_for(lambda: self._generation != generation)
+                self.coalesced += 1
+                return self._last
+            self._in_flight = True
+            self.reads += 1
+        result = _FAILED
+        try:
+            with self._bus_lock:
+                result = self._carmen.read_measurement()
+        finally:
+            with self._condition:
+                self._last = result
+                if result[0]:
+                    self._cached = result
+                    self._cached_time = time.monotonic()
+                self._in_flight = False
+                self._generation += 1
+                self._condition.notify_all()
+        return result
+
+    def read_measurements(self, count: int, depth: int = 4) -> List[Tuple[bool, float, float, int]]:
+        """
+        Reads several measurements with pipelined commands, the cache is not used.
+
+        :param count: Number of measurements to read.
+        :param depth: Maximum number of commands in flight. Default is 4.
+        :return: List of measurements (success, pressure, temperature, status).
+        """
+        with self._bus_lock:
+            return self._carmen.read_measurements(count, depth)
+
+    def read_typeplate(self) -> Tuple[bool, CarmenTypeplate]:
+        """
+        Reads the typeplate information and discards the cached measurement.
+
+        :return: True on success, else false.
+        :return: Typeplate information.
+        """
+        with self._bus_lock:
+            result = self._carmen.read_typeplate()
+        self.invalidate()
+        return result
+
+    def read_eeprom(self, address: int, size: int = 1) -> Tuple[bool, List[int]]:
+        """
+        Executes the command "Read EEPROM".
+
+        :param address: Start address to read from EEPROM.
+        :param size: Block size to read.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        with self._bus_lock:
+            return self._carmen.read_eeprom(address, size)
@@ -1,8 +1,14 @@
 import logging
-from typing import List, Tuple
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple, Union
 
 from serial import Serial
 
+from carmen_frame import FrameParser
+from carmen_policy import RetryPolicy
+from carmen_stats import CarmenStatistics
+from carmen_trace import TRACE_RECEIVE, TRACE_SEND, HexBytes, ProtocolTrace
 from crc16 import calculate_crc16
 
 
@@ -11,20 +17,36 @@ class CommunicationCarmen(object):
     Simple class to handle the communication to the Carmen sensor.
     """
 
-    def __init__(self, serial: Serial, baudrate: int = 57600) -> None:
+    def __init__(self, serial: Serial, baudrate: int = 57600, policy: RetryPolicy = None) -> None:
         """
         Initializes the communication.
 
         :param serial: Reference to a serial connection.
         :param baudrate: Connection baudrate. Default is 57600.
+        :param policy: Timeout and retry policy of the requests. Default is None (RetryPolicy with default parameters).
         """
         self.__serial = serial
+        self.__baudrate = baudrate
+        # timeout and retry policy of request/request_into, None to use the timeout of the receive functions
+        self.policy = RetryPolicy() if policy is None else policy
+        # read timeout of the receive functions without policy in seconds
+        self.timeout = self.policy.maximum_timeout
+        # log every frame as hex string, disable to remove the logging from the hot path
+        self.log_protocol = True
+        # optional binary trace of every frame
+        self.trace = None
+        # optional counters and latency histograms by command
+        self.stats = None  # type: CarmenStatistics
+        # last sent command, the statistics of the plain receive functions are counted for it
+        self._last_command = None
+        # parser for the resynchronizing receive functions
+        self._parser = FrameParser()
 
         # close if serial is open to set baudrate and timeout
         if self.__serial.is_open:
             self.__serial.close()
         self.__serial.baudrate = baudrate
-        self.__serial.timeout = 1
+        self.__serial.timeout = self.timeout
 
         self.__serial.open()
 
@@ -40,15 +62,70 @@ class CommunicationCarmen(object):
         """
         self.__serial.close()
 
-    def _send_raw(self, data: List[int]) -> bool:
+    @property
+    def name(self) -> str:
+        """
+        :return: Name of the serial port.
+        """
+        return self.__serial.name
+
+    @property
+    def baudrate(self) -> int:
+        """
+        :return: Connection baudrate.
+        """
+        return self.__baudrate
+
+    @property
+    def crc_errors(self) -> int:
+        """
+        :return: Number of received frames with an invalid CRC16.
+        """
+        return self._parser.crc_errors
+
+    @property
+    def skipped(self) -> int:
+        """
+        :return: Number of received bytes which were skipped to resynchronize the stream.
+        """
+        return self._parser.skipped
+
+    def start_trace(self, path: str) -> None:
+        """
+        Starts a binary trace of all sent and received frames.
+
+        :param path: Path of the trace file, new records are appended.
+        """
+        self.stop_trace()
+        self.trace = ProtocolTrace(path)
+
+    def stop_trace(self) -> None:
+        """
+        Stops the binary trace.
+        """
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def _send_raw(self, data: Union[List[int], bytes, bytearray, memoryview]) -> bool:
         """
         Sends the given data to the Carmen sensor.
 
-        :param data: Date to send.
+        :param data: Date to send, bytes-like data is written without conversion.
         :return: True on success, else false.
         """
-        logging.info('send -> {}'.format(' '.join('0x{:02X}'.format(x) for x in data)))
-        written_bytes_len = self.__serial.write(bytes(data))
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+        if self.log_protocol:
+            logging.info('send -> %s', HexBytes(data))
+        if self.trace is not None:
+            self.trace.record(TRACE_SEND, data)
+        if self.stats is not None:
+            self._last_command = data[0]
+            statistics = self.stats.command(data[0])
+            statistics.requests += 1
+            statistics.bytes_sent += len(data)
+        written_bytes_len = self.__serial.write(data)
         return written_bytes_len == len(data)
 
     def send(self, command: int, data: List[int] = None) -> bool:
@@ -65,6 +142,53 @@ class CommunicationCarmen(object):
         crc = calculate_crc16([command] + data)
         return self._send_raw([command] + data + [crc & 0xFF, crc >> 8])
 
+    def send_into(self, buffer: bytearray, command: int, data: Union[bytes, bytearray, memoryview] = b'') -> bool:
+        """
+        Composes a command with the given data in a preallocated buffer and sends it to the Carmen sensor.
+        The CRC16 is calculated and appended.
+
+        :param buffer: Buffer for the frame, at least len(data) + 3 bytes.
+        :param command: Command to send.
+        :param data: Data to send if necessary. Default is empty.
+        :return: True on success, else false.
+        """
+        size = len(data) + 1
+        view = memoryview(buffer)
+        view[0] = command
+        view[1:size] = data
+        crc = calculate_crc16(view[:size])
+        view[size] = crc & 0xFF
+        view[size + 1] = crc >> 8
+        return self._send_raw(view[:size + 2])
+
+    def _count_response(self, command: int, size: int, success: bool, crc_error: bool) -> None:
+        """
+        Updates the statistics of a received response.
+        Every receive is counted once, either as response, as CRC error or as timeout.
+
+        :param command: Expected command.
+        :param size: Number of received bytes.
+        :param success: True if a valid response is received, else false.
+        :param crc_error: True if the receive failed because of an invalid CRC16, else false.
+        """
+        statistics = self.stats.command(command)
+        statistics.bytes_received += size
+        if success:
+            statistics.responses += 1
+        elif crc_error:
+            statistics.crc_errors += 1
+        else:
+            statistics.timeouts += 1
+
+    def _set_timeout(self, timeout: float) -> None:
+        """
+        Sets the read timeout of the serial port, the port is only reconfigured if the timeout changes.
+
+        :param timeout: Read timeout in seconds.
+        """
+        if self.__serial.timeout != timeout:
+            self.__serial.timeout = timeout
+
     def _receive_raw(self, size: int) -> Tuple[bool, List[int]]:
         """
         Receives data from the Carmen sensor.
@@ -73,8 +197,15 @@ class CommunicationCarmen(object):
         :return: True on success, else false.
         :return: The received data.
         """
-        data = list(self.__serial.read(size))
-        logging.info('read <- {}'.format(' '.join('0x{:02X}'.format(x) for x in data)))
+        # data which is buffered by the frame parser is received first
+        data = list(self._parser.take(size))
+        if len(data) < size:
+            self._set_timeout(self.timeout)
+            data += self.__serial.read(size - len(data))
+        if self.log_protocol:
+            logging.info('read <- %s', HexBytes(data))
+        if self.trace is not None:
+            self.trace.record(TRACE_RECEIVE, data)
         success = size == len(data)
         if not success:
             logging.error('read timeout after {} s'.format(self.__serial.timeout))
@@ -96,4 +227,250 @@ class CommunicationCarmen(object):
             success = calculate_crc16(data[:-2]) == (data[-2] + (data[-1] << 8))
             if not success:
                 logging.error('invalid crc')
+            if self.stats is not None:
+                self._count_response(self._last_command, len(data), success, not success)
+        elif self.stats is not None:
+            self._count_response(self._last_command, 0, False, False)
         return success, data
+
+    def _receive_raw_into(self, buffer: Union[bytearray, memoryview]) -> bool:
+        """
+        Receives data from the Carmen sensor into a preallocated buffer.
+
+        :param buffer: Buffer to fill completely.
+        :return: True on success, else false.
+        """
+        self._set_timeout(self.timeout)
+        size = self.__serial.readinto(buffer)
+        if self.log_protocol:
+            logging.info('read <- %s', HexBytes(buffer[:size]))
+        if self.trace is not None:
+            self.trace.record(TRACE_RECEIVE, buffer[:size])
+        success = size == len(buffer)
+        if not success:
+            logging.error('read timeout after {} s'.format(self.__serial.timeout))
+        return success
+
+    def receive_into(self, buffer: Union[bytearray, memoryview]) -> bool:
+        """
+        Receives data from the Carmen sensor into a preallocated buffer.
+        The CRC16 is checked.
+
+        :param buffer: Buffer to fill completely, its size is the number of bytes to receive.
+        :return: True on success, else false.
+        """
+        success = self._receive_raw_into(buffer)
+        if success:
+            # check crc
+            view = memoryview(buffer)
+            success = calculate_crc16(view[:-2]) == (view[-2] | (view[-1] << 8))
+            if not success:
+                logging.error('invalid crc')
+            if self.stats is not None:
+                self._count_response(self._last_command, len(buffer), success, not success)
+        elif self.stats is not None:
+            self._count_response(self._last_command, 0, False, False)
+        return success
+
+    def _receive_frame_raw(self, command: int, size: int, timeout: float = None,
+                           buffer: Union[bytearray, memoryview] = None
+                           ) -> Optional[Union[bytes, bytearray, memoryview]]:
+        """
+        Receives the next valid frame of the given command.
+        Invalid data in front of the frame is skipped, so the stream is resynchronized without a timeout.
+
+        :param command: Expected command.
+        :param size: Expected frame size.
+        :param timeout: Read deadline in seconds. Default is None (timeout of the receive functions).
+        :param buffer: Buffer of the frame size. If no data is pending in the parser, the frame is received and
+                       checked in place. Default is None.
+        :return: The frame (the buffer if it is received in place) or None on timeout.
+        """
+        skipped = self._parser.skipped
+        crc_errors = self._parser.crc_errors
+        received = 0
+        if timeout is None:
+            timeout = self.timeout
+        # the deadline stays configured on the port, the rounded deadlines of the policy rarely change
+        self._set_timeout(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        frame = self._parser.next_frame(command, size)
+        if frame is None and buffer is not None and not self._parser.buffer:
+            # usual case of a synchronized stream, the frame is not copied by the parser
+            received = self.__serial.readinto(buffer)
+            if self.trace is not None:
+                self.trace.record(TRACE_RECEIVE, buffer[:received])
+            view = memoryview(buffer)
+            if received == size and buffer[0] == command and \
+                    calculate_crc16(view[:-2]) == (buffer[-2] | (buffer[-1] << 8)):
+                frame = buffer
+            else:
+                self._parser.feed(view[:received])
+                frame = self._parser.next_frame(command, size)
+            view.release()
+        while frame is None:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            # a corrupted frame without a following frame candidate, do not wait for the timeout
+            if self._parser.crc_errors != crc_errors and not self._parser.buffer and self.__serial.in_waiting == 0:
+                logging.error('invalid crc')
+                break
+            data = self.__serial.read(self._parser.missing(size))
+            if not data:
+                break
+            received += len(data)
+            if self.trace is not None:
+                self.trace.record(TRACE_RECEIVE, data)
+            self._parser.feed(data)
+            frame = self._parser.next_frame(command, size)
+        if self._parser.skipped != skipped:
+            logging.error('stream resynchronized, {} bytes skipped'.format(self._parser.skipped - skipped))
+        if frame is None and self._parser.crc_errors == crc_errors:
+            logging.error('read timeout after {} s'.format(timeout))
+        elif frame is not None and self.log_protocol:
+            logging.info('read <- %s', HexBytes(frame))
+        if self.stats is not None:
+            # a frame which is found after a corrupted candidate is a valid response
+            self._count_response(command, received, frame is not None,
+                                 frame is None and self._parser.crc_errors != crc_errors)
+        return frame
+
+    def receive_frame(self, command: int, size: int) -> Tuple[bool, List[int]]:
+        """
+        Receives the response of the given command from the Carmen sensor.
+        The stream is scanned for the next frame with the command byte and a valid CRC16.
+
+        :param command: Expected command.
+        :param size: Expected response size.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        frame = self._receive_frame_raw(command, size)
+        if frame is None:
+            return False, []
+        return True, list(frame)
+
+    def receive_frame_into(self, command: int, buffer: Union[bytearray, memoryview]) -> bool:
+        """
+        Receives the response of the given command from the Carmen sensor into a preallocated buffer.
+        The stream is scanned for the next frame with the command byte and a valid CRC16.
+
+        :param command: Expected command.
+        :param buffer: Buffer to fill completely, its size is the expected response size.
+        :return: True on success, else false.
+        """
+        frame = self._receive_frame_raw(command, len(buffer), buffer=buffer)
+        if frame is None:
+            return False
+        if frame is not buffer:
+            buffer[:] = frame
+        return True
+
+    def _request(self, send: Callable[[], bool], command: int, request_size: int, size: int,
+                 buffer: Union[bytearray, memoryview] = None) -> Optional[Union[bytes, bytearray, memoryview]]:
+        """
+        Sends a request and receives the response according to the policy.
+        Idempotent commands are retried, the input is discarded before every retry.
+
+        :param send: Function which sends the request.
+        :param command: Command to execute.
+        :param request_size: Size of the request.
+        :param size: Expected response size.
+        :param buffer: Buffer to receive the response in place. Default is None.
+        :return: The response (the buffer if it is received in place) or None.
+        """
+        policy = self.policy
+        for attempt in range(1 if policy is None else policy.attempts(command)):
+            if attempt:
+                logging.error('retry command 0x{:02X}, attempt {}'.format(command, attempt + 1))
+                if self.stats is not None:
+                    self.stats.command(command).retries += 1
+                time.sleep(policy.delay(attempt))
+                self._parser.clear()
+                self.__serial.reset_input_buffer()
+            timeout = None if policy is None else policy.timeout(command, request_size, size, self.__baudrate, attempt)
+            start = time.perf_counter()
+            if send():
+                frame = self._receive_frame_raw(command, size, timeout, buffer)
+                if frame is not None:
+                    round_trip = time.perf_counter() - start
+                    if policy is not None:
+                        policy.update(command, round_trip)
+                    if self.stats is not None:
+                        self.stats.command(command).round_trip.record(round_trip)
+                    return frame
+            if policy is not None:
+                policy.failure(command)
+        return None
+
+    def request(self, command: int, data: List[int] = None, size: int = 4) -> Tuple[bool, List[int]]:
+        """
+        Sends a command and receives its response, the deadline and the retries are given by the policy.
+
+        :param command: Command to send.
+        :param data: Data to send if necessary. Default is None.
+        :param size: Expected response size. Default is 4.
+        :return: True on success, else false.
+        :return: The received data.
+        """
+        frame = self._request(lambda: self.send(command, data), command, len(data or []) + 3, size)
+        if frame is None:
+            return False, []
+        return True, list(frame)
+
+    def request_into(self, request_buffer: bytearray, command: int, buffer: Union[bytearray, memoryview],
+                     data: Union[bytes, bytearray, memoryview] = b'') -> bool:
+        """
+        Sends a command composed in a preallocated buffer and receives its response into a preallocated buffer,
+        the deadline and the retries are given by the policy.
+
+        :param request_buffer: Buffer for the request, at least len(data) + 3 bytes.
+        :param command: Command to send.
+        :param buffer: Buffer to fill completely, its size is the expected response size.
+        :param data: Data to send if necessary. Default is empty.
+        :return: True on success, else false.
+        """
+        frame = self._request(lambda: self.send_into(request_buffer, command, data), command, len(data) + 3,
+                              len(buffer), buffer)
+        if frame is None:
+            return False
+        if frame is not buffer:
+            buffer[:] = frame
+        return True
+
+    def transfer_pipelined(self, requests: List[Tuple[int, List[int], int]],
+                           depth: int = 4) -> List[Tuple[bool, List[int]]]:
+        """
+        Sends several commands and receives the responses with up to depth commands in flight.
+        The next commands are sent before the previous responses are read, so the round trip latency is hidden.
+        Each response is matched to its request by the command byte and the known response size.
+        If a response is missing, all commands in flight are failed and the input buffer is discarded.
+
+        :param requests: List of requests (command, data, response size).
+        :param depth: Maximum number of commands in flight. Default is 4.
+        :return: List of results (success, received data) in the order of the requests.
+        """
+        results = []
+        in_flight = deque()
+        index = 0
+        while index < len(requests) or in_flight:
+            # fill the pipeline
+            while index < len(requests) and len(in_flight) < max(depth, 1):
+                command, data, size = requests[index]
+                in_flight.append((command, size, self.send(command, data)))
+                index += 1
+            command, size, success = in_flight.popleft()
+            response = []
+            if success:
+                success, response = self.receive_frame(command, size)
+                if not success:
+                    # pipeline is out of sync, drop everything in flight
+                    self._parser.clear()
+                    self.__serial.reset_input_buffer()
+                    results.append((False, []))
+                    while in_flight:
+                        in_flight.popleft()
+                        results.append((False, []))
+                    continue
+            results.append((success, response))
+        return results
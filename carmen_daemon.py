@@ -0,0 +1,503 @@
+import logging
+import os
+import socket
+import struct
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from carmen import Carmen
+from carmen_sample import Sample
+
+# message header: type, payload size
+_HEADER = struct.Struct('<BI')
+# sample record: timestamp, pressure, temperature, status
+_SAMPLE = struct.Struct('<dddI')
+# port index of requests and sample messages
+_PORT = struct.Struct('<H')
+# port index and count of a history request
+_HISTORY = struct.Struct('<HI')
+
+# daemon messages
+MESSAGE_PORTS = 0x01  # port names, separated by newlines
+MESSAGE_SAMPLES = 0x02  # pushed samples: port index, sample records
+MESSAGE_REPLY = 0x03  # reply to LATEST or HISTORY: port index, sample records
+MESSAGE_ERROR = 0x04  # error text
+# client messages
+MESSAGE_SUBSCRIBE = 0x10  # port index, ALL_PORTS for all ports
+MESSAGE_UNSUBSCRIBE = 0x11  # port index, ALL_PORTS for all ports
+MESSAGE_LATEST = 0x12  # port index
+MESSAGE_HISTORY = 0x13  # port index, maximum number of samples
+
+ALL_PORTS = 0xFFFF
+
+# maximum payload size of a client message (MESSAGE_HISTORY), larger messages close the session
+MAXIMUM_REQUEST_SIZE = _HISTORY.size
+
+
+def encode_message(message_type: int, payload: bytes = b'') -> bytes:
+    """
+    Encodes a message of the daemon protocol.
+
+    :param message_type: Type of the message.
+    :param payload: Payload of the message. Default is empty.
+    :return: The encoded message.
+    """
+    return _HEADER.pack(message_type, len(payload)) + payload
+
+
+def encode_samples(message_type: int, port: int, samples: List[Sample]) -> bytes:
+    """
+    Encodes a message with samples.
+
+    :param message_type: MESSAGE_SAMPLES or MESSAGE_REPLY.
+    :param port: Index of the port.
+    :param samples: Samples to encode.
+    :return: The encoded message.
+    """
+    return encode_message(message_type, _PORT.pack(port) + b''.join(_SAMPLE.pack(*sample) for sample in samples))
+
+
+def decode_samples(payload: bytes) -> Tuple[int, List[Sample]]:
+    """
+    Decodes the payload of a message with samples.
+
+    :param payload: Payload of a MESSAGE_SAMPLES or MESSAGE_REPLY message.
+    :return: Index of the port.
+    :return: The samples.
+    """
+    return _PORT.unpack_from(payload)[0], [Sample(*record) for record in _SAMPLE.iter_unpack(payload[_PORT.size:])]
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> Optional[bytes]:
+    """
+    Receives the given number of bytes.
+
+    :param connection: Connected socket.
+    :param size: Number of bytes.
+    :return: The received data or None if the connection is closed.
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def receive_message(connection: socket.socket, maximum_size: int = None) -> Tuple[Optional[int], bytes]:
+    """
+    Receives a message of the daemon protocol.
+
+    :param connection: Connected socket.
+    :param maximum_size: Maximum payload size. Default is None (no limit).
+    :return: Type of the message or None if the connection is closed or the payload is too large.
+    :return: Payload of the message.
+    """
+    header = _receive_exactly(connection, _HEADER.size)
+    if header is None:
+        return None, b''
+    message_type, size = _HEADER.unpack(header)
+    if maximum_size is not None and size > maximum_size:
+        logging.error('message 0x{:02X} with {} bytes exceeds {} bytes'.format(message_type, size, maximum_size))
+        return None, b''
+    payload = _receive_exactly(connection, size) if size else b''
+    if payload is None:
+        return None, b''
+    return message_type, payload
+
+
+class _Session(object):
+    """
+    Connection of a client to the daemon.
+    The messages are sent by a writer thread from a bounded queue, so a slow client only drops its own oldest
+    messages and never blocks the acquisition.
+    """
+
+    def __init__(self, daemon: 'CarmenDaemon', connection: socket.socket, queue_size: int) -> None:
+        self._daemon = daemon
+        self._connection = connection
+        self._queue = deque(maxlen=queue_size)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.subscriptions = set()
+        self.dropped = 0
+        self._reader = threading.Thread(target=self._read, name='CarmenDaemonReader', daemon=True)
+        self._writer = threading.Thread(target=self._write, name='CarmenDaemonWriter', daemon=True)
+
+    def start(self) -> None:
+        self._reader.start()
+        self._writer.start()
+
+    def push(self, message: bytes) -> None:
+        """
+        Queues a message for the client.
+
+        :param message: Encoded message.
+        """
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(message)
+            self._condition.notify()
+
+    def close(self) -> None:
+        """
+        Closes the connection, the threads are finished.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        try:
+            self._connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._connection.close()
+        self._daemon._remove_session(self)
+
+    def _write(self) -> None:
+        """
+        Writer thread, sends the queued messages.
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._closed)
+                if self._closed:
+                    return
+                messages = b''.join(self._queue)
+                self._queue.clear()
+            try:
+                self._connection.sendall(messages)
+            except OSError:
+                self.close()
+                return
+
+    def _read(self) -> None:
+        """
+        Reader thread, handles the requests of the client.
+        """
+        while True:
+            try:
+                message_type, payload = receive_message(self._connection, MAXIMUM_REQUEST_SIZE)
+            except OSError:
+                message_type = None
+            if message_type is None:
+                self.close()
+                return
+            try:
+                self._daemon._handle(self, message_type, payload)
+            except (struct.error, IndexError) as error:
+                self.push(encode_message(MESSAGE_ERROR, 'invalid request: {}'.format(error).encode()))
+
+
+class CarmenDaemon(object):
+    """
+    Acquisition daemon, which owns the serial ports and serves the samples to many clients over a Unix domain socket.
+    Every sensor is polled by a single continuous acquisition, the latest sample and a short history are kept and
+    new samples are pushed to all subscribed clients.
+    """
+
+    def __init__(self, devices: Dict[str, Carmen], path: str, history: int = 1024, buffer_size: int = 4096,
+                 queue_size: int = 1024, depth: int = 1) -> None:
+        """
+        Initializes a instance of CarmenDaemon.
+
+        :param devices: Carmen sensors by port name.
+        :param path: Path of the Unix domain socket.
+        :param history: Number of samples kept per sensor. Default is 1024.
+        :param buffer_size: Maximum number of buffered samples of the acquisitions. Default is 4096.
+        :param queue_size: Maximum number of queued messages per client. Default is 1024.
+        :param depth: Number of pipelined commands in flight. Default is 1 (no pipelining).
+        """
+        self._devices = OrderedDict(devices)
+        self._ports = list(self._devices)
+        self._path = path
+        self._buffer_size = buffer_size
+        self._queue_size = queue_size
+        self._depth = depth
+        self._history = [deque(maxlen=history) for _ in self._ports]
+        self._lock = threading.Lock()
+        self._sessions = []
+        self._threads = []
+        self._server = None
+        self._running = threading.Event()
+        self._stopped = threading.Event()
+
+    @property
+    def ports(self) -> List[str]:
+        """
+        :return: Names of the served ports.
+        """
+        return list(self._ports)
+
+    @property
+    def clients(self) -> int:
+        """
+        :return: Number of connected clients.
+        """
+        with self._lock:
+            return len(self._sessions)
+
+    def latest(self, port: str) -> Optional[Sample]:
+        """
+        :param port: Name of the port.
+        :return: The latest sample of the sensor or None.
+        """
+        history = self._history[self._ports.index(port)]
+        with self._lock:
+            return history[-1] if history else None
+
+    def start(self) -> bool:
+        """
+        Starts the acquisitions and the server.
+        Sensors without typeplate are served without samples.
+
+        :return: True if all acquisitions are started, else false.
+        """
+        success = True
+        self._running.set()
+        self._stopped.clear()
+        for index, (port, carmen) in enumerate(self._devices.items()):
+            started, acquisition = carmen.start_acquisition(self._buffer_size, self._depth)
+            if not started:
+                logging.error('cannot start acquisition of "{}"'.format(port))
+                success = False
+                continue
+            self._start_thread(self._distribute, index, acquisition)
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self._path)
+        self._server.listen()
+        self._start_thread(self._accept)
+        logging.info('daemon is serving {} ports on "{}"'.format(len(self._ports), self._path))
+        return success
+
+    def _start_thread(self, target, *arguments) -> None:
+        thread = threading.Thread(target=target, args=arguments, name='CarmenDaemon', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self) -> None:
+        """
+        Stops the acquisitions and the server and disconnects all clients.
+        """
+        if not self._running.is_set():
+            return
+        self._running.clear()
+        for carmen in self._devices.values():
+            carmen.stop_acquisition()
+        if self._server is not None:
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        self._stopped.set()
+        logging.info('daemon is stopped')
+
+    def serve_forever(self) -> None:
+        """
+        Starts the daemon and blocks until it is stopped.
+        """
+        self.start()
+        try:
+            while not self._stopped.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _accept(self) -> None:
+        """
+        Server thread, accepts the clients.
+        """
+        while self._running.is_set():
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            session = _Session(self, connection, self._queue_size)
+            with self._lock:
+                self._sessions.append(session)
+            session.push(encode_message(MESSAGE_PORTS, '\n'.join(self._ports).encode()))
+            session.start()
+
+    def _remove_session(self, session: _Session) -> None:
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def _distribute(self, index: int, acquisition) -> None:
+        """
+        Fan-out thread of a sensor, pushes every batch of samples to the subscribed clients.
+        A batch is encoded once for all clients.
+
+        :param index: Index of the port.
+        :param acquisition: Running acquisition of the sensor.
+        """
+        while self._running.is_set():
+            samples = acquisition.read(timeout=0.1)
+            if not samples:
+                continue
+            message = encode_samples(MESSAGE_SAMPLES, index, samples)
+            with self._lock:
+                self._history[index].extend(samples)
+                sessions = [session for session in self._sessions if index in session.subscriptions]
+            for session in sessions:
+                session.push(message)
+
+    def _handle(self, session: _Session, message_type: int, payload: bytes) -> None:
+        """
+        Handles a request of a client.
+
+        :param session: Session of the client.
+        :param message_type: Type of the request.
+        :param payload: Payload of the request.
+        """
+        if message_type in (MESSAGE_SUBSCRIBE, MESSAGE_UNSUBSCRIBE):
+            port = _PORT.unpack(payload)[0]
+            ports = set(range(len(self._ports))) if port == ALL_PORTS else {port}
+            if not ports <= set(range(len(self._ports))):
+                raise IndexError('unknown port {}'.format(port))
+            with self._lock:
+                if message_type == MESSAGE_SUBSCRIBE:
+                    session.subscriptions |= ports
+                else:
+                    session.subscriptions -= ports
+        elif message_type in (MESSAGE_LATEST, MESSAGE_HISTORY):
+            if message_type == MESSAGE_LATEST:
+                port, count = _PORT.unpack(payload)[0], 1
+            else:
+                port, count = _HISTORY.unpack(payload)
+            history = self._history[port]
+            with self._lock:
+                samples = list(history)[-count:] if count else []
+            session.push(encode_samples(MESSAGE_REPLY, port, samples))
+        else:
+            raise IndexError('unknown message type 0x{:02X}'.format(message_type))
+
+
+class CarmenClient(object):
+    """
+    Client of the acquisition daemon.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        """
+        Connects to the daemon and receives the names of the ports.
+
+        :param path: Path of the Unix domain socket.
+        :param timeout: Timeout of all socket operations in seconds. Default is 5.0.
+        """
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(path)
+        self._pushed = deque()
+        message_type, payload = receive_message(self._socket)
+        if message_type != MESSAGE_PORTS:
+            self._socket.close()
+            raise IOError('invalid answer of daemon "{}"'.format(path))
+        self.ports = payload.decode().split('\n') if payload else []
+
+    def close(self) -> None:
+        """
+        Closes the connection.
+        """
+        self._socket.close()
+
+    def __enter__(self) -> 'CarmenClient':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _port_index(self, port: Optional[str]) -> int:
+        return ALL_PORTS if port is None else self.ports.index(port)
+
+    def subscribe(self, port: str = None) -> None:
+        """
+        Subscribes to the samples of a port.
+
+        :param port: Name of the port. Default is None (all ports).
+        """
+        self._socket.sendall(encode_message(MESSAGE_SUBSCRIBE, _PORT.pack(self._port_index(port))))
+
+    def unsubscribe(self, port: str = None) -> None:
+        """
+        Unsubscribes from the samples of a port.
+
+        :param port: Name of the port. Default is None (all ports).
+        """
+        self._socket.sendall(encode_message(MESSAGE_UNSUBSCRIBE, _PORT.pack(self._port_index(port))))
+
+    def _reply(self) -> List[Sample]:
+        """
+        Receives the reply to a request, pushed samples are kept for receive.
+
+        :return: The samples of the reply.
+        """
+        while True:
+            message_type, payload = receive_message(self._socket)
+            if message_type is None:
+                raise IOError('connection to daemon is closed')
+            if message_type == MESSAGE_REPLY:
+                return decode_samples(payload)[1]
+            if message_type == MESSAGE_ERROR:
+                raise IOError(payload.decode())
+            if message_type == MESSAGE_SAMPLES:
+                self._pushed.append(payload)
+
+    def latest(self, port: str) -> Optional[Sample]:
+        """
+        Requests the latest sample of a port.
+
+        :param port: Name of the port.
+        :return: The latest sample or None.
+        """
+        self._socket.sendall(encode_message(MESSAGE_LATEST, _PORT.pack(self.ports.index(port))))
+        samples = self._reply()
+        return samples[0] if samples else None
+
+    def history(self, port: str, count: int) -> List[Sample]:
+        """
+        Requests the last samples of a port.
+
+        :param port: Name of the port.
+        :param count: Maximum number of samples.
+        :return: The samples, the oldest first.
+        """
+        self._socket.sendall(encode_message(MESSAGE_HISTORY, _HISTORY.pack(self.ports.index(port), count)))
+        return self._reply()
+
+    def receive(self) -> Tuple[str, List[Sample]]:
+        """
+        Receives the next batch of pushed samples.
+
+        :return: Name of the port.
+        :return: The samples.
+        """
+        while not self._pushed:
+            message_type, payload = receive_message(self._socket)
+            if message_type is None:
+                raise IOError('connection to daemon is closed')
+            if message_type == MESSAGE_SAMPLES:
+                self._pushed.append(payload)
+            elif message_type == MESSAGE_ERROR:
+                raise IOError(payload.decode())
+        port, samples = decode_samples(self._pushed.popleft())
+        return self.ports[port], samples
@@ -0,0 +1,159 @@
+import logging
+from typing import Dict, List, Tuple
+
+# size of an EEPROM word, the addresses and block sizes count words
+EEPROM_WORD_SIZE = 4
+# maximum number of words per "Read EEPROM" command (size is one byte)
+EEPROM_MAX_BLOCK_SIZE = 0xFF
+
+
+class EepromImage(object):
+    """
+    Local image of the EEPROM of a Carmen sensor, which stores the already read words.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty image.
+        """
+        self.data = bytearray()
+        self._valid = bytearray()
+
+    def _resize(self, words: int) -> None:
+        """
+        Enlarges the image to hold at least the given number of words.
+
+        :param words: Number of words.
+        """
+        if words > len(self._valid):
+            self._valid.extend(bytes(words - len(self._valid)))
+            self.data.extend(bytes(words * EEPROM_WORD_SIZE - len(self.data)))
+
+    def missing(self, address: int, size: int) -> List[Tuple[int, int]]:
+        """
+        Returns the ranges of the given range which are not in the image.
+
+        :param address: Start address (word).
+        :param size: Number of words.
+        :return: List of missing ranges (address, size).
+        """
+        self._resize(address + size)
+        ranges = []
+        start = None
+        for word in range(address, address + size):
+            if not self._valid[word] and start is None:
+                start = word
+            elif self._valid[word] and start is not None:
+                ranges.append((start, word - start))
+                start = None
+        if start is not None:
+            ranges.append((start, address + size - start))
+        return ranges
+
+    def store(self, address: int, data: bytes) -> None:
+        """
+        Stores read words in the image.
+
+        :param address: Start address (word).
+        :param data: Read data, a multiple of the word size.
+        """
+        words = len(data) // EEPROM_WORD_SIZE
+        self._resize(address + words)
+        self.data[address * EEPROM_WORD_SIZE:(address + words) * EEPROM_WORD_SIZE] = data
+        self._valid[address:address + words] = b'\x01' * words
+
+    def get(self, address: int, size: int) -> bytearray:
+        """
+        Returns a range of the image.
+
+        :param address: Start address (word).
+        :param size: Number of words.
+        :return: The data of the range.
+        """
+        self._resize(address + size)
+        return self.data[address * EEPROM_WORD_SIZE:(address + size) * EEPROM_WORD_SIZE]
+
+
+class EepromReader(object):
+    """
+    Bulk reader for the EEPROM of Carmen sensors.
+    Arbitrary ranges are split into maximal blocks, which are read within a single DSP pause.
+    The read data is cached per serial number.
+    """
+
+    def __init__(self, carmen, max_block_size: int = EEPROM_MAX_BLOCK_SIZE,
+                 images: Dict[str, EepromImage] = None) -> None:
+        """
+        Initializes a instance of EepromReader.
+
+        :param carmen: Carmen sensor to read from.
+        :param max_block_size: Maximum number of words per command. Default is 255.
+        :param images: EEPROM images by serial number, to share the cache between readers. Default is None.
+        """
+        self._carmen = carmen
+        self._max_block_size = max_block_size
+        self._images = {} if images is None else images
+
+    def image(self) -> Tuple[bool, EepromImage]:
+        """
+        Returns the cached EEPROM image of the sensor, the typeplate is read before if necessary.
+
+        :return: True on success, else false.
+        :return: EEPROM image or None.
+        """
+        success = True
+        if self._carmen.typeplate is None:
+            success, _ = self._carmen.read_typeplate()
+        if not success:
+            return False, None
+        return True, self._images.setdefault(self._carmen.typeplate.SerialNumber, EepromImage())
+
+    def invalidate(self) -> None:
+        """
+        Removes the cached EEPROM image of the sensor.
+        """
+        if self._carmen.typeplate is not None:
+            self._images.pop(self._carmen.typeplate.SerialNumber, None)
+
+    def read(self, address: int, size: int, use_cache: bool = True) -> Tuple[bool, bytearray]:
+        """
+        Reads an EEPROM range. Only the ranges which are not cached are read from the sensor.
+
+        :param address: Start address (word).
+        :param size: Number of words.
+        :param use_cache: Use the cached data. Default is True.
+        :return: True on success, else false.
+        :return: The read data.
+        """
+        success, image = self.image()
+        if not success:
+            return False, bytearray()
+        ranges = image.missing(address, size) if use_cache else [(address, size)]
+        if ranges:
+            success, _ = self._carmen.stop_dsp()
+            if success:
+                success = self._read_ranges(image, ranges)
+            _, _ = self._carmen.continue_dsp()
+        if not success:
+            logging.error('cannot read EEPROM range 0x{:04X} ... 0x{:04X}'.format(address, address + size - 1))
+            return False, bytearray()
+        return True, image.get(address, size)
+
+    def _read_ranges(self, image: EepromImage, ranges: List[Tuple[int, int]]) -> bool:
+        """
+        Reads the given ranges in maximal blocks and stores them in the image.
+
+        :param image: EEPROM image to fill.
+        :param ranges: List of ranges (address, size).
+        :return: True on success, else false.
+        """
+        for address, size in ranges:
+            while size > 0:
+                block_size = min(size, self._max_block_size)
+                success, response = self._carmen.read_eeprom(address, block_size)
+                if not success:
+                    return False
+                image.store(address, bytes(response[3:-2]))
+                address += block_size
+                size -= block_size
+        return True
@@ -0,0 +1,263 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from carmen_sample import Sample, SampleBuffer
+
+# batch of samples as columns: timestamp, pressure, temperature, status
+Columns = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def as_columns(samples: SampleBuffer) -> Columns:
+    """
+    Returns the columns of a sample buffer as arrays, the data is not copied.
+    The arrays are only valid until the buffer is changed.
+
+    :param samples: Sample buffer.
+    :return: The columns timestamp, pressure, temperature and status.
+    """
+    return (np.frombuffer(samples.timestamp, dtype=np.float64), np.frombuffer(samples.pressure, dtype=np.float64),
+            np.frombuffer(samples.temperature, dtype=np.float64), np.frombuffer(samples.status, dtype=np.uint32))
+
+
+def to_samples(columns: Columns) -> List[Sample]:
+    """
+    Converts columns into samples.
+
+    :param columns: The columns timestamp, pressure, temperature and status.
+    :return: List of samples.
+    """
+    timestamp, pressure, temperature, status = columns
+    return list(map(Sample, timestamp.tolist(), pressure.tolist(), temperature.tolist(), status.tolist()))
+
+
+def _empty() -> Columns:
+    """
+    :return: Empty columns.
+    """
+    return np.empty(0), np.empty(0), np.empty(0), np.empty(0, dtype=np.uint32)
+
+
+def _concatenate(first: Columns, second: Columns) -> Columns:
+    """
+    :return: The samples of both columns.
+    """
+    return tuple(np.concatenate((a, b)) for a, b in zip(first, second))
+
+
+def _moving_sum(values: np.ndarray, length: int) -> np.ndarray:
+    """
+    :param values: Values with at least length - 1 samples of history in front.
+    :param length: Window length.
+    :return: Sums of all complete windows.
+    """
+    cumulative = np.cumsum(values)
+    sums = cumulative[length - 1:].copy()
+    sums[1:] -= cumulative[:-length]
+    return sums
+
+
+def _moving_or(status: np.ndarray, length: int) -> np.ndarray:
+    """
+    :param status: Status values with at least length - 1 samples of history in front.
+    :param length: Window length.
+    :return: Status values ORed over all complete windows.
+    """
+    if len(status) < length:
+        return np.empty(0, dtype=np.uint32)
+    return np.bitwise_or.reduce(np.lib.stride_tricks.sliding_window_view(status, length), axis=1)
+
+
+class FilterStage(object):
+    """
+    Streaming filter stage, which processes batches of samples incrementally.
+    The state between the batches is kept, so the output does not depend on the batch sizes.
+    """
+
+    def process(self, columns: Columns) -> Columns:
+        """
+        Processes a batch of samples.
+
+        :param columns: The columns timestamp, pressure, temperature and status.
+        :return: The filtered columns.
+        """
+        raise NotImplementedError()
+
+    def reset(self) -> None:
+        """
+        Discards the state of the previous batches.
+        """
+        raise NotImplementedError()
+
+    def __call__(self, columns: Columns) -> Columns:
+        return self.process(columns)
+
+
+class MovingAverage(FilterStage):
+    """
+    Boxcar filter: pressure and temperature are averaged over the last samples, the status is ORed.
+    A sample is returned for every input sample as soon as the first window is complete.
+    """
+
+    def __init__(self, length: int) -> None:
+        """
+        Initializes the filter.
+
+        :param length: Number of averaged samples.
+        """
+        if length < 1:
+            raise ValueError('invalid length {}'.format(length))
+        self.length = length
+        self._history = _empty()
+
+    def process(self, columns: Columns) -> Columns:
+        timestamp, pressure, temperature, status = _concatenate(self._history, columns)
+        self._history = tuple(column[max(len(column) - self.length + 1, 0):] if self.length > 1 else column[:0]
+                              for column in (timestamp, pressure, temperature, status))
+        if len(timestamp) < self.length:
+            return _empty()
+        return (timestamp[self.length - 1:],
+                _moving_sum(pressure, self.length) / self.length,
+                _moving_sum(temperature, self.length) / self.length,
+                _moving_or(status, self.length))
+
+    def reset(self) -> None:
+        self._history = _empty()
+
+
+class WindowReduction(FilterStage):
+    """
+    Decimation by non-overlapping windows, the pressure and temperature values of every window are reduced to
+    their mean, minimum or maximum and the status values are ORed.
+    The timestamp of a window is the timestamp of its last sample.
+    """
+
+    _REDUCTIONS = {'mean': np.mean, 'min': np.min, 'max': np.max}
+
+    def __init__(self, length: int, reduction: str = 'mean') -> None:
+        """
+        Initializes the filter.
+
+        :param length: Number of samples per window.
+        :param reduction: Reduction of the values: "mean", "min" or "max". Default is "mean".
+        """
+        if length < 1:
+            raise ValueError('invalid length {}'.format(length))
+        if reduction not in self._REDUCTIONS:
+            raise ValueError('invalid reduction "{}"'.format(reduction))
+        self.length = length
+        self.reduction = reduction
+        self._pending = _empty()
+
+    def process(self, columns: Columns) -> Columns:
+        timestamp, pressure, temperature, status = _concatenate(self._pending, columns)
+        complete = len(timestamp) - len(timestamp) % self.length
+        self._pending = tuple(column[complete:] for column in (timestamp, pressure, temperature, status))
+        reduce = self._REDUCTIONS[self.reduction]
+
+        def windows(column: np.ndarray) -> np.ndarray:
+            return column[:complete].reshape(-1, self.length)
+
+        return (timestamp[self.length - 1:complete:self.length],
+                reduce(windows(pressure), axis=1),
+                reduce(windows(temperature), axis=1),
+                np.bitwise_or.reduce(windows(status), axis=1))
+
+    def reset(self) -> None:
+        self._pending = _empty()
+
+
+class CICDecimator(FilterStage):
+    """
+    Decimation with the response of a cascaded integrator comb filter: order moving averages of the decimation
+    factor, followed by keeping every factor-th sample. The stages are computed as windowed sums, so the
+    unbounded integrators of a CIC filter do not lose precision in floating point.
+    The status values are ORed over all samples since the previous output.
+    """
+
+    def __init__(self, factor: int, order: int = 3) -> None:
+        """
+        Initializes the filter.
+
+        :param factor: Decimation factor.
+        :param order: Number of filter stages. Default is 3.
+        """
+        if factor < 1 or order < 1:
+            raise ValueError('invalid factor {} or order {}'.format(factor, order))
+        self.factor = factor
+        self.order = order
+        self.reset()
+
+    def reset(self) -> None:
+        self._history = [(np.empty(0), np.empty(0)) for _ in range(self.order)]
+        self._skip = 0
+        self._status = 0
+
+    def process(self, columns: Columns) -> Columns:
+        timestamp, pressure, temperature, status = columns
+        factor = self.factor
+        for stage, (pressure_history, temperature_history) in enumerate(self._history):
+            pressure = np.concatenate((pressure_history, pressure))
+            temperature = np.concatenate((temperature_history, temperature))
+            history = max(len(pressure) - factor + 1, 0) if factor > 1 else len(pressure)
+            self._history[stage] = (pressure[history:], temperature[history:])
+            if len(pressure) < factor:
+                pressure = temperature = np.empty(0)
+            else:
+                pressure = _moving_sum(pressure, factor) / factor
+                temperature = _moving_sum(temperature, factor) / factor
+
+        # the filtered samples belong to the last input samples
+        filtered = len(pressure)
+        first = len(timestamp) - filtered
+        selected = np.arange(self._skip, filtered, factor)
+        self._skip = int(selected[-1]) + factor - filtered if len(selected) else self._skip - filtered
+        positions = first + selected
+
+        # status ORed from the sample after the previous output to the output sample
+        output_status = np.empty(len(positions), dtype=np.uint32)
+        rest = status
+        if len(positions):
+            starts = np.concatenate(([0], positions[:-1] + 1))
+            output_status[:] = np.bitwise_or.reduceat(status[:positions[-1] + 1], starts)
+            output_status[0] |= self._status
+            rest = status[positions[-1] + 1:]
+            self._status = 0
+        if len(rest):
+            self._status |= int(np.bitwise_or.reduce(rest))
+        return timestamp[positions], pressure[selected], temperature[selected], output_status
+
+
+class Pipeline(FilterStage):
+    """
+    Chain of filter stages.
+    """
+
+    def __init__(self, stages: Sequence[FilterStage]) -> None:
+        """
+        Initializes the pipeline.
+
+        :param stages: Filter stages in the order of processing.
+        """
+        self.stages = list(stages)
+
+    def process(self, columns: Columns) -> Columns:
+        for stage in self.stages:
+            columns = stage.process(columns)
+        return columns
+
+    def reset(self) -> None:
+        for stage in self.stages:
+            stage.reset()
+
+    def process_buffer(self, samples: SampleBuffer) -> SampleBuffer:
+        """
+        Processes the samples of a buffer.
+
+        :param samples: Sample buffer, for example filled by CarmenAcquisition.read_into.
+        :return: Buffer with the filtered samples.
+        """
+        output = SampleBuffer()
+        for column, values in zip(output.columns(), self.process(as_columns(samples))):
+            column.frombytes(values.astype(np.uint32 if column.typecode == 'I' else np.float64).tobytes())
+        return output
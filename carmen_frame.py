@@ -0,0 +1,108 @@
+from typing import Optional
+
+from crc16 import calculate_crc16
+
+# response sizes by command, including the CRC16 ("Read EEPROM" depends on the block size)
+RESPONSE_SIZES = {0xA0: 4, 0xA1: 4, 0x5A: 4, 0x35: 13}
+
+
+def response_size(buffer: bytearray) -> Optional[int]:
+    """
+    Returns the size of the response at the start of the buffer.
+
+    :param buffer: Received data.
+    :return: Size of the response, 0 if more data is necessary or None if the first byte is no known command.
+    """
+    command = buffer[0]
+    if command == 0x03:
+        if len(buffer) < 3:
+            return 0
+        return buffer[2] * 4 + 5
+    return RESPONSE_SIZES.get(command)
+
+
+class FrameParser(object):
+    """
+    Incremental parser for the responses of the Carmen sensor.
+    Bytes which do not start a valid frame are skipped, so the parser resynchronizes on the next
+    command byte with a consistent CRC16.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty parser.
+        """
+        self.buffer = bytearray()
+        self.skipped = 0
+        self.crc_errors = 0
+
+    def feed(self, data: bytes) -> None:
+        """
+        Appends received data.
+
+        :param data: Received data.
+        """
+        self.buffer.extend(data)
+
+    def clear(self) -> None:
+        """
+        Discards all buffered data.
+        """
+        self.buffer.clear()
+
+    def take(self, size: int) -> bytes:
+        """
+        Removes buffered data without parsing.
+
+        :param size: Maximum number of bytes.
+        :return: The removed data.
+        """
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def missing(self, size: int = None) -> int:
+        """
+        Returns the number of bytes which are at least necessary to complete the next frame.
+
+        :param size: Expected frame size. Default is None (size of the frame at the start of the buffer).
+        :return: Number of missing bytes, at least one.
+        """
+        if size is None:
+            size = (response_size(self.buffer) if self.buffer else 0) or 3
+        return max(size - len(self.buffer), 1)
+
+    def next_frame(self, command: int = None, size: int = None) -> Optional[bytes]:
+        """
+        Returns the next valid frame. Data before the frame is skipped.
+
+        :param command: Expected command. Default is None (any known command).
+        :param size: Expected frame size. Default is None (size of the known command).
+        :return: The frame or None if more data is necessary.
+        """
+        buffer = self.buffer
+        while buffer:
+            if command is not None and buffer[0] != command:
+                frame_size = None
+            elif size is not None:
+                frame_size = size
+            else:
+                frame_size = response_size(buffer)
+            if frame_size is None:
+                del buffer[0]
+                self.skipped += 1
+                continue
+            if frame_size == 0 or len(buffer) < frame_size:
+                return None
+            view = memoryview(buffer)
+            valid = calculate_crc16(view[:frame_size - 2]) == (buffer[frame_size - 2] | (buffer[frame_size - 1] << 8))
+            view.release()
+            if not valid:
+                del buffer[0]
+                self.skipped += 1
+                self.crc_errors += 1
+                continue
+            frame = bytes(buffer[:frame_size])
+            del buffer[:frame_size]
+            return frame
+        return None
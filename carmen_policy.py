@@ -0,0 +1,148 @@
+import math
+from collections import deque
+from typing import Dict, Iterable
+
+# bits per byte on the line: start bit, 8 data bits, stop bit
+BITS_PER_BYTE = 10
+
+
+class LatencyStatistics(object):
+    """
+    Round trip statistics of a single command.
+    The average and the mean deviation are smoothed like the TCP round trip estimator (RFC 6298),
+    percentiles are calculated from a window of the last round trips.
+    """
+
+    def __init__(self, window: int = 256, alpha: float = 0.125, beta: float = 0.25) -> None:
+        """
+        Initializes empty statistics.
+
+        :param window: Number of round trips for the percentiles. Default is 256.
+        :param alpha: Smoothing factor of the average. Default is 0.125.
+        :param beta: Smoothing factor of the mean deviation. Default is 0.25.
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.count = 0
+        self.failures = 0
+        self.average = 0.0
+        self.deviation = 0.0
+        self._window = deque(maxlen=window)
+
+    def update(self, round_trip: float) -> None:
+        """
+        Adds a measured round trip.
+
+        :param round_trip: Round trip time in seconds.
+        """
+        if self.count == 0:
+            self.average = round_trip
+            self.deviation = round_trip / 2
+        else:
+            self.deviation += self.beta * (abs(round_trip - self.average) - self.deviation)
+            self.average += self.alpha * (round_trip - self.average)
+        self.count += 1
+        self._window.append(round_trip)
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Returns a percentile of the last round trips.
+
+        :param fraction: Percentile as fraction, e.g. 0.99.
+        :return: Round trip time in seconds, 0.0 without round trips.
+        """
+        if not self._window:
+            return 0.0
+        ordered = sorted(self._window)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class RetryPolicy(object):
+    """
+    Timeout and retry policy of a link to a Carmen sensor.
+    The read deadline is a multiple of the frame time at the baudrate, but at least the smoothed
+    round trip plus four mean deviations. Idempotent commands are retried with a bounded exponential backoff.
+    """
+
+    def __init__(self, retries: int = 2, timeout_factor: float = 3.0, minimum_timeout: float = 0.02,
+                 maximum_timeout: float = 1.0, backoff: float = 0.001, maximum_backoff: float = 0.02,
+                 minimum_samples: int = 8, retry_commands: Iterable[int] = (0x35, 0x03)) -> None:
+        """
+        Initializes the policy.
+
+        :param retries: Maximum number of retries of an idempotent command. Default is 2.
+        :param timeout_factor: Deadline as multiple of the frame time of request and response. Default is 3.0.
+        :param minimum_timeout: Minimum deadline in seconds, covers the latency timer of USB adapters. Default is 0.02.
+        :param maximum_timeout: Maximum deadline in seconds, used until enough round trips are measured. Default is 1.0.
+        :param backoff: Delay before the first retry in seconds, doubled for every further retry. Default is 0.001.
+        :param maximum_backoff: Maximum delay before a retry in seconds. Default is 0.02.
+        :param minimum_samples: Number of measured round trips before the deadline adapts. Default is 8.
+        :param retry_commands: Idempotent commands which are retried. Default is "Read Measurement Frame1" and
+                               "Read EEPROM".
+        """
+        self.retries = retries
+        self.timeout_factor = timeout_factor
+        self.minimum_timeout = minimum_timeout
+        self.maximum_timeout = maximum_timeout
+        self.backoff = backoff
+        self.maximum_backoff = maximum_backoff
+        self.minimum_samples = minimum_samples
+        self.retry_commands = frozenset(retry_commands)
+        self.statistics = {}  # type: Dict[int, LatencyStatistics]
+
+    def attempts(self, command: int) -> int:
+        """
+        :param command: Command to execute.
+        :return: Maximum number of attempts of the command.
+        """
+        return 1 + self.retries if command in self.retry_commands else 1
+
+    def timeout(self, command: int, request_size: int, response_size: int, baudrate: int, attempt: int = 0) -> float:
+        """
+        Returns the read deadline of a command.
+
+        :param command: Command to execute.
+        :param request_size: Size of the request.
+        :param response_size: Size of the response.
+        :param baudrate: Baudrate of the link.
+        :param attempt: Number of the attempt, the deadline is doubled for every retry. Default is 0.
+        :return: Deadline in seconds, rounded up to milliseconds.
+        """
+        statistics = self.statistics.get(command)
+        if statistics is None or statistics.count < self.minimum_samples:
+            return self.maximum_timeout
+        timeout = max(self.timeout_factor * (request_size + response_size) * BITS_PER_BYTE / baudrate,
+                      statistics.average + 4 * statistics.deviation,
+                      self.minimum_timeout) * (1 << attempt)
+        # rounded, so the timeout of the serial port is not reconfigured for every command
+        return min(math.ceil(timeout * 1000) / 1000, self.maximum_timeout)
+
+    def delay(self, attempt: int) -> float:
+        """
+        :param attempt: Number of the retry, starting with 1.
+        :return: Delay before the retry in seconds.
+        """
+        return min(self.backoff * (1 << (attempt - 1)), self.maximum_backoff)
+
+    def update(self, command: int, round_trip: float) -> None:
+        """
+        Adds a measured round trip of a command.
+
+        :param command: Executed command.
+        :param round_trip: Round trip time in seconds.
+        """
+        statistics = self.statistics.get(command)
+        if statistics is None:
+            statistics = self.statistics[command] = LatencyStatistics()
+        statistics.update(round_trip)
+
+    def failure(self, command: int) -> None:
+        """
+        Counts a failed attempt of a command.
+
+        :param command: Executed command.
+        """
+        statistics = self.statistics.get(command)
+        if statistics is None:
+            statistics = self.statistics[command] = LatencyStatistics()
+        statistics.failures += 1
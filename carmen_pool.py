@@ -0,0 +1,184 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from serial import Serial, SerialException
+
+from carmen import Carmen
+from carmen_calibration import LinkCalibration
+from carmen_communication import CommunicationCarmen
+from carmen_scheduler import DeadlineTimer
+from carmen_utils import CarmenTypeplate, system_rate_period
+
+
+class CarmenPool(object):
+    """
+    Manager for many Carmen sensors, which are polled in parallel by a thread pool.
+    The periodic polling runs in a separate thread per sensor. While it is running, the sensors are owned by
+    these threads and single commands of the pool are refused.
+    """
+
+    def __init__(self, devices: Dict[str, Carmen], buffer_size: int = 4096) -> None:
+        """
+        Initializes a instance of CarmenPool.
+
+        :param devices: Carmen sensors by port name.
+        :param buffer_size: Maximum number of buffered samples per sensor. Default is 4096.
+        """
+        self._devices = OrderedDict(devices)
+        self._buffers = OrderedDict((port, deque(maxlen=buffer_size)) for port in self._devices)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self._devices), 1), thread_name_prefix='CarmenPool')
+        self._threads = []
+        self._running = False
+
+    @classmethod
+    def open(cls, ports: List[str], baudrate: int = 57600, buffer_size: int = 4096,
+             calibration: LinkCalibration = None) -> 'CarmenPool':
+        """
+        Opens a communication and a Carmen sensor per serial port.
+        Ports which cannot be opened are skipped.
+
+        :param ports: Names of the serial ports.
+        :param baudrate: Connection baudrate. Default is 57600.
+        :param buffer_size: Maximum number of buffered samples per sensor. Default is 4096.
+        :param calibration: Calibrated baudrates, which are used instead of the baudrate. Default is None.
+        :return: The pool with all opened sensors.
+        """
+        devices = OrderedDict()
+        for port in ports:
+            port_baudrate = baudrate if calibration is None else calibration.get(port, baudrate)
+            try:
+                devices[port] = Carmen(CommunicationCarmen(Serial(port), port_baudrate))
+            except (IOError, SerialException) as error:
+                logging.error('cannot open port "{}": {}'.format(port, error))
+        return cls(devices, buffer_size)
+
+    @property
+    def ports(self) -> List[str]:
+        """
+        :return: Names of the ports in the pool.
+        """
+        return list(self._devices)
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if the periodic polling is running, else false.
+        """
+        return self._running
+
+    def _map(self, function, failure: tuple) -> Dict[str, object]:
+        """
+        Calls the given function for all sensors in parallel.
+        While the periodic polling is running, the function is not called and every sensor fails.
+
+        :param function: Function to call with a Carmen sensor.
+        :param failure: Result of a sensor if the function is not called.
+        :return: Results by port name.
+        """
+        if self._running:
+            logging.error('periodic polling is running, command refused')
+            return OrderedDict((port, failure) for port in self._devices)
+        futures = OrderedDict((port, self._executor.submit(function, carmen)) for port, carmen in self._devices.items())
+        return OrderedDict((port, future.result()) for port, future in futures.items())
+
+    def read_typeplates(self) -> Dict[str, Tuple[bool, CarmenTypeplate]]:
+        """
+        Reads the typeplate information of all sensors in parallel.
+        All sensors fail while the periodic polling is running.
+
+        :return: Results (success, typeplate) by port name.
+        """
+        return self._map(lambda carmen: carmen.read_typeplate(), (False, None))
+
+    def poll(self) -> Tuple[float, Dict[str, Tuple[bool, float, float, int]]]:
+        """
+        Reads one measurement of all sensors in parallel.
+        All sensors fail while the periodic polling is running.
+
+        :return: Timestamp of the poll.
+        :return: Measurements (success, pressure, temperature, status) by port name.
+        """
+        timestamp = time.monotonic()
+        return timestamp, self._map(lambda carmen: carmen.read_measurement(), (False, 0.0, 0.0, 0xFFFFFF))
+
+    def start(self) -> bool:
+        """
+        Starts the periodic polling. Every sensor is polled with the period of its system rate.
+
+        :return: True if all sensors are polled, else false.
+        """
+        if self._running:
+            return True
+        success = True
+        typeplates = self.read_typeplates()
+        self._running = True
+        for port, (typeplate_success, typeplate) in typeplates.items():
+            if typeplate_success:
+                period = system_rate_period(typeplate.SystemRate)
+                thread = threading.Thread(target=self._run, args=(port, period), name='CarmenPool-{}'.format(port),
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            else:
+                success = False
+                logging.error('cannot poll port "{}", typeplate not available'.format(port))
+        return success
+
+    def stop(self) -> None:
+        """
+        Stops the periodic polling and waits until all sensors are finished.
+        """
+        self._running = False
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def close(self) -> None:
+        """
+        Stops the polling and releases the thread pool.
+        """
+        self.stop()
+        self._executor.shutdown()
+
+    def _run(self, port: str, period: float) -> None:
+        """
+        Polls a sensor periodically until the polling is stopped.
+        The deadlines are absolute (see DeadlineTimer), so the polling does not drift. Missed deadlines are skipped.
+
+        :param port: Name of the port.
+        :param period: Polling period in seconds.
+        """
+        carmen = self._devices[port]
+        buffer = self._buffers[port]
+        timer = DeadlineTimer(period)
+        while self._running:
+            timer.wait()
+            success, pressure, temperature, status = carmen.read_measurement()
+            timestamp = time.monotonic()
+            if success:
+                with self._lock:
+                    buffer.append((timestamp, pressure, temperature, status))
+            timer.advance(timestamp)
+
+    def read_batch(self, period: float) -> List[Tuple[float, Dict[str, Tuple[float, float, int]]]]:
+        """
+        Reads all buffered samples and aligns them to time slots.
+        Every slot contains the last sample (pressure, temperature, status) of each sensor within the slot.
+
+        :param period: Width of the time slots in seconds.
+        :return: List of slots (slot timestamp, samples by port name), sorted by time.
+        """
+        slots = {}
+        with self._lock:
+            for port, buffer in self._buffers.items():
+                while buffer:
+                    timestamp, pressure, temperature, status = buffer.popleft()
+                    slot = math.floor(timestamp / period)
+                    slots.setdefault(slot, OrderedDict())[port] = (pressure, temperature, status)
+        return [(slot * period, samples) for slot, samples in sorted(slots.items())]
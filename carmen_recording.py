@@ -0,0 +1,156 @@
+import mmap
+import struct
+import time
+from typing import Tuple, Union
+
+from carmen_sample import Sample
+from carmen_utils import CarmenConverter, analyse_typeplate
+
+# all timestamps of a recording are host timestamps of the monotonic clock (time.monotonic) in seconds,
+# like the timestamps of every other Sample, so recorded and live samples can be compared directly,
+# the header stores both clocks at the start of the recording to convert the timestamps into wall clock time
+FRAME1_SIZE = 13
+
+_MAGIC = b'CREC'
+_VERSION = 2
+# magic, version, record size, typeplate size, start time (time.time), start time (time.monotonic)
+_HEADER = struct.Struct('<4sBBHdd')
+# timestamp (time.monotonic), response of "Read Measurement Frame1", padding
+_RECORD = struct.Struct('<d13s3x')
+
+
+class CarmenRecorder(object):
+    """
+    Recorder for the raw responses of "Read Measurement Frame1" in a binary file with fixed size records.
+    The file starts with the raw typeplate, so the recording can be decoded later.
+    """
+
+    def __init__(self, path: str, typeplate_buffer: bytes) -> None:
+        """
+        Creates the recording file.
+
+        :param path: Path of the recording file.
+        :param typeplate_buffer: Raw typeplate EEPROM content of the sensor.
+        """
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, _RECORD.size, len(typeplate_buffer), time.time(),
+                                      time.monotonic()))
+        self._file.write(bytes(typeplate_buffer))
+        self.count = 0
+
+    def __enter__(self) -> 'CarmenRecorder':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def record(self, frame: Union[bytes, bytearray, memoryview], timestamp: float = None) -> None:
+        """
+        Appends a response to the recording.
+
+        :param frame: Response of "Read Measurement Frame1" (13 bytes).
+        :param timestamp: Host timestamp (monotonic) in seconds. Default is None (current time).
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self._file.write(_RECORD.pack(timestamp, bytes(frame)))
+        self.count += 1
+
+    def close(self) -> None:
+        """
+        Closes the recording file.
+        """
+        self._file.close()
+
+
+class CarmenRecording(object):
+    """
+    Memory mapped recording, the samples are decoded on access.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens a recording file.
+
+        :param path: Path of the recording file.
+        """
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, typeplate_size, start_time, start_monotonic = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != _VERSION or record_size != _RECORD.size:
+            self._mmap.close()
+            raise IOError('"{}" is not a supported recording'.format(path))
+        # start of the recording on the wall clock (time.time) and on the monotonic clock
+        self.start_time = start_time
+        self.start_monotonic = start_monotonic
+        self._offset = _HEADER.size + typeplate_size
+        self.typeplate_buffer = bytes(self._mmap[_HEADER.size:self._offset])
+        _, self.typeplate = analyse_typeplate(self.typeplate_buffer)
+        self.converter = CarmenConverter(self.typeplate)
+
+    def __enter__(self) -> 'CarmenRecording':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return (len(self._mmap) - self._offset) // _RECORD.size
+
+    def __getitem__(self, index: int) -> Sample:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('sample index out of range')
+        offset = self._offset + index * _RECORD.size
+        timestamp = struct.unpack_from('<d', self._mmap, offset)[0]
+        return Sample(timestamp, *self.converter.decode_buffer(self._mmap, offset + 8))
+
+    def wall_time(self, timestamp: float) -> float:
+        """
+        Converts timestamps of the recording into wall clock time.
+
+        :param timestamp: Host timestamp (monotonic) in seconds or a NumPy array of them.
+        :return: Seconds since the epoch (like time.time).
+        """
+        return timestamp - self.start_monotonic + self.start_time
+
+    def records(self, start: int = 0, stop: int = None):
+        """
+        Returns a NumPy view of the raw records without copying (requires NumPy).
+
+        :param start: Index of the first record. Default is 0.
+        :param stop: Index after the last record. Default is None (end of the recording).
+        :return: Structured array with the fields "timestamp" and "frame".
+        """
+        import numpy as np
+
+        count = len(self)
+        stop = count if stop is None else min(stop, count)
+        start = min(start, stop)
+        dtype = np.dtype({'names': ['timestamp', 'frame'], 'formats': ['<f8', ('u1', FRAME1_SIZE)],
+                          'offsets': [0, 8], 'itemsize': _RECORD.size})
+        return np.frombuffer(self._mmap, dtype=dtype, count=stop - start, offset=self._offset + start * _RECORD.size)
+
+    def columns(self, start: int = 0, stop: int = None) -> Tuple:
+        """
+        Decodes a range of the recording into columns (requires NumPy).
+
+        :param start: Index of the first record. Default is 0.
+        :param stop: Index after the last record. Default is None (end of the recording).
+        :return: Timestamps.
+        :return: Pressure values.
+        :return: Temperature values.
+        :return: Status values.
+        """
+        from carmen_batch import decode_frames
+
+        records = self.records(start, stop)
+        # the timestamps are copied, a view would keep the file mapped and break close()
+        return (records['timestamp'].copy(),) + decode_frames(records['frame'], self.converter)
+
+    def close(self) -> None:
+        """
+        Closes the recording file.
+        """
+        self._mmap.close()
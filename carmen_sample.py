@@ -0,0 +1,99 @@
+from array import array
+from typing import Iterable, Iterator, Tuple
+
+
+class Sample(object):
+    """
+    Measurement of a Carmen sensor with the host timestamp.
+    """
+    __slots__ = ('timestamp', 'pressure', 'temperature', 'status')
+
+    def __init__(self, timestamp: float, pressure: float, temperature: float, status: int) -> None:
+        """
+        Initializes a sample.
+
+        :param timestamp: Host timestamp (monotonic) in seconds.
+        :param pressure: Pressure value.
+        :param temperature: Temperature value.
+        :param status: Actual status.
+        """
+        self.timestamp = timestamp
+        self.pressure = pressure
+        self.temperature = temperature
+        self.status = status
+
+    def __iter__(self) -> Iterator:
+        return iter((self.timestamp, self.pressure, self.temperature, self.status))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sample):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __repr__(self) -> str:
+        return 'Sample(timestamp={}, pressure={}, temperature={}, status=0x{:06X})'.format(
+            self.timestamp, self.pressure, self.temperature, self.status)
+
+
+class SampleBuffer(object):
+    """
+    Columnar buffer of samples, every column is stored in a compact array.
+    """
+    __slots__ = ('timestamp', 'pressure', 'temperature', 'status')
+
+    def __init__(self, samples: Iterable[Sample] = ()) -> None:
+        """
+        Initializes the buffer.
+
+        :param samples: Initial samples. Default is empty.
+        """
+        self.timestamp = array('d')
+        self.pressure = array('d')
+        self.temperature = array('d')
+        self.status = array('I')
+        self.extend(samples)
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, index: int) -> Sample:
+        return Sample(self.timestamp[index], self.pressure[index], self.temperature[index], self.status[index])
+
+    def __iter__(self) -> Iterator[Sample]:
+        return map(Sample, self.timestamp, self.pressure, self.temperature, self.status)
+
+    def append(self, timestamp: float, pressure: float, temperature: float, status: int) -> None:
+        """
+        Appends a sample.
+
+        :param timestamp: Host timestamp (monotonic) in seconds.
+        :param pressure: Pressure value.
+        :param temperature: Temperature value.
+        :param status: Actual status.
+        """
+        self.timestamp.append(timestamp)
+        self.pressure.append(pressure)
+        self.temperature.append(temperature)
+        self.status.append(status)
+
+    def extend(self, samples: Iterable[Sample]) -> None:
+        """
+        Appends several samples.
+
+        :param samples: Samples to append.
+        """
+        for sample in samples:
+            self.append(*sample)
+
+    def columns(self) -> Tuple[array, array, array, array]:
+        """
+        :return: The columns timestamp, pressure, temperature and status.
+        """
+        return self.timestamp, self.pressure, self.temperature, self.status
+
+    def clear(self) -> None:
+        """
+        Removes all samples.
+        """
+        for column in self.columns():
+            del column[:]
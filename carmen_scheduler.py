@@ -0,0 +1,176 @@
+import math
+import time
+from enum import Enum
+
+from carmen_acquisition import CarmenAcquisition
+from carmen_sample import Sample
+from carmen_utils import system_rate_period
+
+
+class Overrun(Enum):
+    """
+    Enum with the policies for missed deadlines.
+    """
+    # missed deadlines are polled back-to-back until the schedule is reached again
+    catch_up = 0
+    # missed deadlines are dropped, the next deadline on the grid is polled
+    skip = 1
+
+
+class ScheduledSample(Sample):
+    """
+    Measurement of a periodic polling with its deadline and the scheduling lateness.
+    """
+    __slots__ = ('deadline', 'lateness')
+
+    def __init__(self, timestamp: float, pressure: float, temperature: float, status: int, deadline: float,
+                 lateness: float) -> None:
+        """
+        Initializes a sample.
+
+        :param timestamp: Host timestamp (monotonic) in seconds, the middle of the command.
+        :param pressure: Pressure value.
+        :param temperature: Temperature value.
+        :param status: Actual status.
+        :param deadline: Scheduled time of the command (monotonic) in seconds.
+        :param lateness: Time between the deadline and the start of the command in seconds.
+        """
+        super().__init__(timestamp, pressure, temperature, status)
+        self.deadline = deadline
+        self.lateness = lateness
+
+
+def sleep_until(deadline: float, spin: float = 0.0002) -> None:
+    """
+    Waits until a monotonic deadline.
+    The thread sleeps until shortly before the deadline and only spins for the remaining time,
+    so the wake-up is precise without busy-waiting for the whole period.
+
+    :param deadline: Deadline (time.monotonic) in seconds.
+    :param spin: Time before the deadline to stop sleeping and to spin in seconds. Default is 0.0002.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.monotonic() < deadline:
+        pass
+
+
+class DeadlineTimer(object):
+    """
+    Absolute deadlines on the grid of a period on the monotonic clock.
+    The deadlines are multiples of the period, so periodic polling does not drift and sensors with the same period
+    are polled at the same time.
+    """
+
+    def __init__(self, period: float, policy: Overrun = Overrun.skip, max_backlog: int = 8,
+                 spin: float = 0.0002) -> None:
+        """
+        Initializes a instance of DeadlineTimer, the first deadline is the next multiple of the period.
+
+        :param period: Period in seconds.
+        :param policy: Policy for missed deadlines. Default is Overrun.skip.
+        :param max_backlog: Maximum number of missed deadlines which are caught up, further deadlines are skipped.
+                            Default is 8.
+        :param spin: Time to spin before a deadline in seconds. Default is 0.0002.
+        """
+        self.period = period
+        self.policy = policy
+        self.max_backlog = max_backlog
+        self.spin = spin
+        self.deadline = math.ceil(time.monotonic() / period) * period
+        # number of deadlines which were not polled
+        self.missed = 0
+
+    def wait(self) -> float:
+        """
+        Waits until the actual deadline.
+
+        :return: The deadline (time.monotonic) in seconds.
+        """
+        sleep_until(self.deadline, self.spin)
+        return self.deadline
+
+    def advance(self, now: float) -> None:
+        """
+        Moves to the next deadline after a poll, expired deadlines are handled by the policy.
+
+        :param now: End time of the poll (time.monotonic) in seconds.
+        """
+        period = self.period
+        self.deadline += period
+        # number of deadlines which are already expired
+        overdue = math.ceil((now - self.deadline) / period)
+        if overdue > 0 and (self.policy == Overrun.skip or overdue > self.max_backlog):
+            # when catching up the remaining expired deadlines are polled immediately
+            skipped = overdue if self.policy == Overrun.skip else overdue - self.max_backlog
+            self.deadline += skipped * period
+            self.missed += skipped
+
+
+class PollingScheduler(CarmenAcquisition):
+    """
+    Periodic polling of a Carmen sensor on absolute deadlines (see DeadlineTimer).
+    The samples are buffered and read like the samples of a continuous acquisition.
+    """
+
+    def __init__(self, carmen, divider: int = 1, policy: Overrun = Overrun.skip, max_backlog: int = 8,
+                 buffer_size: int = 4096, spin: float = 0.0002, period: float = None) -> None:
+        """
+        Initializes a instance of PollingScheduler.
+
+        :param carmen: Carmen sensor to poll.
+        :param divider: Poll every n-th period of the system rate. Default is 1.
+        :param policy: Policy for missed deadlines. Default is Overrun.skip.
+        :param max_backlog: Maximum number of missed deadlines which are caught up, further deadlines are skipped.
+                            Default is 8.
+        :param buffer_size: Maximum number of buffered samples. If the buffer is full the oldest samples are dropped.
+        :param spin: Time to spin before a deadline in seconds. Default is 0.0002.
+        :param period: Polling period in seconds. Default is None (period of the system rate times the divider).
+        """
+        super().__init__(carmen, buffer_size)
+        self._divider = divider
+        self._period = period
+        self.policy = policy
+        self.max_backlog = max_backlog
+        self.spin = spin
+        self._timer = None
+        self.max_lateness = 0.0
+
+    @property
+    def period(self) -> float:
+        """
+        :return: Polling period in seconds or None if the typeplate is not read.
+        """
+        if self._period is not None:
+            return self._period
+        typeplate = self._carmen.typeplate
+        if typeplate is None:
+            return None
+        return system_rate_period(typeplate.SystemRate) * self._divider
+
+    @property
+    def missed(self) -> int:
+        """
+        :return: Number of deadlines which were not polled.
+        """
+        return 0 if self._timer is None else self._timer.missed
+
+    def _run(self) -> None:
+        """
+        Polling thread, polls the sensor on every deadline until the polling is stopped.
+        """
+        timer = DeadlineTimer(self.period, self.policy, self.max_backlog, self.spin)
+        self._timer = timer
+        while self._running:
+            deadline = timer.wait()
+            start = time.monotonic()
+            success, pressure, temperature, status = self._carmen.read_measurement()
+            end = time.monotonic()
+            lateness = start - deadline
+            self.max_lateness = max(self.max_lateness, lateness)
+            if success:
+                self._store([ScheduledSample((start + end) / 2, pressure, temperature, status, deadline, lateness)])
+            else:
+                self._store([], 1)
+            timer.advance(end)
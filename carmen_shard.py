@@ -0,0 +1,317 @@
+import logging
+import multiprocessing
+import struct
+import time
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+from serial import Serial, SerialException
+
+from carmen import Carmen
+from carmen_communication import CommunicationCarmen
+from carmen_sample import SampleBuffer
+
+# ring header: write index, read index, dropped samples, failed measurements
+_HEADER = struct.Struct('<QQQQ')
+# ring record: port index, status, timestamp, pressure, temperature
+_RECORD = struct.Struct('<H2xIddd')
+
+
+class SharedSampleRing(object):
+    """
+    Single producer, single consumer ring buffer of samples in shared memory.
+    The producer only writes the write index and the consumer only writes the read index, so no lock is necessary.
+    If the ring is full, new samples are dropped and counted.
+    """
+
+    def __init__(self, name: str = None, capacity: int = 65536) -> None:
+        """
+        Creates a new ring or attaches to an existing ring.
+
+        :param name: Name of an existing ring. Default is None (create a new ring).
+        :param capacity: Maximum number of samples of a new ring, rounded up to a power of two. Default is 65536.
+        """
+        if name is None:
+            capacity = 1 << max(capacity - 1, 1).bit_length()
+            self._memory = shared_memory.SharedMemory(create=True, size=_HEADER.size + capacity * _RECORD.size)
+            _HEADER.pack_into(self._memory.buf, 0, 0, 0, 0, 0)
+            self._owner = True
+        else:
+            # child processes share the resource tracker of the creator, which unlinks the ring
+            self._memory = shared_memory.SharedMemory(name)
+            self._owner = False
+        self.capacity = (self._memory.size - _HEADER.size) // _RECORD.size
+        self._mask = self.capacity - 1
+
+    @property
+    def name(self) -> str:
+        """
+        :return: Name of the shared memory, to attach to the ring from another process.
+        """
+        return self._memory.name
+
+    @property
+    def dropped(self) -> int:
+        """
+        :return: Number of samples which were dropped because the ring was full.
+        """
+        return _HEADER.unpack_from(self._memory.buf)[2]
+
+    @property
+    def errors(self) -> int:
+        """
+        :return: Number of failed measurements reported by the producer.
+        """
+        return _HEADER.unpack_from(self._memory.buf)[3]
+
+    def __len__(self) -> int:
+        write_index, read_index, _, _ = _HEADER.unpack_from(self._memory.buf)
+        return write_index - read_index
+
+    def push(self, port: int, timestamp: float, pressure: float, temperature: float, status: int) -> bool:
+        """
+        Appends a sample, called by the producer only.
+
+        :param port: Index of the port.
+        :param timestamp: Host timestamp (monotonic) in seconds.
+        :param pressure: Pressure value.
+        :param temperature: Temperature value.
+        :param status: Actual status.
+        :return: True on success, false if the ring is full.
+        """
+        buffer = self._memory.buf
+        write_index, read_index, dropped, errors = _HEADER.unpack_from(buffer)
+        if write_index - read_index >= self.capacity:
+            struct.pack_into('<Q', buffer, 16, dropped + 1)
+            return False
+        _RECORD.pack_into(buffer, _HEADER.size + (write_index & self._mask) * _RECORD.size,
+                          port, status, timestamp, pressure, temperature)
+        # the record is complete before the write index is published
+        struct.pack_into('<Q', buffer, 0, write_index + 1)
+        return True
+
+    def count_error(self) -> None:
+        """
+        Counts a failed measurement, called by the producer only.
+        """
+        buffer = self._memory.buf
+        struct.pack_into('<Q', buffer, 24, struct.unpack_from('<Q', buffer, 24)[0] + 1)
+
+    def pop(self, max_count: int = None) -> List[Tuple[int, int, float, float, float]]:
+        """
+        Removes samples, called by the consumer only.
+
+        :param max_count: Maximum number of samples. Default is None (all available samples).
+        :return: List of samples (port index, status, timestamp, pressure, temperature).
+        """
+        buffer = self._memory.buf
+        write_index, read_index, _, _ = _HEADER.unpack_from(buffer)
+        count = write_index - read_index
+        if max_count is not None:
+            count = min(count, max_count)
+        if count <= 0:
+            return []
+        start = read_index & self._mask
+        # copy at most two contiguous parts, the records are unpacked in one call per part
+        first = min(count, self.capacity - start)
+        data = bytes(buffer[_HEADER.size + start * _RECORD.size:_HEADER.size + (start + first) * _RECORD.size])
+        if first < count:
+            data += bytes(buffer[_HEADER.size:_HEADER.size + (count - first) * _RECORD.size])
+        struct.pack_into('<Q', buffer, 8, read_index + count)
+        return list(_RECORD.iter_unpack(data))
+
+    def close(self) -> None:
+        """
+        Detaches from the ring, the creator also removes the shared memory.
+        """
+        if self._memory is not None:
+            self._memory.close()
+            if self._owner:
+                self._memory.unlink()
+            self._memory = None
+
+
+def _run_worker(ports: List[str], first_index: int, baudrate: int, ring_name: str, period: float,
+                stop_event) -> None:
+    """
+    Worker process, polls its sensors round robin and publishes the samples to the ring.
+
+    :param ports: Names of the serial ports of the worker.
+    :param first_index: Index of the first port in the acquisition.
+    :param baudrate: Connection baudrate.
+    :param ring_name: Name of the ring of the worker.
+    :param period: Minimum time between two polls of all sensors in seconds, None to poll back-to-back.
+    :param stop_event: Event to stop the worker.
+    """
+    ring = SharedSampleRing(ring_name)
+    devices = []
+    for index, port in enumerate(ports, first_index):
+        try:
+            communication = CommunicationCarmen(Serial(port), baudrate)
+        except (IOError, SerialException) as error:
+            logging.error('cannot open port "{}": {}'.format(port, error))
+            continue
+        communication.log_protocol = False
+        carmen = Carmen(communication)
+        success, _ = carmen.read_typeplate()
+        if not success:
+            logging.error('cannot read typeplate of "{}"'.format(port))
+            continue
+        devices.append((index, carmen))
+    deadline = time.monotonic()
+    while devices and not stop_event.is_set():
+        for index, carmen in devices:
+            success, pressure, temperature, status = carmen.read_measurement()
+            if success:
+                ring.push(index, time.monotonic(), pressure, temperature, status)
+            else:
+                ring.count_error()
+        if period:
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
+    del devices
+    ring.close()
+
+
+class ShardedAcquisition(object):
+    """
+    Continuous acquisition of many Carmen sensors in several worker processes.
+    Every worker owns a subset of the ports, polls and decodes the measurements and publishes the samples
+    into its own shared memory ring, so the parent reads them without pickling.
+    """
+
+    def __init__(self, ports: List[str], workers: int = None, baudrate: int = 57600, capacity: int = 65536,
+                 period: float = None) -> None:
+        """
+        Initializes a instance of ShardedAcquisition.
+
+        :param ports: Names of the serial ports.
+        :param workers: Number of worker processes. Default is None (number of CPUs, at most one per port).
+        :param baudrate: Connection baudrate. Default is 57600.
+        :param capacity: Maximum number of buffered samples per worker. Default is 65536.
+        :param period: Minimum time between two polls of a sensor in seconds. Default is None (back-to-back).
+        """
+        self._ports = list(ports)
+        workers = workers or multiprocessing.cpu_count()
+        self._workers = max(min(workers, len(self._ports)), 1)
+        self._baudrate = baudrate
+        self._capacity = capacity
+        self._period = period
+        self._rings = []
+        self._processes = []
+        self._stop_event = None
+
+    @property
+    def ports(self) -> List[str]:
+        """
+        :return: Names of the ports.
+        """
+        return list(self._ports)
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if any worker process is running, else false.
+        """
+        return any(process.is_alive() for process in self._processes)
+
+    @property
+    def dropped(self) -> int:
+        """
+        :return: Number of samples which were dropped because a ring was full.
+        """
+        return sum(ring.dropped for ring in self._rings)
+
+    @property
+    def errors(self) -> int:
+        """
+        :return: Number of failed measurements.
+        """
+        return sum(ring.errors for ring in self._rings)
+
+    def shards(self) -> List[List[str]]:
+        """
+        :return: The ports of every worker, the ports are split into contiguous parts of equal size.
+        """
+        size, rest = divmod(len(self._ports), self._workers)
+        shards = []
+        start = 0
+        for worker in range(self._workers):
+            end = start + size + (1 if worker < rest else 0)
+            shards.append(self._ports[start:end])
+            start = end
+        return shards
+
+    def start(self) -> None:
+        """
+        Creates the rings and starts the worker processes.
+        """
+        if self._processes:
+            return
+        self._stop_event = multiprocessing.Event()
+        first_index = 0
+        for shard in self.shards():
+            ring = SharedSampleRing(capacity=self._capacity)
+            process = multiprocessing.Process(target=_run_worker, name='CarmenShard',
+                                              args=(shard, first_index, self._baudrate, ring.name, self._period,
+                                                    self._stop_event), daemon=True)
+            process.start()
+            self._rings.append(ring)
+            self._processes.append(process)
+            first_index += len(shard)
+        logging.info('sharded acquisition of {} ports in {} processes started'.format(len(self._ports),
+                                                                                     len(self._processes)))
+
+    def stop(self) -> None:
+        """
+        Stops the worker processes and waits until they are finished.
+        Already buffered samples can still be read until the acquisition is closed.
+        """
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+    def close(self) -> None:
+        """
+        Stops the worker processes and removes the rings.
+        """
+        self.stop()
+        for ring in self._rings:
+            ring.close()
+        self._rings = []
+
+    def read(self, timeout: float = None) -> Dict[str, SampleBuffer]:
+        """
+        Reads all buffered samples.
+        Waits until at least one sample is available, the timeout is expired or all workers are finished.
+
+        :param timeout: Maximum time to wait in seconds. Default is None (wait forever).
+        :return: Sample buffers by port name, only ports with samples are included.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not any(len(ring) for ring in self._rings):
+            if not self.is_running or (deadline is not None and time.monotonic() >= deadline):
+                break
+            time.sleep(0.001)
+        buffers = OrderedDict()
+        for ring in self._rings:
+            for index, status, timestamp, pressure, temperature in ring.pop():
+                buffer = buffers.get(index)
+                if buffer is None:
+                    buffer = buffers[index] = SampleBuffer()
+                buffer.append(timestamp, pressure, temperature, status)
+        return OrderedDict((self._ports[index], buffer) for index, buffer in buffers.items())
+
+    def __enter__(self) -> 'ShardedAcquisition':
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
@@ -0,0 +1,326 @@
+import logging
+import math
+import os
+import random
+import select
+import threading
+import time
+import tty
+from datetime import date
+from typing import Callable, List, Optional, Tuple
+
+from carmen_utils import CarmenConverter, CarmenTypeplate, DigOutConverter, SystemRate, Units, build_typeplate
+from crc16 import calculate_crc16
+
+# request sizes by command, including the CRC16
+REQUEST_SIZES = {0xA0: 3, 0xA1: 3, 0x5A: 3, 0x35: 3, 0x03: 6}
+
+
+def default_typeplate() -> CarmenTypeplate:
+    """
+    Creates the typeplate information of a simulated sensor: -1 ... 2 bar, -20 ... 80 degC.
+
+    :return: Typeplate information.
+    """
+    info = CarmenTypeplate()
+    info.TypeplateType = 1
+    info.SerialNumber = 'SIM00000001'
+    info.xRV_1_Unit, info.LRV_1, info.URV_1 = Units.bar, -1.0, 2.0
+    info.xRV_2_Unit, info.LRV_2, info.URV_2 = Units.degC, -20.0, 80.0
+    info.xRV_3_Unit, info.LRV_3, info.URV_3 = Units.none, 0.0, 1.0
+    info.MWP_Unit, info.MWP = Units.bar, 10.0
+    info.OPL_Unit, info.OPL = Units.bar, 15.0
+    info.SystemRate = SystemRate.Rate_1_25_ms
+    info.DateModified = date(2020, 1, 1)
+    return info
+
+
+def _to_digout(converter: DigOutConverter, value: float) -> int:
+    """
+    Converts a float value into a digital output value, the inverse of DigOutConverter.convert.
+
+    :param converter: Converter of the digital output.
+    :param value: Float value.
+    :return: Digital output value.
+    """
+    limit = converter.sign - 1
+    integer = max(-limit - 1, min(limit, int(round((value - converter.offset) / converter.scale))))
+    return integer & ((1 << converter.bits) - 1)
+
+
+class CarmenSimulator(object):
+    """
+    Protocol accurate simulation of a Carmen sensor.
+    The simulator answers "Stop DSP", "Continue DSP", "Soft Reset", "Read Measurement Frame1" and "Read EEPROM"
+    and can be connected to a pty, so it can be opened like a serial port.
+    """
+
+    def __init__(self, typeplate: CarmenTypeplate = None,
+                 measurement: Callable[[float], Tuple[float, float, int]] = None, baudrate: int = 57600,
+                 latency: float = 0.0, jitter: float = 0.0, drop_rate: float = 0.0, corrupt_rate: float = 0.0,
+                 seed: int = None) -> None:
+        """
+        Initializes the simulator.
+
+        :param typeplate: Typeplate information stored in the EEPROM. Default is None (default_typeplate).
+        :param measurement: Function of the time, returns the measurement (pressure, temperature, status).
+                            Default is None (sine wave).
+        :param baudrate: Simulated baudrate to pace the responses, None to answer immediately. Default is 57600.
+        :param latency: Additional turnaround time in seconds. Default is 0.0.
+        :param jitter: Maximum random additional turnaround time in seconds. Default is 0.0.
+        :param drop_rate: Probability of a missing response. Default is 0.0.
+        :param corrupt_rate: Probability of a response with a corrupted byte. Default is 0.0.
+        :param seed: Seed of the random faults. Default is None.
+        """
+        self.typeplate = default_typeplate() if typeplate is None else typeplate
+        self.eeprom = bytearray(0x0400 * 4)
+        self.eeprom[0x0190 * 4:0x019C * 4] = bytes(build_typeplate(self.typeplate))
+        self.measurement = measurement or self._sine
+        self.baudrate = baudrate
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.dsp_running = True
+        self.requests = 0
+        self._converter = CarmenConverter(self.typeplate)
+        self._random = random.Random(seed)
+        self._buffer = bytearray()
+        self._start = time.monotonic()
+        self._thread = None
+        self._running = False
+        self._master = None
+        self._slave = None
+        self.port = None
+
+    def _sine(self, timestamp: float) -> Tuple[float, float, int]:
+        """
+        Default measurement, a pressure sine wave of 1 Hz within the range and a constant temperature.
+
+        :param timestamp: Time since the start of the simulator in seconds.
+        :return: Pressure value, temperature value, status.
+        """
+        center = (self.typeplate.LRV_1 + self.typeplate.URV_1) / 2
+        amplitude = (self.typeplate.URV_1 - self.typeplate.LRV_1) / 4
+        return center + amplitude * math.sin(2 * math.pi * timestamp), 25.0, 0x000000
+
+    @staticmethod
+    def _frame(data: List[int]) -> bytes:
+        """
+        Appends the CRC16 to a response.
+
+        :param data: Response without CRC16.
+        :return: Complete response.
+        """
+        crc = calculate_crc16(data)
+        return bytes(data + [crc & 0xFF, crc >> 8])
+
+    def handle(self, request: bytes) -> Optional[bytes]:
+        """
+        Handles a complete request.
+
+        :param request: Request including the CRC16.
+        :return: The response or None if the request is invalid or the response is dropped.
+        """
+        command = request[0]
+        if calculate_crc16(request[:-2]) != (request[-2] | (request[-1] << 8)):
+            logging.error('simulator: invalid crc')
+            return None
+        self.requests += 1
+        if command == 0xA0:
+            self.dsp_running = False
+            response = self._frame([command, 0x80])
+        elif command in (0xA1, 0x5A):
+            self.dsp_running = True
+            response = self._frame([command, 0x80])
+        elif command == 0x35:
+            pressure, temperature, status = self.measurement(time.monotonic() - self._start)
+            pressure_value = _to_digout(self._converter.pressure, pressure)
+            temperature_value = _to_digout(self._converter.temperature, temperature)
+            response = self._frame([command,
+                                    pressure_value & 0xFF, (pressure_value >> 8) & 0xFF, pressure_value >> 16,
+                                    temperature_value & 0xFF, temperature_value >> 8, 0x00, 0x00,
+                                    status & 0xFF, (status >> 8) & 0xFF, (status >> 16) & 0xFF])
+        elif command == 0x03:
+            address = ((request[1] << 8) | request[2]) * 4
+            size = request[3]
+            data = bytes(self.eeprom[address:address + size * 4]).ljust(size * 4, b'\x00')
+            response = self._frame([command, 0x80, size] + list(data))
+        else:
+            return None
+        if self._random.random() < self.drop_rate:
+            return None
+        if self._random.random() < self.corrupt_rate:
+            corrupted = bytearray(response)
+            corrupted[self._random.randrange(len(corrupted))] ^= 1 << self._random.randrange(8)
+            response = bytes(corrupted)
+        return response
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        Feeds received bytes and handles all complete requests.
+        Unknown commands are skipped byte by byte.
+
+        :param data: Received bytes.
+        :return: List of responses.
+        """
+        self._buffer += data
+        responses = []
+        while self._buffer:
+            size = REQUEST_SIZES.get(self._buffer[0])
+            if size is None:
+                del self._buffer[0]
+                continue
+            if len(self._buffer) < size:
+                break
+            request = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            response = self.handle(request)
+            if response is not None:
+                responses.append(response)
+        return responses
+
+    def response_delay(self, size: int) -> float:
+        """
+        Returns the simulated time to send a response.
+
+        :param size: Size of the response.
+        :return: Delay in seconds.
+        """
+        delay = self.latency + self._random.uniform(0.0, self.jitter)
+        if self.baudrate:
+            # start bit, 8 data bits, stop bit
+            delay += size * 10 / self.baudrate
+        return delay
+
+    def start(self) -> str:
+        """
+        Starts the simulator on a new pty.
+
+        :return: Name of the port to open.
+        """
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='CarmenSimulator', daemon=True)
+        self._thread.start()
+        logging.info('simulator is running on "{}"'.format(self.port))
+        return self.port
+
+    def stop(self) -> None:
+        """
+        Stops the simulator and closes the pty.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self) -> 'CarmenSimulator':
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        """
+        Simulator thread, answers the requests on the pty.
+        """
+        while self._running:
+            readable, _, _ = select.select([self._master], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                continue
+            for response in self.feed(data):
+                time.sleep(self.response_delay(len(response)))
+                os.write(self._master, response)
+
+
+class SimulatedSerial(object):
+    """
+    In-memory stand-in for a serial port connected to a simulator.
+    The responses are available immediately, the pacing of the simulator is not applied.
+    """
+
+    def __init__(self, simulator: CarmenSimulator, name: str = 'simulated') -> None:
+        """
+        Initializes the serial stand-in.
+
+        :param simulator: Simulator which answers the written requests.
+        :param name: Name of the port. Default is "simulated".
+        """
+        self.simulator = simulator
+        self.name = name
+        self.baudrate = 57600
+        self.timeout = None
+        self.is_open = False
+        self._input = bytearray()
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._input)
+
+    def open(self) -> None:
+        self.is_open = True
+
+    def close(self) -> None:
+        self.is_open = False
+
+    def write(self, data: bytes) -> int:
+        for response in self.simulator.feed(bytes(data)):
+            self._input += response
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self._input[:size])
+        del self._input[:size]
+        return data
+
+    def readinto(self, buffer: bytearray) -> int:
+        size = min(len(buffer), len(self._input))
+        buffer[:size] = self._input[:size]
+        del self._input[:size]
+        return size
+
+    def reset_input_buffer(self) -> None:
+        self._input.clear()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Simulates Carmen sensors on ptys.')
+    parser.add_argument('-n', '--count', type=int, default=1, help='number of simulated sensors')
+    parser.add_argument('--baudrate', type=int, default=57600, help='simulated baudrate, 0 to disable pacing')
+    parser.add_argument('--latency', type=float, default=0.0, help='turnaround time in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random turnaround time in seconds')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='probability of a missing response')
+    parser.add_argument('--corrupt-rate', type=float, default=0.0, help='probability of a corrupted response')
+    arguments = parser.parse_args()
+
+    simulators = []
+    for index in range(arguments.count):
+        simulator_typeplate = default_typeplate()
+        simulator_typeplate.SerialNumber = 'SIM{:08d}'.format(index + 1)
+        simulator = CarmenSimulator(simulator_typeplate, baudrate=arguments.baudrate, latency=arguments.latency,
+                                    jitter=arguments.jitter, drop_rate=arguments.drop_rate,
+                                    corrupt_rate=arguments.corrupt_rate)
+        print('{} {}'.format(simulator_typeplate.SerialNumber, simulator.start()), flush=True)
+        simulators.append(simulator)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    for simulator in simulators:
+        simulator.stop()
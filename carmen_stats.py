@@ -0,0 +1,297 @@
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Tuple
+
+# upper bounds of the exported histogram buckets in seconds
+EXPORT_BOUNDS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+
+
+class LatencyHistogram(object):
+    """
+    Log-linear latency histogram with a bounded relative error, like HdrHistogram.
+    Every power of two is divided into 2^bits linear sub-buckets, so recording is a few integer operations.
+    """
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'counts', '_scale', '_bits', '_sub_buckets')
+
+    def __init__(self, resolution: float = 1e-6, bits: int = 5) -> None:
+        """
+        Initializes an empty histogram.
+
+        :param resolution: Smallest distinguishable latency in seconds. Default is 1e-6.
+        :param bits: Number of sub-bucket bits, the relative error is 2^-bits. Default is 5 (about 3 %).
+        """
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.counts = []
+        self._scale = 1 / resolution
+        self._bits = bits
+        self._sub_buckets = 1 << bits
+
+    def _index(self, value: int) -> int:
+        """
+        :param value: Latency in units of the resolution.
+        :return: Index of the bucket.
+        """
+        if value < 2 * self._sub_buckets:
+            return value
+        shift = value.bit_length() - self._bits - 1
+        return ((shift + 1) << self._bits) + (value >> shift) - self._sub_buckets
+
+    def bucket_bounds(self, index: int) -> Tuple[float, float]:
+        """
+        :param index: Index of the bucket.
+        :return: Lower and upper bound of the bucket in seconds.
+        """
+        if index < 2 * self._sub_buckets:
+            lower, upper = index, index + 1
+        else:
+            shift = (index >> self._bits) - 1
+            mantissa = (index & (self._sub_buckets - 1)) + self._sub_buckets
+            lower, upper = mantissa << shift, (mantissa + 1) << shift
+        return lower / self._scale, upper / self._scale
+
+    def record(self, latency: float) -> None:
+        """
+        Records a latency.
+
+        :param latency: Latency in seconds.
+        """
+        index = self._index(int(latency * self._scale))
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += latency
+        if self.minimum is None or latency < self.minimum:
+            self.minimum = latency
+        if self.maximum is None or latency > self.maximum:
+            self.maximum = latency
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Returns a percentile of the recorded latencies.
+
+        :param fraction: Percentile as fraction, e.g. 0.99.
+        :return: Upper bound of the bucket of the percentile in seconds, 0.0 without latencies.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(fraction * self.count, 1)
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(self.bucket_bounds(index)[1], self.maximum)
+        return self.maximum
+
+    def cumulative(self, bounds: Iterable[float] = EXPORT_BOUNDS) -> List[Tuple[float, int]]:
+        """
+        Returns the cumulative counts for the given upper bounds, like the buckets of a Prometheus histogram.
+        A bucket is counted for a bound if its upper bound does not exceed it.
+
+        :param bounds: Ascending upper bounds in seconds. Default is EXPORT_BOUNDS.
+        :return: List of (upper bound, cumulative count).
+        """
+        result = []
+        cumulative = 0
+        index = 0
+        for bound in bounds:
+            while index < len(self.counts) and self.bucket_bounds(index)[1] <= bound:
+                cumulative += self.counts[index]
+                index += 1
+            result.append((bound, cumulative))
+        return result
+
+
+class CommandStatistics(object):
+    """
+    Counters and latency histograms of a single command.
+    """
+
+    __slots__ = ('requests', 'responses', 'timeouts', 'crc_errors', 'invalid', 'retries', 'bytes_sent',
+                 'bytes_received', 'round_trip', 'duration')
+
+    def __init__(self) -> None:
+        """
+        Initializes zero counters and empty histograms.
+        """
+        self.requests = 0
+        self.responses = 0
+        self.timeouts = 0
+        self.crc_errors = 0
+        self.invalid = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # time from sending a request to its valid response
+        self.round_trip = LatencyHistogram()
+        # time of a complete Carmen command including retries and validation
+        self.duration = LatencyHistogram()
+
+
+class CarmenStatistics(object):
+    """
+    Statistics of a Carmen sensor by command byte.
+    The counters are not locked, every sensor is expected to be used by a single thread at a time.
+    """
+
+    def __init__(self, port: str) -> None:
+        """
+        Initializes empty statistics.
+
+        :param port: Name of the port, used as label of the exported metrics.
+        """
+        self.port = port
+        self.commands = OrderedDict()  # type: Dict[int, CommandStatistics]
+
+    def command(self, command: int) -> CommandStatistics:
+        """
+        :param command: Command byte.
+        :return: The statistics of the command, created if necessary.
+        """
+        statistics = self.commands.get(command)
+        if statistics is None:
+            statistics = self.commands[command] = CommandStatistics()
+        return statistics
+
+    def reset(self) -> None:
+        """
+        Removes all statistics.
+        """
+        self.commands.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the counters and the main percentiles of all commands.
+
+        :return: Values by name by command (as hex string).
+        """
+        result = OrderedDict()
+        for command, statistics in list(self.commands.items()):
+            values = OrderedDict((attribute, getattr(statistics, attribute)) for attribute, _, _ in _COUNTERS)
+            for name in ('round_trip', 'duration'):
+                histogram = getattr(statistics, name)
+                values[name + '_count'] = histogram.count
+                values[name + '_p50'] = histogram.percentile(0.5)
+                values[name + '_p99'] = histogram.percentile(0.99)
+                values[name + '_max'] = histogram.maximum or 0.0
+            result['0x{:02X}'.format(command)] = values
+        return result
+
+
+# exported counters: attribute, metric name, help
+_COUNTERS = (('requests', 'carmen_requests_total', 'Sent requests.'),
+             ('responses', 'carmen_responses_total', 'Received valid responses.'),
+             ('timeouts', 'carmen_timeouts_total', 'Responses which were not received in time.'),
+             ('crc_errors', 'carmen_crc_errors_total', 'Received responses with an invalid CRC16.'),
+             ('invalid', 'carmen_invalid_responses_total', 'Responses with a wrong command or size.'),
+             ('retries', 'carmen_retries_total', 'Retried requests.'),
+             ('bytes_sent', 'carmen_sent_bytes_total', 'Sent bytes.'),
+             ('bytes_received', 'carmen_received_bytes_total', 'Received bytes.'))
+
+# exported histograms: attribute, metric name, help
+_HISTOGRAMS = (('round_trip', 'carmen_round_trip_seconds', 'Time from a request to its valid response.'),
+               ('duration', 'carmen_command_duration_seconds', 'Time of a command including retries.'))
+
+
+def format_prometheus(statistics: Iterable[CarmenStatistics]) -> str:
+    """
+    Formats statistics in the Prometheus text format.
+
+    :param statistics: Statistics of the sensors.
+    :return: The metrics.
+    """
+    statistics = list(statistics)
+    lines = []
+    for attribute, name, description in _COUNTERS:
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} counter'.format(name))
+        for sensor in statistics:
+            for command, values in list(sensor.commands.items()):
+                lines.append('{}{{port="{}",command="0x{:02X}"}} {}'.format(name, sensor.port, command,
+                                                                           getattr(values, attribute)))
+    for attribute, name, description in _HISTOGRAMS:
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} histogram'.format(name))
+        for sensor in statistics:
+            for command, values in list(sensor.commands.items()):
+                histogram = getattr(values, attribute)
+                labels = 'port="{}",command="0x{:02X}"'.format(sensor.port, command)
+                for bound, count in histogram.cumulative():
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count))
+                lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, histogram.count))
+                lines.append('{}_sum{{{}}} {}'.format(name, labels, histogram.total))
+                lines.append('{}_count{{{}}} {}'.format(name, labels, histogram.count))
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusExporter(object):
+    """
+    HTTP server for the statistics in the Prometheus text format, running in a background thread.
+    """
+
+    def __init__(self, statistics: Iterable[CarmenStatistics], host: str = '127.0.0.1', port: int = 9477) -> None:
+        """
+        Initializes the exporter.
+
+        :param statistics: Statistics of the sensors.
+        :param host: Address to listen on. Default is "127.0.0.1" (local only).
+        :param port: Port to listen on, 0 for a free port. Default is 9477.
+        """
+        self.statistics = list(statistics)
+        self._address = (host, port)
+        self._server = None
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        """
+        :return: Port of the running server or None.
+        """
+        return None if self._server is None else self._server.server_address[1]
+
+    def start(self) -> None:
+        """
+        Starts the server.
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self) -> None:
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = format_prometheus(exporter.statistics).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, message: str, *arguments) -> None:
+                logging.debug('exporter: ' + message, *arguments)
+
+        self._server = ThreadingHTTPServer(self._address, Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.1},
+                                        name='PrometheusExporter', daemon=True)
+        self._thread.start()
+        logging.info('prometheus exporter is running on port {}'.format(self.port))
+
+    def stop(self) -> None:
+        """
+        Stops the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
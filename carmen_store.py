@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+
+class PortStore(object):
+    """
+    Persistent JSON file with one entry per port.
+    The file is loaded on creation and written atomically on every change, files of another version are ignored.
+    """
+
+    # version of the file content and description for the log messages, set by the subclasses
+    version = 1
+    description = 'port store'
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes the store and loads the file if it exists.
+
+        :param path: Path of the JSON file.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(path, 'r') as file:
+                content = json.load(file)
+            if content.get('version') == self.version:
+                self._entries = content['ports']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, AttributeError) as error:
+            logging.error('invalid {} "{}": {}'.format(self.description, path, error))
+
+    def _get(self, port: str) -> Optional[dict]:
+        """
+        Returns the entry of a port.
+
+        :param port: Name of the port.
+        :return: The entry or None.
+        """
+        with self._lock:
+            return self._entries.get(port)
+
+    def _put(self, port: str, entry: dict) -> None:
+        """
+        Stores the entry of a port and writes the file.
+
+        :param port: Name of the port.
+        :param entry: JSON serializable entry.
+        """
+        with self._lock:
+            self._entries[port] = entry
+            self._save()
+
+    def remove(self, port: str) -> None:
+        """
+        Removes the entry of a port and writes the file.
+
+        :param port: Name of the port.
+        """
+        with self._lock:
+            if self._entries.pop(port, None) is not None:
+                self._save()
+
+    def _save(self) -> None:
+        """
+        Writes the file atomically.
+        """
+        temporary = '{}.tmp'.format(self._path)
+        with open(temporary, 'w') as file:
+            json.dump({'version': self.version, 'ports': self._entries}, file, indent=1, sort_keys=True)
+        os.replace(temporary, self._path)
@@ -0,0 +1,90 @@
+import os
+import struct
+import time
+from typing import Iterator, Tuple, Union
+
+# directions of traced frames
+TRACE_SEND = 0
+TRACE_RECEIVE = 1
+
+_MAGIC = b'CTRC\x01'
+_RECORD = struct.Struct('<QBH')
+
+
+class HexBytes(object):
+    """
+    Wrapper to format data as hex string only when a log record is emitted.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data: Union[list, bytes, bytearray, memoryview]) -> None:
+        """
+        Initializes the wrapper.
+
+        :param data: Data to format.
+        """
+        self._data = data
+
+    def __str__(self) -> str:
+        return ' '.join('0x{:02X}'.format(x) for x in self._data)
+
+
+class ProtocolTrace(object):
+    """
+    Binary trace file of the raw frames with monotonic timestamps.
+    Every record contains the timestamp in nanoseconds, the direction, the size and the raw frame.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens the trace file, new records are appended.
+
+        :param path: Path of the trace file.
+        """
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab')
+        if new_file:
+            self._file.write(_MAGIC)
+
+    def __enter__(self) -> 'ProtocolTrace':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def record(self, direction: int, data: Union[list, bytes, bytearray, memoryview]) -> None:
+        """
+        Appends a frame to the trace file.
+
+        :param direction: TRACE_SEND or TRACE_RECEIVE.
+        :param data: Raw frame.
+        """
+        self._file.write(_RECORD.pack(time.monotonic_ns(), direction, len(data)))
+        self._file.write(bytes(data))
+
+    def close(self) -> None:
+        """
+        Closes the trace file.
+        """
+        self._file.close()
+
+
+def read_trace(path: str) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Reads the records of a binary trace file.
+
+    :param path: Path of the trace file.
+    :return: Iterator of records (timestamp in nanoseconds, direction, raw frame).
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise IOError('"{}" is not a trace file'.format(path))
+        while True:
+            header = file.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            timestamp, direction, size = _RECORD.unpack(header)
+            data = file.read(size)
+            if len(data) < size:
+                return
+            yield timestamp, direction, data
@@ -0,0 +1,43 @@
+from typing import Optional
+
+from carmen_store import PortStore
+
+# EEPROM range of the typeplate and of the word with the date modified, which validates a cached typeplate
+TYPEPLATE_ADDRESS = 0x0190
+TYPEPLATE_SIZE = 12
+VALIDATION_ADDRESS = 0x019B
+VALIDATION_SIZE = 1
+
+
+class TypeplateCache(PortStore):
+    """
+    Persistent cache of the raw typeplate EEPROM content, keyed by port and validated by the date modified.
+    """
+
+    version = 1
+    description = 'typeplate cache'
+
+    def get(self, port: str) -> Optional[bytes]:
+        """
+        Returns the cached typeplate EEPROM content of a port.
+
+        :param port: Name of the port.
+        :return: The raw typeplate (48 bytes) or None.
+        """
+        entry = self._get(port)
+        if entry is None:
+            return None
+        return bytes.fromhex(entry['Typeplate'])
+
+    def put(self, port: str, buffer: bytes, serial_number: str, date_modified: str) -> None:
+        """
+        Stores the typeplate EEPROM content of a port and writes the cache file.
+
+        :param port: Name of the port.
+        :param buffer: The raw typeplate (48 bytes).
+        :param serial_number: Serial number of the sensor.
+        :param date_modified: Date of the last modification of the typeplate.
+        """
+        self._put(port, {'SerialNumber': serial_number,
+                         'DateModified': date_modified,
+                         'Typeplate': bytes(buffer).hex()})
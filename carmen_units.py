@@ -0,0 +1,80 @@
+from array import array
+from typing import Dict, Tuple
+
+from carmen_utils import Units
+
+# linear conversion of every unit into the base unit of its quantity (Pa or K): base = value * factor + offset
+_TO_BASE = {Units.none: ('none', 1.0, 0.0),
+            Units.mbar: ('pressure', 100.0, 0.0),
+            Units.bar: ('pressure', 100000.0, 0.0),
+            Units.psi: ('pressure', 6894.757293168361, 0.0),
+            Units.Pa: ('pressure', 1.0, 0.0),
+            Units.kPa: ('pressure', 1000.0, 0.0),
+            Units.MPa: ('pressure', 1000000.0, 0.0),
+            Units.mmH2O: ('pressure', 9.80665, 0.0),
+            Units.mH2O: ('pressure', 9806.65, 0.0),
+            Units.ftH2O: ('pressure', 0.3048 * 9806.65, 0.0),
+            Units.inH2O: ('pressure', 0.0254 * 9806.65, 0.0),
+            Units.mmHg: ('pressure', 133.322387415, 0.0),
+            Units.degC: ('temperature', 1.0, 273.15),
+            Units.kelvin: ('temperature', 1.0, 0.0),
+            Units.degF: ('temperature', 5 / 9, 459.67 * 5 / 9)}
+
+
+def _build_conversions() -> Dict[Tuple[Units, Units], Tuple[float, float]]:
+    """
+    :return: Factor and offset of all conversions between units of the same quantity.
+    """
+    conversions = {}
+    for source, (source_quantity, source_factor, source_offset) in _TO_BASE.items():
+        for target, (target_quantity, target_factor, target_offset) in _TO_BASE.items():
+            if source_quantity == target_quantity:
+                factor = source_factor / target_factor
+                conversions[(source, target)] = (factor, (source_offset - target_offset) / target_factor)
+    return conversions
+
+
+# precomputed conversions: target = source * factor + offset
+CONVERSIONS = _build_conversions()
+
+
+def unit_quantity(unit: Units) -> str:
+    """
+    Returns the physical quantity of a unit.
+
+    :param unit: Unit.
+    :return: 'pressure', 'temperature' or 'none'.
+    """
+    return _TO_BASE[unit][0]
+
+
+def unit_conversion(source: Units, target: Units) -> Tuple[float, float]:
+    """
+    Returns the linear conversion between two units.
+
+    :param source: Unit of the values.
+    :param target: Requested unit.
+    :return: Factor.
+    :return: Offset.
+    """
+    try:
+        return CONVERSIONS[(source, target)]
+    except KeyError:
+        raise ValueError('cannot convert {} into {}'.format(source, target)) from None
+
+
+def convert_unit(values, source: Units, target: Units):
+    """
+    Converts values between units.
+
+    :param values: Scalar, NumPy array, array or sequence of values.
+    :param source: Unit of the values.
+    :param target: Requested unit.
+    :return: The converted values of the same kind (sequences are returned as lists).
+    """
+    factor, offset = unit_conversion(source, target)
+    if isinstance(values, (int, float)) or hasattr(values, 'astype'):
+        return values * factor + offset
+    if isinstance(values, array):
+        return array('d', [value * factor + offset for value in values])
+    return [value * factor + offset for value in values]
@@ -1,7 +1,7 @@
 import struct
 from datetime import date
 from enum import Enum
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
 
 class Units(Enum):
@@ -40,27 +40,30 @@ class SystemRate(Enum):
     Rate_160_ms = 7
 
 
+def system_rate_period(rate: SystemRate) -> float:
+    """
+    Returns the measurement period of the given system rate.
+
+    :param rate: System rate.
+    :return: Period in seconds.
+    """
+    return 0.00125 * (1 << rate.value)
+
+
 class CarmenTypeplate(object):
     """
     Class to store typeplate information.
     """
-    TypeplateType = None
-    SerialNumber = None
-    LRV_1 = None
-    URV_1 = None
-    xRV_1_Unit = None
-    LRV_2 = None
-    URV_2 = None
-    xRV_2_Unit = None
-    LRV_3 = None
-    URV_3 = None
-    xRV_3_Unit = None
-    MWP = None
-    MWP_Unit = None
-    OPL = None
-    OPL_Unit = None
-    SystemRate = None
-    DateModified = None
+    __slots__ = ('TypeplateType', 'SerialNumber',
+                 'LRV_1', 'URV_1', 'xRV_1_Unit',
+                 'LRV_2', 'URV_2', 'xRV_2_Unit',
+                 'LRV_3', 'URV_3', 'xRV_3_Unit',
+                 'MWP', 'MWP_Unit', 'OPL', 'OPL_Unit',
+                 'SystemRate', 'DateModified')
+
+    def __init__(self) -> None:
+        for name in self.__slots__:
+            setattr(self, name, None)
 
     def __str__(self) -> str:
         result = '---------- Typeplate Information ----------\n'
@@ -132,6 +135,55 @@ def analyse_typeplate(buffer: List[int]) -> Tuple[bool, CarmenTypeplate]:
     return True, info
 
 
+def build_typeplate(info: CarmenTypeplate) -> List[int]:
+    """
+    Builds the typeplate buffer from typeplate information, the inverse of analyse_typeplate.
+    Unused bytes are zero.
+
+    :param info: Typeplate information.
+    :return: Typeplate buffer (48 bytes).
+    """
+
+    def decode_short_ieee(value: float) -> List[int]:
+        """
+        Decodes a floating point number to a short IEEE data.
+
+        :param value: Floating point number to decode.
+        :return: The short IEEE data (three bytes).
+        """
+        integer = struct.unpack('!I', struct.pack('!f', value))[0] >> 8
+        return [integer & 0xFF, (integer >> 8) & 0xFF, integer >> 16]
+
+    buffer = [0x00] * 48
+    # typeplate type
+    buffer[0] = info.TypeplateType
+    # serial number
+    serial_number = [ord(c) for c in info.SerialNumber.ljust(11)[:11]]
+    for index, position in enumerate([3, 2, 1, 7, 6, 5, 4, 11, 10, 9, 8]):
+        buffer[position] = serial_number[index]
+    # dig1, dig2, dig3, MWP, OPL
+    buffer[12] = info.xRV_1_Unit.value
+    buffer[13:16] = decode_short_ieee(info.LRV_1)
+    buffer[17:20] = decode_short_ieee(info.URV_1)
+    buffer[20] = info.xRV_2_Unit.value
+    buffer[21:24] = decode_short_ieee(info.LRV_2)
+    buffer[25:28] = decode_short_ieee(info.URV_2)
+    buffer[28] = info.xRV_3_Unit.value
+    buffer[29:32] = decode_short_ieee(info.LRV_3)
+    buffer[33:36] = decode_short_ieee(info.URV_3)
+    buffer[36] = info.MWP_Unit.value
+    buffer[37:40] = decode_short_ieee(info.MWP)
+    buffer[40] = info.OPL_Unit.value
+    buffer[41:44] = decode_short_ieee(info.OPL)
+    # system rate
+    buffer[32] = info.SystemRate.value
+    # date modified
+    date_buffer = ((info.DateModified.year - 2000) << 9) | (info.DateModified.month << 5) | info.DateModified.day
+    buffer[44] = date_buffer & 0xFF
+    buffer[45] = date_buffer >> 8
+    return buffer
+
+
 def convert_digout(value: int, bits: int, lrv: float, urv: float, offset: float = 0.0):
     """
     Converts a digital output value (fixed point format) into float value corresponding to the given limits.
@@ -151,3 +203,141 @@ def convert_digout(value: int, bits: int, lrv: float, urv: float, offset: float
         value = ((~value + 1) & (2 ** bits - 1)) * -1
     fixed_point = value / (2 ** bits)
     return (urv - lrv) * fixed_point / (dig_max - dig_min) + offset
+
+
+class DigOutConverter(object):
+    """
+    Converter for digital output values (fixed point format) with precomputed scaling.
+    """
+    __slots__ = ('bits', 'sign', 'scale', 'offset')
+
+    def __init__(self, bits: int, lrv: float, urv: float, offset: float = 0.0) -> None:
+        """
+        Initializes the converter, the scaling corresponds to convert_digout.
+
+        :param bits: Number of bits used in the fixed point format.
+        :param lrv: Lower range limit.
+        :param urv: Upper range limit.
+        :param offset: Zero offset. Default is 0.0.
+        """
+        dig_min = 0.25 * (lrv - offset) / max(abs(lrv - offset), abs(urv - offset))
+        dig_max = 0.25 * (urv - offset) / max(abs(lrv - offset), abs(urv - offset))
+        self.bits = bits
+        self.sign = 1 << (bits - 1)
+        self.scale = (urv - lrv) / (2 ** bits) / (dig_max - dig_min)
+        self.offset = offset
+
+    def convert(self, value: int) -> float:
+        """
+        Converts a digital output value into a float value.
+
+        :param value: Digital output value.
+        :return: Float value.
+        """
+        return ((value ^ self.sign) - self.sign) * self.scale + self.offset
+
+    def convert_batch(self, values):
+        """
+        Converts many digital output values into float values.
+
+        :param values: NumPy array or sequence of digital output values.
+        :return: NumPy array or list of float values.
+        """
+        if hasattr(values, 'astype'):
+            return ((values.astype('int64') ^ self.sign) - self.sign) * self.scale + self.offset
+        return [((value ^ self.sign) - self.sign) * self.scale + self.offset for value in values]
+
+    def converted(self, factor: float, offset: float = 0.0) -> 'DigOutConverter':
+        """
+        Returns a converter with an additional linear conversion (value * factor + offset) fused into the scaling,
+        e.g. a unit conversion.
+
+        :param factor: Factor of the conversion.
+        :param offset: Offset of the conversion. Default is 0.0.
+        :return: The new converter.
+        """
+        converter = DigOutConverter.__new__(DigOutConverter)
+        converter.bits = self.bits
+        converter.sign = self.sign
+        converter.scale = self.scale * factor
+        converter.offset = self.offset * factor + offset
+        return converter
+
+
+class CarmenConverter(object):
+    """
+    Converter for the digital outputs of a Carmen sensor, built once from the typeplate information.
+    The values can be converted into other units, the unit conversion is fused into the scaling.
+    """
+    __slots__ = ('pressure', 'temperature', 'digout3', 'pressure_unit', 'temperature_unit')
+
+    def __init__(self, typeplate: CarmenTypeplate, pressure_unit: Units = None, temperature_unit: Units = None) -> None:
+        """
+        Initializes the converter.
+
+        :param typeplate: Typeplate information of the sensor.
+        :param pressure_unit: Unit of the pressure values. Default is None (unit of the typeplate).
+        :param temperature_unit: Unit of the temperature values. Default is None (unit of the typeplate).
+        :raises ValueError: If a unit cannot be converted.
+        """
+        self.pressure = DigOutConverter(24, typeplate.LRV_1, typeplate.URV_1)
+        self.temperature = DigOutConverter(16, typeplate.LRV_2, typeplate.URV_2, 25)
+        self.digout3 = DigOutConverter(16, typeplate.LRV_3, typeplate.URV_3)
+        self.pressure_unit = typeplate.xRV_1_Unit
+        self.temperature_unit = typeplate.xRV_2_Unit
+        if pressure_unit is not None or temperature_unit is not None:
+            # imported here, carmen_units depends on this module
+            from carmen_units import unit_conversion
+            if pressure_unit is not None and pressure_unit != self.pressure_unit:
+                self.pressure = self.pressure.converted(*unit_conversion(self.pressure_unit, pressure_unit))
+                self.pressure_unit = pressure_unit
+            if temperature_unit is not None and temperature_unit != self.temperature_unit:
+                self.temperature = self.temperature.converted(*unit_conversion(self.temperature_unit, temperature_unit))
+                self.temperature_unit = temperature_unit
+
+    # layout of "Read Measurement Frame1": command, pressure (24 bit), temperature (16 bit), digout3, status (24 bit)
+    _FRAME1 = struct.Struct('<xHBH2xHB')
+
+    def decode(self, data: List[int]) -> Tuple[float, float, int]:
+        """
+        Decodes the response of the command "Read Measurement Frame1".
+
+        :param data: The received data.
+        :return: Pressure value.
+        :return: Temperature value.
+        :return: Actual status.
+        """
+        pressure = self.pressure.convert(data[1] | (data[2] << 8) | (data[3] << 16))
+        temperature = self.temperature.convert(data[4] | (data[5] << 8))
+        status = data[8] | (data[9] << 8) | (data[10] << 16)
+        return pressure, temperature, status
+
+    def decode_buffer(self, buffer: Union[bytes, bytearray, memoryview], offset: int = 0) -> Tuple[float, float, int]:
+        """
+        Decodes the response of the command "Read Measurement Frame1" from a bytes-like buffer without copying.
+
+        :param buffer: The received data.
+        :param offset: Position of the response in the buffer. Default is 0.
+        :return: Pressure value.
+        :return: Temperature value.
+        :return: Actual status.
+        """
+        values = self._FRAME1.unpack_from(buffer, offset)
+        pressure_low, pressure_high, temperature_value, status_low, status_high = values
+        pressure = self.pressure.convert(pressure_low | (pressure_high << 16))
+        temperature = self.temperature.convert(temperature_value)
+        return pressure, temperature, status_low | (status_high << 16)
+
+
+def decode_measurement(data: List[int], typeplate: CarmenTypeplate) -> Tuple[float, float, int]:
+    """
+    Decodes the response of the command "Read Measurement Frame1".
+    Use a CarmenConverter to decode many responses.
+
+    :param data: The received data.
+    :param typeplate: Typeplate information of the sensor.
+    :return: Pressure value.
+    :return: Temperature value.
+    :return: Actual status.
+    """
+    return CarmenConverter(typeplate).decode(data)
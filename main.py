@@ -1,12 +1,18 @@
+import argparse
 import logging
+import signal
+from collections import OrderedDict
+from typing import List
 
-from serial import Serial
+from serial import Serial, SerialException
 
 from carmen import Carmen
 from carmen_communication import CommunicationCarmen
+from carmen_daemon import CarmenDaemon
 
 # constants
 LOG_FILE = 'carmen.log'
+DEFAULT_PORT = '/dev/tty.usbserial-AH3Z6ZWF'
 
 # logging
 console_logging = logging.StreamHandler()
@@ -20,20 +26,71 @@ logging.basicConfig(level=logging.NOTSET,
                     format='%(asctime)23s - %(levelname)8s - %(module)25s - %(funcName)25s - %(message)s'
                     )
 
-ser = Serial('/dev/tty.usbserial-AH3Z6ZWF')
-communication = CommunicationCarmen(ser)
-carmen = Carmen(communication)
-
-success, typeplate = carmen.read_typeplate()
-if success:
-    print('{}'.format(typeplate))
-else:
-    print('Cannot read typeplate!')
-
-success, pressure, temperature, status = carmen.read_measurement()
-if success:
-    print('   Pressure: {: 8.4f} {}'.format(pressure, typeplate.xRV_1_Unit))
-    print('Temperature: {: 8.4f} {}'.format(temperature, typeplate.xRV_2_Unit))
-    print('     Status: 0x{:06X}'.format(status))
-else:
-    print('Cannot read measurement')
+
+def read_once(port: str, baudrate: int) -> None:
+    """
+    Prints the typeplate information and a single measurement of a sensor.
+
+    :param port: Name of the serial port.
+    :param baudrate: Connection baudrate.
+    """
+    ser = Serial(port)
+    communication = CommunicationCarmen(ser, baudrate)
+    carmen = Carmen(communication)
+
+    success, typeplate = carmen.read_typeplate()
+    if success:
+        print('{}'.format(typeplate))
+    else:
+        print('Cannot read typeplate!')
+
+    success, pressure, temperature, status = carmen.read_measurement()
+    if success:
+        print('   Pressure: {: 8.4f} {}'.format(pressure, typeplate.xRV_1_Unit))
+        print('Temperature: {: 8.4f} {}'.format(temperature, typeplate.xRV_2_Unit))
+        print('     Status: 0x{:06X}'.format(status))
+    else:
+        print('Cannot read measurement')
+
+
+def run_daemon(ports: List[str], baudrate: int, path: str, history: int) -> None:
+    """
+    Serves the samples of the sensors to local clients until the daemon is terminated.
+
+    :param ports: Names of the serial ports.
+    :param baudrate: Connection baudrate.
+    :param path: Path of the Unix domain socket.
+    :param history: Number of samples kept per sensor.
+    """
+    devices = OrderedDict()
+    for port in ports:
+        try:
+            communication = CommunicationCarmen(Serial(port), baudrate)
+        except (IOError, SerialException) as error:
+            logging.error('cannot open port "{}": {}'.format(port, error))
+            continue
+        communication.log_protocol = False
+        devices[port] = Carmen(communication)
+    daemon = CarmenDaemon(devices, path, history)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    daemon.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Reads Carmen sensors.')
+    parser.add_argument('ports', nargs='*', default=[DEFAULT_PORT], help='serial ports of the sensors')
+    parser.add_argument('-b', '--baudrate', type=int, default=57600, help='connection baudrate')
+    parser.add_argument('-d', '--daemon', metavar='SOCKET',
+                        help='serve the samples of all ports on this Unix domain socket')
+    parser.add_argument('--history', type=int, default=1024, help='number of samples kept per sensor by the daemon')
+    arguments = parser.parse_args()
+
+    if arguments.daemon:
+        run_daemon(arguments.ports, arguments.baudrate, arguments.daemon, arguments.history)
+    else:
+        for port in arguments.ports:
+            read_once(port, arguments.baudrate)
+
+
+if __name__ == '__main__':
+    main()
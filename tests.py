@@ -1,23 +1,241 @@
+import asyncio
+from array import array
 import logging
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import urllib.request
+from itertools import islice
 from typing import List, Tuple
-from unittest import TestCase
-from unittest.mock import Mock
+from unittest import TestCase, skipIf
+from unittest.mock import AsyncMock, Mock
+
+from serial import Serial, SerialException
 
 from carmen import Carmen
+from carmen_async import AsyncCarmen, AsyncCommunicationCarmen
+from carmen_coalescing import CoalescingCarmen
 from carmen_communication import CommunicationCarmen
-from carmen_utils import convert_digout
-from crc16 import calculate_crc16
+from carmen_calibration import LinkCalibration, calibrate_link
+from carmen_daemon import CarmenClient, CarmenDaemon
+from carmen_eeprom import EepromReader
+from carmen_frame import FrameParser
+from carmen_policy import LatencyStatistics, RetryPolicy
+from carmen_pool import CarmenPool
+from carmen_recording import CarmenRecording
+from carmen_sample import Sample, SampleBuffer
+from carmen_scheduler import DeadlineTimer, Overrun, PollingScheduler, sleep_until
+from carmen_shard import ShardedAcquisition, SharedSampleRing
+from carmen_stats import LatencyHistogram, PrometheusExporter, format_prometheus
+from carmen_typeplate_cache import TypeplateCache
+from carmen_trace import TRACE_RECEIVE, TRACE_SEND, HexBytes, read_trace
+from carmen_simulator import CarmenSimulator, SimulatedSerial
+from carmen_units import convert_unit, unit_conversion
+from carmen_utils import (CarmenConverter, CarmenTypeplate, DigOutConverter, SystemRate, Units, analyse_typeplate,
+                          build_typeplate, convert_digout, decode_measurement, system_rate_period)
+from crc16 import calculate_crc16, check_crc16_batch
+
+try:
+    import numpy
+    from carmen_batch import convert_digout_batch, decode_measurement_batch
+    from carmen_filter import CICDecimator, MovingAverage, Pipeline, WindowReduction, as_columns, to_samples
+except ImportError:
+    numpy = None
 
 # disable logging output
 logging.disable()
 
 
+def _short_ieee(value: float) -> List[int]:
+    integer = struct.unpack('!I', struct.pack('!f', value))[0] >> 8
+    return [integer & 0xFF, (integer >> 8) & 0xFF, integer >> 16]
+
+
+# typeplate EEPROM content: serial number "SN123456789", -1 ... 2 bar, -20 ... 80 degC, 1.25 ms, 2020-05-17
+TYPEPLATE = ([0x01, 0x31, 0x4E, 0x53, 0x35, 0x34, 0x33, 0x32, 0x39, 0x38, 0x37, 0x36] +
+             [0x02] + _short_ieee(-1) + [0x00] + _short_ieee(2) +
+             [0x20] + _short_ieee(-20) + [0x00] + _short_ieee(80) +
+             [0x00] + _short_ieee(0) + [0x00] + _short_ieee(1) +
+             [0x02] + _short_ieee(10) + [0x02] + _short_ieee(15) +
+             [0xB1, 0x28, 0x00, 0x00])
+
+
 class __TestCarmenUtils(TestCase):
 
     def test_convert_digout(self):
         self.assertAlmostEqual(-0.170959, convert_digout(0xFA8782, 24, -1, 2), 5)
         self.assertAlmostEqual(23.925781, convert_digout(0xFEC0, 16, -20, 80, offset=25), 5)
 
+    def test_build_typeplate(self):
+        _, typeplate = analyse_typeplate(TYPEPLATE)
+        self.assertEqual(TYPEPLATE, build_typeplate(typeplate))
+
+    def test_dig_out_converter(self):
+        converter = DigOutConverter(24, -1, 2)
+        for value in [0xFA8782, 0x000000, 0x7FFFFF, 0x800000]:
+            self.assertAlmostEqual(convert_digout(value, 24, -1, 2), converter.convert(value))
+        self.assertAlmostEqual(23.925781, DigOutConverter(16, -20, 80, offset=25).convert(0xFEC0), 5)
+        self.assertEqual([converter.convert(1), converter.convert(2)], converter.convert_batch([1, 2]))
+
+    def test_carmen_converter(self):
+        _, typeplate = analyse_typeplate(TYPEPLATE)
+        frame = [0x35, 0x82, 0x87, 0xFA, 0xC0, 0xFE, 0x00, 0x00, 0x01, 0x02, 0x03, 0x00, 0x00]
+        pressure, temperature, status = CarmenConverter(typeplate).decode(frame)
+        self.assertAlmostEqual(-0.170959, pressure, 5)
+        self.assertAlmostEqual(23.925781, temperature, 5)
+        self.assertEqual(0x030201, status)
+        self.assertEqual((pressure, temperature, status), CarmenConverter(typeplate).decode_buffer(bytearray(frame)))
+
+    def test_convert_unit(self):
+        self.assertAlmostEqual(14.503774, convert_unit(1.0, Units.bar, Units.psi), 5)
+        self.assertAlmostEqual(1000.0, convert_unit(1.0, Units.bar, Units.mbar))
+        self.assertAlmostEqual(750.061576, convert_unit(1.0, Units.bar, Units.mmHg), 5)
+        self.assertAlmostEqual(77.0, convert_unit(25.0, Units.degC, Units.degF))
+        self.assertAlmostEqual(298.15, convert_unit(25.0, Units.degC, Units.kelvin))
+        self.assertAlmostEqual(-40.0, convert_unit(-40.0, Units.degF, Units.degC))
+        self.assertEqual((1.0, 0.0), unit_conversion(Units.kPa, Units.kPa))
+        converted = convert_unit(array('d', [0.0, 100.0]), Units.degC, Units.kelvin)
+        self.assertEqual(array('d', [273.15, 373.15]), converted)
+        self.assertEqual([0.1, 0.2], convert_unit([100, 200], Units.kPa, Units.MPa))
+        if numpy is not None:
+            self.assertTrue(numpy.allclose([100.0, 200.0], convert_unit(numpy.array([1.0, 2.0]), Units.bar, Units.kPa)))
+        with self.assertRaises(ValueError):
+            convert_unit(1.0, Units.bar, Units.degC)
+        with self.assertRaises(ValueError):
+            convert_unit(1.0, Units.none, Units.bar)
+
+    def test_carmen_converter_units(self):
+        _, typeplate = analyse_typeplate(TYPEPLATE)
+        frame = [0x35, 0x82, 0x87, 0xFA, 0xC0, 0xFE, 0x00, 0x00, 0x01, 0x02, 0x03, 0x00, 0x00]
+        pressure, temperature, status = CarmenConverter(typeplate).decode(frame)
+        converter = CarmenConverter(typeplate, Units.kPa, Units.degF)
+        self.assertEqual((Units.kPa, Units.degF), (converter.pressure_unit, converter.temperature_unit))
+        converted = converter.decode_buffer(bytearray(frame))
+        self.assertAlmostEqual(pressure * 100, converted[0])
+        self.assertAlmostEqual(temperature * 1.8 + 32, converted[1])
+        self.assertEqual(status, converted[2])
+        with self.assertRaises(ValueError):
+            CarmenConverter(typeplate, Units.degC)
+
+    def test_carmen_typeplate(self):
+        typeplate = CarmenTypeplate()
+        self.assertIsNone(typeplate.SerialNumber)
+        with self.assertRaises(AttributeError):
+            typeplate.Unknown = 0
+
+    def test_sample_buffer(self):
+        buffer = SampleBuffer([Sample(1.0, 2.0, 3.0, 4), Sample(5.0, 6.0, 7.0, 0xFFFFFF)])
+        buffer.append(9.0, 10.0, 11.0, 12)
+
+        self.assertEqual(3, len(buffer))
+        self.assertEqual(Sample(5.0, 6.0, 7.0, 0xFFFFFF), buffer[1])
+        self.assertEqual([1.0, 5.0, 9.0], list(buffer.timestamp))
+        self.assertEqual([4, 0xFFFFFF, 12], [sample.status for sample in buffer])
+        buffer.clear()
+        self.assertEqual(0, len(buffer))
+
+    def test_system_rate_period(self):
+        self.assertAlmostEqual(0.00125, system_rate_period(SystemRate.Rate_1_25_ms))
+        self.assertAlmostEqual(0.16, system_rate_period(SystemRate.Rate_160_ms))
+
+
+@skipIf(numpy is None, 'numpy is not available')
+class __TestCarmenBatch(TestCase):
+
+    def test_convert_digout_batch(self):
+        values = numpy.array([0xFA8782, 0x000000, 0x7FFFFF])
+        result = convert_digout_batch(values, 24, -1, 2)
+        for value, converted in zip(values, result):
+            self.assertAlmostEqual(convert_digout(int(value), 24, -1, 2), converted)
+
+    def test_decode_measurement_batch(self):
+        _, typeplate = analyse_typeplate(TYPEPLATE)
+        frames = [[0x35, 0x82, 0x87, 0xFA, 0xC0, 0xFE, 0x00, 0x00, 0x01, 0x02, 0x03, 0x00, 0x00],
+                  [0x35, 0x00, 0x00, 0x40, 0x00, 0x20, 0x00, 0x00, 0x00, 0x00, 0x80, 0x00, 0x00]]
+        pressure, temperature, status = decode_measurement_batch(bytes(sum(frames, [])), typeplate)
+        self.assertEqual(2, len(pressure))
+        for i, frame in enumerate(frames):
+            expected = decode_measurement(frame, typeplate)
+            self.assertAlmostEqual(expected[0], pressure[i])
+            self.assertAlmostEqual(expected[1], temperature[i])
+            self.assertEqual(expected[2], status[i])
+
+        with self.assertRaises(ValueError):
+            decode_measurement_batch(bytes(14), typeplate)
+
+
+@skipIf(numpy is None, 'numpy is not installed')
+class __TestCarmenFilter(TestCase):
+
+    @staticmethod
+    def columns(count: int) -> Tuple:
+        timestamp = numpy.arange(count) * 0.00125
+        status = numpy.zeros(count, dtype=numpy.uint32)
+        status[7] = 0x000001
+        status[250] = 0x000100
+        return timestamp, numpy.sin(timestamp * 10), numpy.cos(timestamp), status
+
+    def process_split(self, stage, columns, sizes: List[int]) -> Tuple:
+        outputs = []
+        start = 0
+        for size in sizes:
+            outputs.append(stage.process(tuple(column[start:start + size] for column in columns)))
+            start += size
+        return tuple(numpy.concatenate(column) for column in zip(*outputs))
+
+    def assert_columns_equal(self, expected: Tuple, actual: Tuple) -> None:
+        for expected_column, actual_column in zip(expected, actual):
+            self.assertEqual(len(expected_column), len(actual_column))
+            self.assertTrue(numpy.allclose(expected_column, actual_column))
+
+    def test_moving_average(self):
+        columns = self.columns(1000)
+        expected = MovingAverage(10).process(columns)
+        self.assertEqual(991, len(expected[0]))
+        self.assertAlmostEqual(numpy.mean(columns[1][:10]), expected[1][0])
+        self.assertEqual(columns[0][9], expected[0][0])
+        self.assertEqual(0x000001, expected[3][0])
+        self.assertEqual(0x000000, expected[3][8])
+        self.assert_columns_equal(expected, self.process_split(MovingAverage(10), columns, [3, 4, 500, 1, 492]))
+
+    def test_window_reduction(self):
+        columns = self.columns(1000)
+        for reduction, function in [('mean', numpy.mean), ('min', numpy.min), ('max', numpy.max)]:
+            expected = WindowReduction(100, reduction).process(columns)
+            self.assertEqual(10, len(expected[0]))
+            self.assertAlmostEqual(function(columns[1][100:200]), expected[1][1])
+            self.assertEqual(columns[0][199], expected[0][1])
+            self.assertEqual([0x000001, 0x000000, 0x000100], expected[3][:3].tolist())
+            self.assert_columns_equal(expected, self.process_split(WindowReduction(100, reduction), columns,
+                                                                   [50, 99, 2, 849]))
+        with self.assertRaises(ValueError):
+            WindowReduction(10, 'median')
+
+    def test_cic_decimator(self):
+        columns = self.columns(1000)
+        # a CIC filter of order 1 is a window mean
+        self.assert_columns_equal(WindowReduction(100).process(columns), CICDecimator(100, 1).process(columns))
+        expected = CICDecimator(10, 3).process(columns)
+        self.assertEqual(98, len(expected[0]))
+        self.assertEqual(columns[0][27], expected[0][0])
+        self.assertEqual(0x000001, expected[3][0])
+        self.assertEqual(0x000100, numpy.bitwise_or.reduce(expected[3][1:]))
+        self.assert_columns_equal(expected, self.process_split(CICDecimator(10, 3), columns, [5, 17, 1, 300, 677]))
+
+    def test_pipeline(self):
+        columns = self.columns(1000)
+        samples = SampleBuffer(to_samples(columns))
+        self.assertTrue(numpy.array_equal(columns[1], as_columns(samples)[1]))
+        pipeline = Pipeline([MovingAverage(4), WindowReduction(10, 'max')])
+        output = pipeline.process_buffer(samples)
+        self.assertEqual(99, len(output))
+        self.assertIsInstance(output[0], Sample)
+        pipeline.reset()
+        self.assertEqual(list(output), list(pipeline.process_buffer(samples)))
+
 
 class __TestCRC16(TestCase):
 
@@ -34,6 +252,57 @@ class __TestCRC16(TestCase):
 
         self.assertEqual(0xCD9F, calculate_crc16([0x35, 0x85, 0x0C, 0x00, 0xCE, 0xFD, 0xCF, 0xF2, 0x00, 0x00, 0x80]))
 
+    def test_calculate_crc16_bytes(self):
+        data = bytes(range(0, 250, 3))
+        crc = calculate_crc16(list(data))
+
+        self.assertEqual(crc, calculate_crc16(data))
+        self.assertEqual(crc, calculate_crc16(bytearray(data)))
+        self.assertEqual(crc, calculate_crc16(memoryview(data)))
+        self.assertEqual(crc, calculate_crc16(memoryview(data)[17:], calculate_crc16(data[:17])))
+        self.assertEqual(calculate_crc16(list(data[1:-2])), calculate_crc16(memoryview(data)[1:-2]))
+
+        # views with other item types are processed byte by byte, also below the size of the wide table
+        for size in (6, 40):
+            words = array('H', range(size // 2))
+            self.assertEqual(calculate_crc16(list(words.tobytes())), calculate_crc16(memoryview(words)))
+        self.assertEqual(calculate_crc16([0xFF, 0x80]), calculate_crc16(memoryview(bytes([0xFF, 0x80])).cast('b')))
+
+    @skipIf(numpy is None, 'numpy is not available')
+    def test_check_crc16_batch(self):
+        frames = bytearray([0x35, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x6E, 0x5F] * 3)
+        frames[14] = 0x01
+
+        self.assertEqual([True, False, True], list(check_crc16_batch(frames, 13)))
+        with self.assertRaises(ValueError):
+            check_crc16_batch(frames, 14)
+
+
+class __TestFrameParser(TestCase):
+    __frame1 = bytes([0x35, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x6E, 0x5F])
+
+    def test_next_frame(self):
+        parser = FrameParser()
+
+        parser.feed(b'\x00\x35\x01' + self.__frame1[:5])
+        self.assertIsNone(parser.next_frame(0x35, 13))
+        self.assertEqual(6, parser.missing(13))
+        parser.feed(self.__frame1[5:] + bytes([0xA0, 0x80, 0x04, 0xC3]))
+        self.assertEqual(self.__frame1, parser.next_frame(0x35, 13))
+        self.assertEqual(3, parser.skipped)
+        self.assertEqual(bytes([0xA0, 0x80, 0x04, 0xC3]), parser.next_frame())
+        self.assertEqual(0, len(parser.buffer))
+
+    def test_next_frame_eeprom(self):
+        data = [0x03, 0x80, 0x01, 0x01, 0x02, 0x03, 0x04]
+        crc = calculate_crc16(data)
+        parser = FrameParser()
+
+        parser.feed(bytes([0x03]))
+        self.assertIsNone(parser.next_frame())
+        parser.feed(bytes(data[1:] + [crc & 0xFF, crc >> 8]))
+        self.assertEqual(bytes(data + [crc & 0xFF, crc >> 8]), parser.next_frame())
+
 
 class __TestCommunicationCarmen(TestCase):
 
@@ -45,6 +314,13 @@ class __TestCommunicationCarmen(TestCase):
         self.serial.is_open = True
         self.serial.write = Mock(side_effect=lambda x: len(x))
         self.serial.read = Mock(side_effect=lambda x: [0] * x)
+        self.serial.readinto = Mock(side_effect=self.readinto)
+
+    def readinto(self, buffer: bytearray) -> int:
+        # like pyserial, readinto is based on read
+        data = self.serial.read(len(buffer))
+        buffer[:len(data)] = bytes(data)
+        return len(data)
 
     def test___init__(self):
         self.assertIsNotNone(CommunicationCarmen(self.serial))
@@ -109,6 +385,230 @@ class __TestCommunicationCarmen(TestCase):
         self.assertFalse(success)
         self.assertEqual(0, len(data))
 
+    def test_send_into(self):
+        buffer = bytearray(8)
+        c = CommunicationCarmen(self.serial)
+
+        self.assertTrue(c.send_into(buffer, 0x35))
+        self.assertEqual(b'\x35\xBC\xFD', bytes(self.serial.write.call_args[0][0]))
+        self.assertTrue(c.send_into(buffer, 0x03, b'\x01\x90\x0C'))
+        self.assertEqual(calculate_crc16([0x03, 0x01, 0x90, 0x0C]), buffer[4] | (buffer[5] << 8))
+
+        self.serial.write = Mock(side_effect=lambda x: len(x) + 1)
+        self.assertFalse(c.send_into(buffer, 0x35))
+
+    def test_receive_into(self):
+        frame = b'\x35\x00\x00\x00\x00\x00\x00\x00\x00\x00\x80\x6E\x5F'
+
+        def readinto(data: bytes, buffer: bytearray) -> int:
+            buffer[:len(data)] = data
+            return len(data)
+
+        buffer = bytearray(13)
+        c = CommunicationCarmen(self.serial)
+
+        self.serial.readinto = Mock(side_effect=lambda b: readinto(frame, b))
+        self.assertTrue(c.receive_into(buffer))
+        self.assertEqual(frame, buffer)
+
+        self.serial.readinto = Mock(side_effect=lambda b: readinto(frame[:-1] + b'\x00', b))
+        self.assertFalse(c.receive_into(buffer))
+
+        self.serial.readinto = Mock(side_effect=lambda b: readinto(frame[:-1], b))
+        self.assertFalse(c.receive_into(buffer))
+
+    def test_receive_frame(self):
+        frame = [0x35, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x6E, 0x5F]
+        stream = bytearray([0xFF, 0x35] + frame + frame)
+
+        def read(size: int) -> bytes:
+            data = bytes(stream[:size])
+            del stream[:size]
+            return data
+
+        c = CommunicationCarmen(self.serial)
+        self.serial.read = Mock(side_effect=read)
+        self.serial.in_waiting = 0
+
+        success, data = c.receive_frame(0x35, 13)
+        self.assertTrue(success)
+        self.assertEqual(frame, data)
+        buffer = bytearray(13)
+        self.assertTrue(c.receive_frame_into(0x35, buffer))
+        self.assertEqual(bytes(frame), buffer)
+
+        # a synchronized frame is received in place, a shifted frame through the parser
+        stream.extend(frame)
+        self.assertTrue(c.receive_frame_into(0x35, buffer))
+        self.assertEqual(bytes(frame), buffer)
+        stream.extend([0x00] + frame)
+        self.assertTrue(c.receive_frame_into(0x35, buffer))
+        self.assertEqual(bytes(frame), buffer)
+
+        stream.extend(frame[:-1] + [0x00])
+        success, data = c.receive_frame(0x35, 13)
+        self.assertFalse(success)
+        self.assertEqual(0, len(data))
+
+    def test_request(self):
+        frame = [0x35, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x6E, 0x5F]
+        responses = [b'', bytes(frame)]
+        c = CommunicationCarmen(self.serial, policy=RetryPolicy(backoff=0.0))
+        self.serial.read = Mock(side_effect=lambda x: responses.pop(0)[:x] if responses else b'')
+        self.serial.reset_input_buffer = Mock()
+        self.serial.in_waiting = 0
+
+        success, data = c.request(0x35, None, 13)
+        self.assertTrue(success)
+        self.assertEqual(frame, data)
+        self.assertEqual(1, self.serial.reset_input_buffer.call_count)
+        self.assertEqual(1, c.policy.statistics[0x35].count)
+        self.assertEqual(1, c.policy.statistics[0x35].failures)
+
+        # "Stop DSP" is not retried
+        success, data = c.request(0xA0, None, 4)
+        self.assertFalse(success)
+        self.assertEqual(1, self.serial.reset_input_buffer.call_count)
+
+        responses.append(bytes(frame))
+        buffer = bytearray(13)
+        self.assertTrue(c.request_into(bytearray(3), 0x35, buffer))
+        self.assertEqual(bytes(frame), buffer)
+
+        # the adaptive deadline stays on the port, the receive functions without policy set their own timeout
+        c.policy.minimum_samples = 1
+        responses.append(bytes(frame))
+        self.assertTrue(c.request(0x35, None, 13)[0])
+        deadline = c.policy.timeout(0x35, 3, 13, c.baudrate)
+        self.assertLess(deadline, c.policy.maximum_timeout)
+        self.assertEqual(deadline, self.serial.timeout)
+        responses.append(bytes(frame))
+        self.assertTrue(c.request(0x35, None, 13)[0])
+        self.assertEqual(deadline, self.serial.timeout)
+        responses.append(bytes(frame))
+        self.assertTrue(c.receive_frame(0x35, 13)[0])
+        self.assertEqual(c.timeout, self.serial.timeout)
+
+    def test_trace(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.bin')
+            c = CommunicationCarmen(self.serial)
+            c.log_protocol = False
+
+            c.start_trace(path)
+            self.assertTrue(c.send(0x35))
+            success, _ = c._receive_raw(4)
+            self.assertTrue(success)
+            c.stop_trace()
+            self.assertIsNone(c.trace)
+
+            records = list(read_trace(path))
+            self.assertEqual(2, len(records))
+            self.assertEqual((TRACE_SEND, b'\x35\xBC\xFD'), records[0][1:])
+            self.assertEqual((TRACE_RECEIVE, bytes(4)), records[1][1:])
+            self.assertLessEqual(records[0][0], records[1][0])
+
+    def test_hex_bytes(self):
+        self.assertEqual('0x35 0xBC 0xFD', str(HexBytes(b'\x35\xBC\xFD')))
+
+    def test_transfer_pipelined(self):
+        frame = [0x35, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x6E, 0x5F]
+        c = CommunicationCarmen(self.serial)
+
+        self.serial.read = Mock(side_effect=lambda x: frame[:x])
+        results = c.transfer_pipelined([(0x35, None, 13)] * 5, 3)
+        self.assertEqual(5, len(results))
+        self.assertTrue(all(success for success, _ in results))
+
+        self.serial.reset_input_buffer = Mock()
+        c.timeout = 0.01
+        results = c.transfer_pipelined([(0xA0, None, 13)] * 5, 3)
+        self.assertEqual(5, len(results))
+        self.assertFalse(any(success for success, _ in results))
+        self.assertTrue(self.serial.reset_input_buffer.called)
+
+
+class __TestRetryPolicy(TestCase):
+
+    def test_latency_statistics(self):
+        statistics = LatencyStatistics()
+        self.assertEqual(0.0, statistics.percentile(0.99))
+        for round_trip in [0.010] * 99 + [0.050]:
+            statistics.update(round_trip)
+        self.assertEqual(100, statistics.count)
+        self.assertAlmostEqual(0.010, statistics.percentile(0.5))
+        self.assertAlmostEqual(0.050, statistics.percentile(0.99))
+        self.assertGreater(statistics.average, 0.010)
+        self.assertLess(statistics.average, 0.020)
+
+    def test_timeout(self):
+        policy = RetryPolicy(minimum_timeout=0.001)
+        self.assertEqual(3, policy.attempts(0x35))
+        self.assertEqual(1, policy.attempts(0xA0))
+        # maximum timeout until enough round trips are measured
+        self.assertEqual(1.0, policy.timeout(0x35, 3, 13, 57600))
+        for _ in range(policy.minimum_samples):
+            policy.update(0x35, 0.001)
+        # 16 bytes at 57600 baud are 2.8 ms
+        self.assertEqual(0.009, policy.timeout(0x35, 3, 13, 57600))
+        self.assertEqual(0.017, policy.timeout(0x35, 3, 13, 57600, 1))
+        self.assertEqual(1.0, policy.timeout(0x35, 3, 13, 57600, 10))
+        self.assertEqual(0.001, policy.delay(1))
+        self.assertEqual(0.002, policy.delay(2))
+        self.assertEqual(0.02, policy.delay(10))
+
+
+class __TestCarmenStatistics(TestCase):
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(0.0, histogram.percentile(0.5))
+        for latency in [0.000010] * 50 + [0.002] * 49 + [0.5]:
+            histogram.record(latency)
+        self.assertEqual(100, histogram.count)
+        self.assertAlmostEqual(0.000010, histogram.percentile(0.5), delta=2e-6)
+        self.assertAlmostEqual(0.002, histogram.percentile(0.99), delta=0.002 / 32)
+        self.assertEqual(0.5, histogram.percentile(1.0))
+        for index in range(1000):
+            lower, upper = histogram.bucket_bounds(index)
+            self.assertEqual(index, histogram._index(int(lower * 1e6 + 0.5)))
+            self.assertLessEqual(upper - lower, max(lower / 32, 1e-6) * (1 + 1e-9))
+        self.assertEqual([(0.001, 50), (0.01, 99), (1.0, 100)], histogram.cumulative([0.001, 0.01, 1.0]))
+
+    def test_statistics(self):
+        simulator = CarmenSimulator(baudrate=None, measurement=lambda _: (1.0, 25.0, 0x000000), corrupt_rate=0.5,
+                                    seed=1)
+        serial = SimulatedSerial(simulator)
+        communication = CommunicationCarmen(serial)
+        communication.policy.retries = 0
+        carmen = Carmen(communication)
+        stats = carmen.start_statistics()
+        self.assertEqual('simulated', stats.port)
+        for _ in range(20):
+            carmen.read_measurement_frame1()
+        statistics = stats.command(0x35)
+        self.assertEqual(20, statistics.requests)
+        self.assertEqual(20, statistics.duration.count)
+        self.assertEqual(statistics.responses, statistics.round_trip.count)
+        self.assertEqual(20, statistics.responses + statistics.crc_errors + statistics.timeouts)
+        self.assertGreater(statistics.crc_errors, 0)
+        self.assertEqual(60, statistics.bytes_sent)
+        self.assertIn('0x35', stats.snapshot())
+
+        text = format_prometheus([stats])
+        self.assertIn('carmen_requests_total{port="simulated",command="0x35"} 20', text)
+        self.assertIn('carmen_round_trip_seconds_count{port="simulated",command="0x35"} ', text)
+
+        exporter = PrometheusExporter([stats], port=0)
+        exporter.start()
+        try:
+            with urllib.request.urlopen('http://127.0.0.1:{}/metrics'.format(exporter.port)) as response:
+                self.assertEqual(text, response.read().decode())
+        finally:
+            exporter.stop()
+        carmen.stop_statistics()
+        self.assertIsNone(communication.stats)
+
 
 class __TestCarmen(TestCase):
     __valid_responses = {0xA0: [0xA0, 0x80, 0x04, 0xC3],
@@ -125,13 +625,43 @@ class __TestCarmen(TestCase):
         data = None
         if self.__received_data:
             if self.__received_command == 0x03:
-                data = [0x03, 0x80, self.__received_data[2]] + [0x00] * self.__received_data[2] * 4
+                address = (self.__received_data[0] << 8) | self.__received_data[1]
+                size = self.__received_data[2] * 4
+                eeprom = [0x00] * 0x0190 * 4 + TYPEPLATE + [0x00] * size
+                data = [0x03, 0x80, self.__received_data[2]] + eeprom[address * 4:address * 4 + size]
                 crc = calculate_crc16(data)
                 data += [crc & 0xFF, crc >> 8]
         else:
             data = self.__valid_responses[self.__received_command]
         return True, data
 
+    def mock_transfer_pipelined(self, requests: List[Tuple[int, List[int], int]],
+                                _: int) -> List[Tuple[bool, List[int]]]:
+        results = []
+        for command, data, size in requests:
+            self.communication.send(command, data)
+            success, response = self.communication.receive(size)
+            results.append((success and response[0] == command, response))
+        return results
+
+    def mock_send_into(self, _: bytearray, command: int, data: bytes = b'') -> bool:
+        return self.communication.send(command, list(data) or None)
+
+    def mock_receive_into(self, buffer: bytearray) -> bool:
+        success, data = self.communication.receive(len(buffer))
+        if success:
+            buffer[:] = bytes(x & 0xFF for x in data)
+        return success
+
+    def mock_request(self, command: int, data: List[int] = None, size: int = 4) -> Tuple[bool, List[int]]:
+        if not self.communication.send(command, data):
+            return False, []
+        return self.communication.receive_frame(command, size)
+
+    def mock_request_into(self, request_buffer: bytearray, command: int, buffer: bytearray, data: bytes = b'') -> bool:
+        return self.communication.send_into(request_buffer, command, data) and \
+            self.communication.receive_frame_into(command, buffer)
+
     def mock_receive_invalid(self, size: int) -> Tuple[bool, List[int]]:
         return True, [-0x01] * size
 
@@ -142,6 +672,14 @@ class __TestCarmen(TestCase):
     def setUp(self) -> None:
         self.communication.send = Mock(side_effect=self.mock_send)
         self.communication.receive = Mock(side_effect=self.mock_receive)
+        self.communication.transfer_pipelined = Mock(side_effect=self.mock_transfer_pipelined)
+        self.communication.send_into = Mock(side_effect=self.mock_send_into)
+        self.communication.receive_into = Mock(side_effect=self.mock_receive_into)
+        self.communication.receive_frame = Mock(side_effect=lambda _, size: self.communication.receive(size))
+        self.communication.receive_frame_into = Mock(
+            side_effect=lambda _, buffer: self.communication.receive_into(buffer))
+        self.communication.request = Mock(side_effect=self.mock_request)
+        self.communication.request_into = Mock(side_effect=self.mock_request_into)
 
     def test__execute_simple_command(self):
         c = Carmen(self.communication)
@@ -216,3 +754,646 @@ class __TestCarmen(TestCase):
         success, data = c.read_eeprom(start, size)
         self.assertFalse(success)
         self.assertEqual(0, len(data))
+
+    def test_eeprom_reader(self):
+        c = Carmen(self.communication)
+        reader = EepromReader(c, max_block_size=5)
+
+        success, data = reader.read(0x018E, 14)
+        self.assertTrue(success)
+        self.assertEqual(bytes(8) + bytes(TYPEPLATE), data)
+        commands = [call[0][0] for call in self.communication.send.call_args_list]
+        self.assertEqual([0xA0, 0x03, 0xA1, 0xA0, 0x03, 0x03, 0x03, 0xA1], commands)
+
+        self.communication.send.reset_mock()
+        success, data = reader.read(0x0190, 12)
+        self.assertTrue(success)
+        self.assertEqual(bytes(TYPEPLATE), data)
+        self.assertFalse(self.communication.send.called)
+
+        success, _ = reader.read(0x0198, 8)
+        self.assertTrue(success)
+        self.assertEqual([((0x03, [0x01, 0x9C, 0x04]),)],
+                         [call for call in self.communication.send.call_args_list if call[0][0] == 0x03])
+
+        reader.invalidate()
+        self.communication.receive = Mock(side_effect=self.mock_receive_invalid)
+        success, data = reader.read(0x0190, 1)
+        self.assertFalse(success)
+        self.assertEqual(0, len(data))
+
+    def test_read_typeplate(self):
+        c = Carmen(self.communication)
+
+        success, typeplate = c.read_typeplate()
+        self.assertTrue(success)
+        self.assertEqual('SN123456789', typeplate.SerialNumber)
+        self.assertAlmostEqual(-1, typeplate.LRV_1)
+        self.assertAlmostEqual(80, typeplate.URV_2)
+        self.assertIs(typeplate, c.typeplate)
+        self.assertIsNotNone(c.converter)
+
+    def test_read_measurement(self):
+        c = Carmen(self.communication)
+
+        success, pressure, temperature, status = c.read_measurement()
+        self.assertTrue(success)
+        self.assertAlmostEqual(0.0, pressure)
+        self.assertAlmostEqual(25.0, temperature)
+        self.assertEqual(0x800000, status)
+
+        self.communication.receive = Mock(side_effect=self.mock_receive_invalid)
+        success, _, _, status = c.read_measurement()
+        self.assertFalse(success)
+        self.assertEqual(0xFFFFFF, status)
+
+    def test_set_output_units(self):
+        c = Carmen(self.communication)
+        self.assertTrue(c.set_output_units(Units.mbar, Units.kelvin))
+        success, pressure, temperature, _ = c.read_measurement()
+        self.assertTrue(success)
+        self.assertAlmostEqual(0.0, pressure)
+        self.assertAlmostEqual(298.15, temperature)
+        self.assertEqual(Units.mbar, c.converter.pressure_unit)
+
+        self.assertFalse(c.set_output_units(Units.degC))
+        self.assertTrue(c.set_output_units())
+        _, _, temperature, _ = c.read_measurement()
+        self.assertAlmostEqual(25.0, temperature)
+
+        # a wrong unit is rejected before the typeplate is known and does not fail the typeplate read
+        c = Carmen(self.communication)
+        self.assertFalse(c.set_output_units(Units.degF))
+        self.assertFalse(c.set_output_units(temperature_unit=Units.bar))
+        self.assertTrue(c.read_typeplate()[0])
+        self.assertTrue(c.read_measurement()[0])
+
+        # units which do not match the typeplate are reset
+        c = Carmen(self.communication)
+        c._output_units = (Units.degF, None)
+        self.assertTrue(c.read_typeplate()[0])
+        self.assertEqual((None, None), c._output_units)
+
+    def test_read_measurements(self):
+        c = Carmen(self.communication)
+
+        results = c.read_measurements(4)
+        self.assertEqual(4, len(results))
+        self.assertTrue(all(result[0] for result in results))
+        self.assertEqual(0x800000, results[0][3])
+
+        self.communication.receive = Mock(side_effect=self.mock_receive_invalid)
+        results = c.read_measurements(4)
+        self.assertFalse(any(result[0] for result in results))
+
+    def test_read_typeplate_cached(self):
+        self.communication.name = 'port'
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'typeplates.json')
+
+            success, typeplate = Carmen(self.communication, TypeplateCache(path)).read_typeplate()
+            self.assertTrue(success)
+            self.assertTrue(os.path.exists(path))
+
+            self.communication.send.reset_mock()
+            c = Carmen(self.communication, TypeplateCache(path))
+            success, cached_typeplate = c.read_typeplate()
+            self.assertTrue(success)
+            self.assertEqual(typeplate.SerialNumber, cached_typeplate.SerialNumber)
+            self.assertEqual(bytes(TYPEPLATE), c.typeplate_buffer)
+            commands = [call[0][0] for call in self.communication.send.call_args_list]
+            self.assertEqual([0x03], commands)
+
+            # outdated date modified
+            cache = TypeplateCache(path)
+            cache.put('port', bytes(TYPEPLATE[:44]) + b'\x00\x29\x00\x00', 'SN123456789', '2020-08-00')
+            self.communication.send.reset_mock()
+            success, _ = Carmen(self.communication, cache).read_typeplate()
+            self.assertTrue(success)
+            commands = [call[0][0] for call in self.communication.send.call_args_list]
+            self.assertEqual([0x03, 0xA0, 0x03, 0xA1], commands)
+            self.assertEqual(bytes(TYPEPLATE), TypeplateCache(path).get('port'))
+
+            # a failed validation read falls back to the full read and keeps the entry
+            responses = [(False, [])]
+            self.communication.request = Mock(
+                side_effect=lambda *args: responses.pop() if responses else self.mock_request(*args))
+            success, _ = Carmen(self.communication, TypeplateCache(path)).read_typeplate()
+            self.assertTrue(success)
+            self.assertEqual(bytes(TYPEPLATE), TypeplateCache(path).get('port'))
+
+    def test_recording(self):
+        c = Carmen(self.communication)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recording.bin')
+
+            self.assertTrue(c.start_recording(path))
+            _, pressure, temperature, status = c.read_measurement()
+            c.read_measurements(2)
+            c.stop_recording()
+
+            with CarmenRecording(path) as recording:
+                self.assertEqual('SN123456789', recording.typeplate.SerialNumber)
+                self.assertEqual(3, len(recording))
+                sample = recording[-1]
+                self.assertAlmostEqual(pressure, sample.pressure)
+                self.assertAlmostEqual(temperature, sample.temperature)
+                self.assertEqual(status, sample.status)
+                self.assertLessEqual(recording[0].timestamp, sample.timestamp)
+                # recorded samples use the monotonic clock like live samples
+                self.assertAlmostEqual(time.monotonic(), sample.timestamp, delta=60.0)
+                # the start of the recording anchors the timestamps on the wall clock
+                self.assertAlmostEqual(time.time(), recording.start_time, delta=60.0)
+                self.assertLessEqual(recording.start_monotonic, recording[0].timestamp)
+                self.assertAlmostEqual(time.time(), recording.wall_time(sample.timestamp), delta=60.0)
+                self.assertLessEqual(recording.start_time, recording.wall_time(recording[0].timestamp))
+                with self.assertRaises(IndexError):
+                    _ = recording[3]
+                if numpy is not None:
+                    timestamps, pressures, temperatures, statuses = recording.columns(1)
+                    self.assertEqual(2, len(timestamps))
+                    self.assertEqual([status] * 2, list(statuses))
+                    self.assertAlmostEqual(temperature, temperatures[0])
+
+    def test_start_acquisition(self):
+        c = Carmen(self.communication)
+
+        success, acquisition = c.start_acquisition(16)
+        self.assertTrue(success)
+        self.assertTrue(acquisition.is_running)
+        samples = acquisition.read(max_count=8, timeout=1)
+        c.stop_acquisition()
+        self.assertFalse(acquisition.is_running)
+        self.assertLessEqual(1, len(samples))
+        self.assertGreaterEqual(8, len(samples))
+        self.assertEqual(0x800000, samples[0].status)
+        self.assertEqual(4, len(tuple(samples[0])))
+
+        self.communication.receive = Mock(side_effect=self.mock_receive_invalid)
+        success, _ = Carmen(self.communication).start_acquisition()
+        self.assertFalse(success)
+
+    def test_stream(self):
+        c = Carmen(self.communication)
+
+        stream = c.stream(16)
+        samples = list(islice(stream, 5))
+        stream.close()
+        self.assertEqual(5, len(samples))
+        self.assertFalse(c._acquisition.is_running)
+
+        stream = c.stream(16, depth=4)
+        samples = list(islice(stream, 10))
+        stream.close()
+        self.assertEqual(10, len(samples))
+        # the samples of a pipelined batch have distinct timestamps
+        self.assertTrue(all(a.timestamp < b.timestamp for a, b in zip(samples, samples[1:])))
+
+        # a failing port stops the acquisition, so the stream ends instead of blocking
+        self.communication.receive = Mock(side_effect=SerialException('device disconnected'))
+        self.assertEqual([], list(c.stream(16)))
+        self.assertFalse(c._acquisition.is_running)
+
+
+class __TestCoalescingCarmen(TestCase):
+
+    def test_read_measurement(self):
+        def read_measurement() -> Tuple[bool, float, float, int]:
+            time.sleep(0.05)
+            return True, 1.0, 25.0, 0x000000
+
+        carmen = Mock()
+        carmen.typeplate = analyse_typeplate(TYPEPLATE)[1]
+        carmen.read_measurement = Mock(side_effect=read_measurement)
+        coalescing = CoalescingCarmen(carmen)
+        self.assertEqual(0.00125, coalescing.ttl)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(coalescing.read_measurement())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([(True, 1.0, 25.0, 0x000000)] * 8, results)
+        self.assertEqual(1, carmen.read_measurement.call_count)
+        self.assertEqual(1, coalescing.reads)
+        self.assertEqual(7, coalescing.coalesced)
+
+        coalescing = CoalescingCarmen(carmen, ttl=60)
+        coalescing.read_measurement()
+        coalescing.read_measurement()
+        self.assertEqual(1, coalescing.hits)
+        self.assertEqual(2, carmen.read_measurement.call_count)
+        coalescing.invalidate()
+        coalescing.read_measurement()
+        self.assertEqual(3, carmen.read_measurement.call_count)
+
+        # failed measurements are not cached
+        carmen.read_measurement = Mock(return_value=(False, 0.0, 0.0, 0xFFFFFF))
+        coalescing.invalidate()
+        self.assertFalse(coalescing.read_measurement()[0])
+        self.assertFalse(coalescing.read_measurement()[0])
+        self.assertEqual(2, carmen.read_measurement.call_count)
+
+
+class __TestPollingScheduler(TestCase):
+
+    @staticmethod
+    def _carmen(delays: List[float]) -> Mock:
+        def read_measurement() -> Tuple[bool, float, float, int]:
+            time.sleep(delays.pop(0) if delays else 0.0)
+            return True, 1.0, 25.0, 0x000000
+
+        carmen = Mock()
+        carmen.typeplate = analyse_typeplate(TYPEPLATE)[1]
+        carmen.read_measurement = Mock(side_effect=read_measurement)
+        return carmen
+
+    def test_sleep_until(self):
+        deadline = time.monotonic() + 0.01
+        sleep_until(deadline)
+        self.assertGreaterEqual(time.monotonic(), deadline)
+
+    def test_deadline_timer(self):
+        timer = DeadlineTimer(0.01)
+        first = timer.deadline
+        self.assertAlmostEqual(0.0, first / 0.01 - round(first / 0.01), delta=1e-6)
+        timer.advance(first + 0.001)
+        self.assertAlmostEqual(first + 0.01, timer.deadline)
+        # the deadlines during a slow poll are skipped, the next deadline is in the future
+        timer.advance(timer.deadline + 0.035)
+        self.assertAlmostEqual(first + 0.05, timer.deadline)
+        self.assertEqual(3, timer.missed)
+
+        timer = DeadlineTimer(0.01, Overrun.catch_up, max_backlog=1)
+        first = timer.deadline
+        timer.advance(first + 0.035)
+        self.assertAlmostEqual(first + 0.03, timer.deadline)
+        self.assertEqual(2, timer.missed)
+        timer = DeadlineTimer(0.01, Overrun.catch_up)
+        timer.advance(timer.deadline + 0.035)
+        self.assertEqual(0, timer.missed)
+
+    def test_skip(self):
+        scheduler = PollingScheduler(self._carmen([0.0, 0.0, 0.035]), period=0.01)
+        self.assertTrue(scheduler.start())
+        samples = []
+        while len(samples) < 8:
+            samples += scheduler.read(timeout=1.0)
+        scheduler.stop()
+
+        # the deadlines stay on the grid of the period, the deadlines during the slow command are skipped
+        steps = [round((b.deadline - a.deadline) / 0.01) for a, b in zip(samples, samples[1:])]
+        self.assertTrue(all(step >= 1 for step in steps))
+        self.assertGreaterEqual(steps[2], 4)
+        self.assertGreaterEqual(scheduler.missed, 3)
+        self.assertAlmostEqual(0.0, samples[0].deadline / 0.01 - round(samples[0].deadline / 0.01), delta=1e-6)
+        for sample in samples:
+            self.assertGreaterEqual(sample.lateness, 0.0)
+            self.assertGreater(sample.timestamp, sample.deadline)
+        self.assertEqual((1.0, 25.0, 0x000000), tuple(samples[0])[1:])
+
+    def test_catch_up(self):
+        carmen = self._carmen([0.0, 0.035])
+        scheduler = PollingScheduler(carmen, divider=8, policy=Overrun.catch_up)
+        self.assertTrue(scheduler.start())
+        self.assertEqual(0.01, scheduler.period)
+        samples = []
+        while len(samples) < 8:
+            samples += scheduler.read(timeout=1.0)
+        scheduler.stop()
+        self.assertFalse(scheduler.is_running)
+
+        # every deadline is polled, the missed ones immediately after the slow command
+        steps = [round((b.deadline - a.deadline) / 0.01) for a, b in zip(samples, samples[1:])]
+        self.assertEqual([1] * 7, steps[:7])
+        self.assertEqual(0, scheduler.missed)
+        self.assertGreater(samples[2].lateness, 0.02)
+        self.assertLess(samples[5].lateness, samples[2].lateness)
+
+        self.assertGreaterEqual(scheduler.max_lateness, samples[2].lateness)
+
+    def test_error(self):
+        carmen = self._carmen([])
+        carmen.read_measurement.side_effect = [(True, 1.0, 25.0, 0x000000), SerialException('device disconnected')]
+        scheduler = PollingScheduler(carmen, period=0.01)
+        self.assertTrue(scheduler.start())
+        samples = list(scheduler)
+        self.assertEqual(1, len(samples))
+        self.assertFalse(scheduler.is_running)
+        self.assertEqual([], scheduler.read())
+        scheduler.stop()
+
+    def test_start_without_typeplate(self):
+        carmen = Mock()
+        carmen.typeplate = None
+        carmen.read_typeplate = Mock(return_value=(False, None))
+        scheduler = PollingScheduler(carmen)
+        self.assertFalse(scheduler.start())
+        self.assertEqual([], scheduler.read(timeout=0.0))
+
+
+class __TestAsyncCarmen(TestCase):
+    __frame1 = [0x35, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x6E, 0x5F]
+
+    def create_communication(self, data: List[int]) -> AsyncCommunicationCarmen:
+        reader = asyncio.StreamReader()
+        reader.feed_data(bytes(data))
+        writer = Mock()
+        writer.drain = AsyncMock()
+        return AsyncCommunicationCarmen(reader, writer, timeout=0.1)
+
+    def test_receive(self):
+        async def run():
+            c = self.create_communication(self.__frame1)
+            self.assertTrue(await c.send(0x35))
+            c._writer.write.assert_called_with(bytes([0x35, 0xBC, 0xFD]))
+            success, data = await c.receive(13)
+            self.assertTrue(success)
+            self.assertEqual(self.__frame1, data)
+            success, data = await c.receive(13)
+            self.assertFalse(success)
+            self.assertEqual(0, len(data))
+
+            c = self.create_communication(self.__frame1[:-1] + [0x00])
+            success, _ = await c.receive(13)
+            self.assertFalse(success)
+
+            # incomplete data is discarded after a timeout
+            c = self.create_communication(self.__frame1[:5])
+            success, _ = await c.receive(13)
+            self.assertFalse(success)
+            c._reader.feed_data(bytes(self.__frame1))
+            self.assertEqual((True, self.__frame1), await c.receive(13))
+
+        asyncio.run(run())
+
+    def test_receive_frame(self):
+        stop = [0xA0, 0x80, 0x04, 0xC3]
+
+        async def run():
+            # a truncated response does not shift the following responses
+            c = self.create_communication(stop[:2])
+            self.assertEqual((False, []), await c.receive_frame(0xA0, 4))
+            c._reader.feed_data(bytes(stop[:3] + stop + stop))
+            self.assertEqual((True, stop), await c.receive_frame(0xA0, 4))
+            self.assertEqual((True, stop), await c.receive_frame(0xA0, 4))
+            self.assertEqual((False, []), await c.receive_frame(0xA0, 4))
+
+            carmen = AsyncCarmen(self.create_communication(stop[1:] + stop))
+            success, response = await carmen.stop_dsp()
+            self.assertTrue(success)
+            self.assertEqual(stop, response)
+
+        asyncio.run(run())
+
+    def test_read_measurement(self):
+        eeprom = [0x03, 0x80, 12] + TYPEPLATE
+        crc = calculate_crc16(eeprom)
+        responses = {0xA0: [0xA0, 0x80, 0x04, 0xC3],
+                     0xA1: [0xA1, 0x80, 0x07, 0x45],
+                     0x03: eeprom + [crc & 0xFF, crc >> 8],
+                     0x35: self.__frame1}
+        sent = []
+
+        async def send(command: int, _: List[int] = None) -> bool:
+            sent.append(command)
+            return True
+
+        async def receive_frame(command: int, _: int) -> Tuple[bool, List[int]]:
+            self.assertEqual(sent[-1], command)
+            return True, responses[command]
+
+        async def run():
+            communication = Mock()
+            communication.send = AsyncMock(side_effect=send)
+            communication.receive_frame = AsyncMock(side_effect=receive_frame)
+            c = AsyncCarmen(communication)
+            results = await asyncio.gather(c.read_measurement(), c.read_measurement())
+            self.assertEqual('SN123456789', c.typeplate.SerialNumber)
+            for success, _, _, status in results:
+                self.assertTrue(success)
+                self.assertEqual(0x800000, status)
+
+        asyncio.run(run())
+
+
+class __TestCarmenPool(TestCase):
+
+    @staticmethod
+    def create_carmen(rate: SystemRate, success: bool = True) -> Mock:
+        typeplate = Mock()
+        typeplate.SystemRate = rate
+        carmen = Mock()
+        carmen.read_typeplate = Mock(return_value=(success, typeplate))
+        carmen.read_measurement = Mock(return_value=(True, 1.0, 25.0, 0x000000))
+        return carmen
+
+    def test_poll(self):
+        pool = CarmenPool({'a': self.create_carmen(SystemRate.Rate_1_25_ms),
+                           'b': self.create_carmen(SystemRate.Rate_10_ms)})
+
+        timestamp, results = pool.poll()
+        self.assertEqual(['a', 'b'], list(results))
+        self.assertEqual((True, 1.0, 25.0, 0x000000), results['b'])
+        pool.close()
+
+    def test_start(self):
+        devices = {'a': self.create_carmen(SystemRate.Rate_1_25_ms),
+                   'b': self.create_carmen(SystemRate.Rate_10_ms),
+                   'c': self.create_carmen(SystemRate.Rate_10_ms, False)}
+        pool = CarmenPool(devices)
+
+        self.assertFalse(pool.start())
+        self.assertTrue(pool.is_running)
+        # single commands do not interfere with the periodic polling
+        count = devices['c'].read_typeplate.call_count
+        self.assertEqual((False, 0.0, 0.0, 0xFFFFFF), pool.poll()[1]['a'])
+        self.assertEqual((False, None), pool.read_typeplates()['a'])
+        self.assertEqual(count, devices['c'].read_typeplate.call_count)
+        while devices['b'].read_measurement.call_count < 3:
+            time.sleep(0.001)
+        pool.stop()
+        self.assertFalse(pool.is_running)
+        self.assertGreater(devices['a'].read_measurement.call_count, devices['b'].read_measurement.call_count)
+        self.assertEqual(0, devices['c'].read_measurement.call_count)
+
+        batch = pool.read_batch(0.01)
+        self.assertLessEqual(3, len(batch))
+        self.assertEqual((1.0, 25.0, 0x000000), batch[0][1]['a'])
+        self.assertNotIn('c', batch[0][1])
+        self.assertEqual([], pool.read_batch(0.01))
+        pool.close()
+
+
+class __TestCarmenSimulator(TestCase):
+
+    def test_handle(self):
+        simulator = CarmenSimulator(baudrate=None)
+
+        self.assertEqual(bytes([0xA0, 0x80, 0x04, 0xC3]), simulator.handle(bytes([0xA0, 0xC2, 0xFE])))
+        self.assertFalse(simulator.dsp_running)
+        self.assertEqual(bytes([0xA1, 0x80, 0x07, 0x45]), simulator.handle(bytes([0xA1, 0xC7, 0x7E])))
+        self.assertTrue(simulator.dsp_running)
+        self.assertIsNone(simulator.handle(bytes([0xA1, 0x00, 0x00])))
+
+        responses = simulator.feed(bytes([0xFF, 0x35, 0xBC, 0xFD, 0x5A]))
+        self.assertEqual(1, len(responses))
+        self.assertEqual(13, len(responses[0]))
+        self.assertEqual([bytes([0x5A, 0x80, 0x0B, 0x5F])], simulator.feed(bytes([0xDE, 0xFC])))
+
+        simulator.drop_rate = 1.0
+        self.assertEqual([], simulator.feed(bytes([0x35, 0xBC, 0xFD])))
+
+    def test_carmen(self):
+        def measurement(_: float) -> Tuple[float, float, int]:
+            return 1.5, 30.0, 0x000102
+
+        with CarmenSimulator(measurement=measurement, baudrate=None) as simulator:
+            communication = CommunicationCarmen(Serial(simulator.port))
+            c = Carmen(communication)
+
+            success, typeplate = c.read_typeplate()
+            self.assertTrue(success)
+            self.assertEqual(simulator.typeplate.SerialNumber, typeplate.SerialNumber)
+            success, pressure, temperature, status = c.read_measurement()
+            self.assertTrue(success)
+            self.assertAlmostEqual(1.5, pressure, 5)
+            self.assertAlmostEqual(30.0, temperature, 2)
+            self.assertEqual(0x000102, status)
+            self.assertTrue(all(result[0] for result in c.read_measurements(10, 4)))
+
+            simulator.corrupt_rate = 1.0
+            success, _, _, _ = c.read_measurement()
+            self.assertFalse(success)
+            del c, communication
+
+    def test_calibrate_link(self):
+        class LimitedSerial(SimulatedSerial):
+            # an adapter which corrupts every response above 115200 baud
+            def write(self, data: bytes) -> int:
+                size = super().write(data)
+                if self.baudrate > 115200:
+                    self._input[-1] ^= 0x01
+                return size
+
+        serial = LimitedSerial(CarmenSimulator(baudrate=None))
+        success, baudrate, results = calibrate_link(serial, [57600, 115200, 230400], 20, timeout=0.01)
+        self.assertTrue(success)
+        self.assertEqual(115200, baudrate)
+        self.assertEqual([20, 20, 1], [result.requests for result in results])
+        self.assertEqual(0.0, results[1].error_rate)
+        self.assertEqual(1.0, results[2].error_rate)
+        self.assertGreater(results[2].crc_errors, 0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'calibration.json')
+            calibration = LinkCalibration(path)
+            self.assertEqual(57600, calibration.get(serial.name, 57600))
+            calibration.put(serial.name, results[1])
+            self.assertEqual(115200, LinkCalibration(path).get(serial.name))
+
+    def test_simulated_serial(self):
+        c = Carmen(CommunicationCarmen(SimulatedSerial(CarmenSimulator(baudrate=None))))
+
+        success, pressure, _, _ = c.read_measurement()
+        self.assertTrue(success)
+        self.assertLessEqual(-1.0, pressure)
+        self.assertGreaterEqual(2.0, pressure)
+
+
+class __TestShardedAcquisition(TestCase):
+
+    def test_shared_sample_ring(self):
+        ring = SharedSampleRing(capacity=5)
+        self.assertEqual(8, ring.capacity)
+        consumer = SharedSampleRing(ring.name)
+        try:
+            for index in range(10):
+                ring.push(index, index * 0.1, 1.0, 25.0, 0x000000)
+            self.assertEqual(8, len(consumer))
+            self.assertEqual(2, consumer.dropped)
+            self.assertEqual([(0, 0x000000, 0.0, 1.0, 25.0)], consumer.pop(1))
+            self.assertEqual(list(range(1, 8)), [sample[0] for sample in consumer.pop()])
+            # records wrap around the end of the ring
+            for index in range(6):
+                self.assertTrue(ring.push(index, 0.0, 2.0, 25.0, 0x000100))
+            ring.count_error()
+            self.assertEqual(list(range(6)), [sample[0] for sample in consumer.pop()])
+            self.assertEqual(1, consumer.errors)
+            self.assertEqual([], consumer.pop())
+        finally:
+            consumer.close()
+            ring.close()
+
+    def test_read(self):
+        simulators = [CarmenSimulator(baudrate=None) for _ in range(3)]
+        ports = [simulator.start() for simulator in simulators]
+        try:
+            with ShardedAcquisition(ports, workers=2, capacity=1024) as acquisition:
+                self.assertEqual([ports[:2], ports[2:]], acquisition.shards())
+                self.assertTrue(acquisition.is_running)
+                counts = {}
+                end = time.monotonic() + 5
+                while len(counts) < len(ports) and time.monotonic() < end:
+                    for port, samples in acquisition.read(0.1).items():
+                        counts[port] = counts.get(port, 0) + len(samples)
+                        self.assertAlmostEqual(25.0, samples[0].temperature, 2)
+                acquisition.stop()
+                self.assertFalse(acquisition.is_running)
+                self.assertEqual(sorted(ports), sorted(counts))
+                self.assertEqual(0, acquisition.errors)
+        finally:
+            for simulator in simulators:
+                simulator.stop()
+
+
+class __TestCarmenDaemon(TestCase):
+
+    def test_daemon(self):
+        devices = {}
+        for port in ['sensor1', 'sensor2']:
+            communication = CommunicationCarmen(SimulatedSerial(CarmenSimulator(baudrate=None), port))
+            communication.log_protocol = False
+            devices[port] = Carmen(communication)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'carmen.sock')
+            daemon = CarmenDaemon(devices, path, history=16)
+            self.assertTrue(daemon.start())
+            try:
+                clients = [CarmenClient(path), CarmenClient(path)]
+                self.assertEqual(['sensor1', 'sensor2'], clients[0].ports)
+                clients[0].subscribe()
+                clients[1].subscribe('sensor2')
+                ports = set()
+                while len(ports) < 2:
+                    port, samples = clients[0].receive()
+                    self.assertGreater(len(samples), 0)
+                    ports.add(port)
+                port, samples = clients[1].receive()
+                self.assertEqual('sensor2', port)
+                self.assertAlmostEqual(25.0, samples[0].temperature, 2)
+
+                latest = clients[1].latest('sensor1')
+                self.assertIsInstance(latest, Sample)
+                self.assertEqual(16, len(clients[1].history('sensor1', 100)))
+                self.assertEqual(2, daemon.clients)
+                clients[1].unsubscribe()
+                clients[1].close()
+                with self.assertRaises(ValueError):
+                    clients[0].latest('sensor3')
+
+                # an oversized request closes the session without buffering the payload
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                    connection.settimeout(5.0)
+                    connection.connect(path)
+                    connection.sendall(struct.pack('<BI', 0x13, 1 << 30))
+                    while connection.recv(4096):
+                        pass
+            finally:
+                daemon.stop()
+            self.assertFalse(os.path.exists(path))
+            with self.assertRaises(IOError):
+                while True:
+                    clients[0].receive()
+            clients[0].close()